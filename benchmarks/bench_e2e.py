@@ -0,0 +1,180 @@
+"""
+End-to-end chat pipeline benchmark with local stand-ins for the LLM and the database.
+
+    python benchmarks/bench_e2e.py --tables 50 --rows 200 --concurrency 1,4,16 --turns 40 \
+        [--workload questions.jsonl] [--db-url postgresql://...] [--chat-latency 0.5] [--json out.json]
+
+A synthetic schema (benchmarks/synthetic.py) is created on --db-url (a temporary SQLite file by
+default) and a stub OpenAI-compatible server (benchmarks/stub_llm.py) answers chat and embedding
+calls with the configured latency, unless --llm-url points at a real one.
+Each workload line is {"question": "...", "chart": true|false}; every turn runs build_retriever +
+RAGPipeline.run and, for chart questions, the chart_detector and chart_renderer tools (in process).
+Per-stage timings come from core.metrics spans; p50/p95/p99 and throughput are reported per
+concurrency level.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from synthetic import make_schema
+from stub_llm import start_stub
+
+
+def generated_workload(engine, n: int = 40, seed: int = 0) -> list:
+    from core.rag.schema_cache import snapshot_schema
+    rnd = random.Random(seed)
+    tables = snapshot_schema(engine)["tables"]
+    out = []
+    for _ in range(n):
+        t = rnd.choice(list(tables))
+        cols = [c["name"] for c in tables[t]["columns"] if c["name"] != "id"]
+        a, b = rnd.sample(cols, 2) if len(cols) > 1 else (cols[0], cols[0])
+        if rnd.random() < 0.5:
+            out.append({"question": f"plot total {a.replace('_', ' ')} by {b.replace('_', ' ')} for {t}", "chart": True})
+        else:
+            out.append({"question": f"list {a.replace('_', ' ')} and {b.replace('_', ' ')} of {t}", "chart": False})
+    return out
+
+
+class Collector:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def __call__(self, stage, status, seconds, attrs):
+        with self.lock:
+            self.samples[stage].append(seconds)
+            if status != "ok":
+                self.errors[stage] += 1
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+            self.errors.clear()
+
+
+def run_turn(item, engine, url, opts):
+    from core.metrics import span
+    from core.rag.llm_utils import load_llm, load_embeddings
+    from core.rag.retriever import build_retriever
+    from core.rag.rag_pipeline import RAGPipeline
+    from mcp_tools.mcp import mcp
+
+    with span("bench_turn"):
+        with span("retriever_build"):
+            retriever = build_retriever(engine, load_embeddings(), persist_directory=opts.chroma_dir,
+                                        backend=opts.backend)
+        pipeline = RAGPipeline(load_llm(), retriever, engine)
+        sql, rows = pipeline.run(item["question"])
+        if item.get("chart"):
+            rows = [list(r) for r in rows]
+            det = mcp.call("chart_detector", {"conn_str": url, "question": item["question"],
+                                              "cols": pipeline.columns, "sample_rows": rows[:50]})
+            if det.get("plot"):
+                render = {"cols": pipeline.columns, "rows": rows, "x": det.get("x"), "y": det.get("y")} \
+                    if det.get("reuse") else {"sql": det.get("sql"), "limit_rows": 500}
+                mcp.call("chart_renderer", {"conn_str": url, "plot_type": det.get("plot_type") or "bar",
+                                            "output": opts.chart_output, **render})
+
+
+def percentiles(samples) -> dict:
+    arr = np.asarray(samples) * 1000
+    return {"count": len(arr), "p50_ms": float(np.percentile(arr, 50)), "p95_ms": float(np.percentile(arr, 95)),
+            "p99_ms": float(np.percentile(arr, 99))}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--tables", type=int, default=50)
+    ap.add_argument("--rows", type=int, default=200)
+    ap.add_argument("--db-url", help="SQLAlchemy URL (default: temporary SQLite file)")
+    ap.add_argument("--workload", help="JSONL workload; generated from the schema when omitted")
+    ap.add_argument("--turns", type=int, default=40, help="turns per concurrency level (workload is cycled)")
+    ap.add_argument("--concurrency", default="1,4,16")
+    ap.add_argument("--llm-url", help="use this OpenAI-compatible base URL instead of the stub")
+    ap.add_argument("--chat-latency", type=float, default=0.5)
+    ap.add_argument("--embed-latency", type=float, default=0.05)
+    ap.add_argument("--backend", choices=["chroma", "numpy"], default="numpy")
+    ap.add_argument("--chart-output", choices=["spec", "png"], default="spec")
+    ap.add_argument("--json", help="write results to this file")
+    opts = ap.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench_e2e_")
+    os.environ.setdefault("MCP_MEDIA_ROOT", os.path.join(work, "media"))
+    opts.chroma_dir = os.path.join(work, "chroma")
+    try:
+        url = opts.db_url or f"sqlite:///{os.path.join(work, 'bench.db')}"
+        t = time.perf_counter()
+        engine = make_schema(url, opts.tables, opts.rows)
+        print(f"Schema: {opts.tables} tables x {opts.rows} rows in {time.perf_counter() - t:.1f}s")
+
+        import core.rag.llm_utils as llm_utils
+        import core.rag.retriever as retriever_mod
+        from core.metrics import add_span_listener
+        import mcp_tools.tools  # registers the tools
+        if opts.llm_url:
+            llm_utils.BASE_URL = opts.llm_url
+        else:
+            _, llm_utils.BASE_URL = start_stub(0, chat_latency=opts.chat_latency, embed_latency=opts.embed_latency)
+        retriever_mod.NUMPY_INDEX_DIR = os.path.join(work, "vector_index")
+
+        if opts.workload:
+            with open(opts.workload, encoding="utf-8") as f:
+                workload = [json.loads(l) for l in f if l.strip()]
+        else:
+            workload = generated_workload(engine)
+
+        collector = Collector()
+        add_span_listener(collector)
+        run_turn(workload[0], engine, url, opts)  # builds indexes and caches once
+        results = []
+        for level in [int(c) for c in opts.concurrency.split(",")]:
+            collector.reset()
+            items = [workload[i % len(workload)] for i in range(opts.turns)]
+            failed, first_error = 0, None
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=level) as pool:
+                for fut in [pool.submit(run_turn, it, engine, url, opts) for it in items]:
+                    try:
+                        fut.result()
+                    except Exception as e:
+                        failed += 1
+                        first_error = first_error or f"{type(e).__name__}: {e}"
+            wall = time.perf_counter() - start
+            stages = {s: percentiles(v) for s, v in sorted(collector.samples.items())}
+            res = {"concurrency": level, "turns": len(items), "failed": failed, "wall_s": wall,
+                   "throughput_per_s": len(items) / wall, "stages": stages,
+                   "stage_errors": dict(collector.errors), "first_error": first_error}
+            results.append(res)
+
+            print(f"\nconcurrency {level}: {len(items)} turns, {failed} failed, "
+                  f"{res['throughput_per_s']:.2f} turns/s")
+            if first_error:
+                print(f"  first error: {first_error[:200]}")
+            print(f"  {'stage':<28} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+            for s, p in stages.items():
+                print(f"  {s:<28} {p['count']:>5} {p['p50_ms']:>9.1f} {p['p95_ms']:>9.1f} {p['p99_ms']:>9.1f}")
+
+        if opts.json:
+            with open(opts.json, "w") as f:
+                json.dump({"tables": opts.tables, "rows": opts.rows, "backend": opts.backend, "results": results}, f, indent=2)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
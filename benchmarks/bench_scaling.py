@@ -0,0 +1,215 @@
+"""
+How schema indexing and retrieval scale with the number of tables.
+
+    python benchmarks/bench_scaling.py --tables 10,100,1000,10000 [--rounds 5] [--json out.json]
+    python benchmarks/bench_scaling.py --tables 10,100,1000 --compare baseline.json [--threshold 0.2]
+
+For every size a synthetic SQLite schema (benchmarks/synthetic.py, no rows) is introspected and
+each stage is timed over --rounds rounds (min/median/mean/stddev, like pytest-benchmark), then run
+once more under tracemalloc for its peak Python memory:
+
+    introspect          snapshot_schema (catalog queries)
+    schema_to_text      my_tools.utils.schema_to_text over a fresh inspector
+    documents           build_table_documents
+    lexical_index       BM25Index
+    column_index        ColumnIndex (chart_detector)
+    vector_index        NumpyVectorStore.from_documents (+ chroma with --chroma)
+    build_retriever     build_retriever on warm caches (the per-request cost)
+    retrieve            HybridRetriever.invoke, per query
+    column_scan         ColumnIndex.best_candidate, per query
+
+Embeddings come from synthetic.FakeEmbeddings, so no model is involved. --json writes the results
+with the git commit; --compare prints the change against such a file and exits 1 when a median
+regresses by more than --threshold.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from sqlalchemy import inspect
+from synthetic import make_schema, FakeEmbeddings, ATTRIBUTES
+
+
+def measure(fn, rounds: int) -> dict:
+    """
+    Timing stats of fn over rounds calls, plus the peak traced memory of one extra call.
+    """
+    times = []
+    for _ in range(rounds):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"rounds": rounds, "min_s": min(times), "median_s": statistics.median(times),
+            "mean_s": statistics.fmean(times), "stddev_s": statistics.stdev(times) if len(times) > 1 else 0.0,
+            "peak_bytes": peak}
+
+
+def per_query(fn, queries, rounds: int) -> dict:
+    """
+    Like measure, but for fn(query) over every query; times are per query.
+    """
+    def run():
+        for q in queries:
+            fn(q)
+    stats = measure(run, rounds)
+    for k in ("min_s", "median_s", "mean_s", "stddev_s"):
+        stats[k] /= len(queries)
+    stats["queries"] = len(queries)
+    return stats
+
+
+def questions(snapshot: dict, n: int, seed: int = 0) -> list:
+    rnd = random.Random(seed)
+    names = list(snapshot["tables"])
+    attrs = [a for a, _ in ATTRIBUTES]
+    out = []
+    for i in range(n):
+        t = rnd.choice(names)
+        a, b = rnd.sample(attrs, 2)
+        out.append(f"plot total {a} by {b.replace('_', ' ')} per {t}" if i % 2 else
+                   f"which {t.replace('_', ' ')} has the highest {a.replace('_', ' ')}")
+    return out
+
+
+def run_size(n: int, opts, work: str) -> dict:
+    import core.rag.retriever as retriever_mod
+    from core.rag.schema_cache import snapshot_schema, invalidate_schema
+    from core.rag.retriever import build_table_documents, build_retriever, HybridRetriever
+    from core.rag.lexical import BM25Index
+    from core.rag.vector_store import NumpyVectorStore
+    from core.rag.vector_index import sync_chroma
+    from core.charts.column_index import ColumnIndex
+    from my_tools.utils import schema_to_text
+
+    url = f"sqlite:///{os.path.join(work, f'scale_{n}.db')}"
+    engine = make_schema(url, n, n_columns=opts.columns)
+    emb = FakeEmbeddings(opts.dim)
+    # the big sizes are dominated by a single call; a few rounds are enough
+    rounds = opts.rounds if n <= 1000 else max(1, min(opts.rounds, 2))
+    res = {}
+
+    res["introspect"] = measure(lambda: snapshot_schema(engine), rounds)
+    res["schema_to_text"] = measure(lambda: schema_to_text(inspect(engine)), rounds)
+    snapshot = snapshot_schema(engine)
+    res["documents"] = measure(lambda: build_table_documents(snapshot), rounds)
+    docs = build_table_documents(snapshot)
+    res["lexical_index"] = measure(lambda: BM25Index(snapshot), rounds)
+    res["column_index"] = measure(lambda: ColumnIndex(snapshot), rounds)
+    res["vector_index"] = measure(lambda: NumpyVectorStore.from_documents(docs, emb), rounds)
+    if opts.chroma:
+        chroma_dir = os.path.join(work, f"chroma_{n}")
+        def chroma_build():
+            shutil.rmtree(chroma_dir, ignore_errors=True)
+            sync_chroma(docs, emb, chroma_dir, f"scale_{n}")
+        res["vector_index_chroma"] = measure(chroma_build, 1)
+
+    retriever_mod.NUMPY_INDEX_DIR = os.path.join(work, "vector_index")
+    invalidate_schema()
+    build_retriever(engine, emb, backend="numpy")  # cold: snapshot, index files, caches
+    res["build_retriever"] = measure(lambda: build_retriever(engine, emb, backend="numpy"), opts.rounds)
+
+    qs = questions(snapshot, opts.queries)
+    store = NumpyVectorStore.from_documents(docs, emb)
+    retriever = HybridRetriever(vector_store=store, snapshot=snapshot)
+    res["retrieve"] = per_query(retriever.invoke, qs, rounds)
+    index = ColumnIndex(snapshot)
+    res["column_scan"] = per_query(index.best_candidate, qs, rounds)
+
+    engine.dispose()
+    return res
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results: dict) -> dict:
+    """{"stage[tables]": stats} as pytest-benchmark names parametrised benchmarks."""
+    return {f"{stage}[{n}]": stats for n, stages in results.items() for stage, stats in stages.items()}
+
+
+def compare(current: dict, baseline_path: str, threshold: float) -> int:
+    with open(baseline_path, encoding="utf-8") as f:
+        base = json.load(f)
+    old, new = flatten(base["results"]), flatten(current["results"])
+    print(f"\nvs {baseline_path} (commit {base.get('commit')})")
+    print(f"  {'benchmark':<28} {'old ms':>10} {'new ms':>10} {'change':>8} {'peak MB':>9}")
+    regressions = 0
+    for name in sorted(set(old) & set(new), key=lambda s: (int(s[s.index('[') + 1:-1]), s)):
+        o, c = old[name]["median_s"], new[name]["median_s"]
+        change = (c - o) / o if o else 0.0
+        flag = ""
+        if change > threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"  {name:<28} {o * 1000:>10.3f} {c * 1000:>10.3f} {change:>+8.1%} "
+              f"{new[name]['peak_bytes'] / 1e6:>9.2f}{flag}")
+    return 1 if regressions else 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--tables", default="10,100,1000,10000")
+    ap.add_argument("--columns", type=int, default=6, help="attribute columns per table")
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--chroma", action="store_true", help="also time a Chroma collection build")
+    ap.add_argument("--json", help="write results to this file")
+    ap.add_argument("--compare", help="baseline JSON from an earlier --json run")
+    ap.add_argument("--threshold", type=float, default=0.2, help="median slowdown counted as a regression")
+    opts = ap.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench_scaling_")
+    cwd = os.getcwd()
+    # relative cache directories (schema snapshots) must not pick up a real deployment's files
+    os.chdir(work)
+    try:
+        results = {}
+        print(f"  {'benchmark':<28} {'median ms':>10} {'min ms':>10} {'stddev ms':>10} {'peak MB':>9}")
+        for n in [int(x) for x in opts.tables.split(",")]:
+            t = time.perf_counter()
+            results[str(n)] = run_size(n, opts, work)
+            for stage, s in results[str(n)].items():
+                print(f"  {f'{stage}[{n}]':<28} {s['median_s'] * 1000:>10.3f} {s['min_s'] * 1000:>10.3f} "
+                      f"{s['stddev_s'] * 1000:>10.3f} {s['peak_bytes'] / 1e6:>9.2f}")
+            print(f"  ({n} tables: {time.perf_counter() - t:.1f}s)")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work, ignore_errors=True)
+
+    out = {"commit": git_commit(), "python": platform.python_version(), "machine": platform.machine(),
+           "params": {"columns": opts.columns, "dim": opts.dim, "queries": opts.queries}, "results": results}
+    if opts.json:
+        with open(opts.json, "w") as f:
+            json.dump(out, f, indent=2)
+    if opts.compare:
+        sys.exit(compare(out, opts.compare, opts.threshold))
+
+
+if __name__ == "__main__":
+    main()
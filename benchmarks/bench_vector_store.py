@@ -0,0 +1,122 @@
+"""
+Schema retrieval: Chroma vs the in-process NumPy index (core.rag.vector_store).
+
+    python benchmarks/bench_vector_store.py --tables 100,1000,5000 --dim 768 --queries 200
+
+Embeddings come from a deterministic fake embedder, so only index build, load and
+search are measured (query vectors are computed up front).
+"""
+import os
+import sys
+import time
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+import statistics
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.schema import Document
+from langchain_community.vectorstores import Chroma
+from core.rag.vector_store import NumpyVectorStore
+
+
+class FakeEmbeddings:
+    """Deterministic random unit vectors keyed by text."""
+    def __init__(self, dim):
+        self.dim = dim
+
+    def _vec(self, text):
+        seed = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+        v = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return (v / np.linalg.norm(v)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vec(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vec(text)
+
+
+def make_docs(n):
+    return [Document(page_content=f"Table: table_{i}\nColumns:\n - id (int)\n - value_{i % 37} (numeric)",
+                     metadata={"table": f"table_{i}"}) for i in range(n)]
+
+
+def timed(fn):
+    t = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t
+
+
+def latencies(search, vectors, k):
+    out = []
+    for v in vectors:
+        t = time.perf_counter()
+        search(v, k)
+        out.append(time.perf_counter() - t)
+    out.sort()
+    return {"p50_ms": statistics.median(out) * 1000, "p95_ms": out[int(len(out) * 0.95) - 1] * 1000}
+
+
+def dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def run(n, dim, n_queries, k):
+    emb = FakeEmbeddings(dim)
+    docs = make_docs(n)
+    queries = [emb.embed_query(f"question {i}") for i in range(n_queries)]
+    work = tempfile.mkdtemp(prefix="bench_vs_")
+    try:
+        res = {"tables": n, "dim": dim}
+
+        chroma_dir = os.path.join(work, "chroma")
+        chroma, res["chroma_build_s"] = timed(lambda: Chroma.from_documents(docs, emb, persist_directory=chroma_dir))
+        res["chroma_search"] = latencies(lambda v, k: chroma.similarity_search_by_vector(v, k=k), queries, k)
+        res["chroma_bytes"] = dir_size(chroma_dir)
+
+        np_dir = os.path.join(work, "numpy")
+        def build():
+            store = NumpyVectorStore.from_documents(docs, emb)
+            store.save(np_dir, "bench")
+            return store
+        _, res["numpy_build_s"] = timed(build)
+        (store, _), res["numpy_load_s"] = timed(lambda: NumpyVectorStore.load(np_dir, "bench", emb))
+        res["numpy_search"] = latencies(lambda v, k: store.similarity_search_by_vector(v, k=k), queries, k)
+        res["numpy_bytes"] = dir_size(np_dir)
+        return res
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--tables", default="100,1000,5000")
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("-k", type=int, default=9)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    results = []
+    print(f"{'tables':>7} {'backend':>7} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} {'MB':>7}")
+    for n in [int(x) for x in args.tables.split(",")]:
+        r = run(n, args.dim, args.queries, args.k)
+        results.append(r)
+        for b in ("chroma", "numpy"):
+            s = r[f"{b}_search"]
+            print(f"{n:>7} {b:>7} {r[f'{b}_build_s']:>8.2f} {s['p50_ms']:>8.3f} {s['p95_ms']:>8.3f} {r[f'{b}_bytes'] / 1e6:>7.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Import cost of the entry points, from `python -X importtime` in a fresh interpreter.
+
+    python benchmarks/import_time.py [--repeat 3] [--top 10] [--json out.json] [--compare baseline.json]
+
+Each target is imported --repeat times in a new process (after django.setup() for Django
+modules); the median cumulative import time, peak RSS and the top-level packages costing the
+most self time are reported. Heavy ML/charting packages must stay lazy: the run exits 1 if an
+entry point imports one of --forbid, or (with --compare) if a median regresses by more than
+--threshold.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (module, needs django.setup())
+TARGETS = [
+    ("django.setup", True),
+    ("core.views", True),
+    ("core.management.commands.warm_up", True),
+    ("my_tools.tools", True),
+    ("mcp_tools.server", True),
+    ("core.rag.retriever", False),
+]
+FORBIDDEN = "whisper,torch,pandas,matplotlib,chromadb,openai"
+
+_LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+_CHILD = """
+import sys, json, resource
+if {django}:
+    import django
+    django.setup()
+if {module!r} != "django.setup":
+    import importlib
+    importlib.import_module({module!r})
+print(json.dumps({{"modules": sorted(m for m in sys.modules if "." not in m),
+                  "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+
+def parse_importtime(stderr: str):
+    """
+    [(self_us, cumulative_us, depth, module)] in import order.
+    """
+    out = []
+    for line in stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            out.append((int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2, m.group(4)))
+    return out
+
+
+def measure(module: str, django: bool, settings: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+               DJANGO_SETTINGS_MODULE=settings)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _CHILD.format(django=django, module=module)],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+    rows = parse_importtime(proc.stderr)
+    info = json.loads(proc.stdout.strip().splitlines()[-1])
+    by_package = defaultdict(int)
+    for self_us, _, _, name in rows:
+        by_package[name.split(".")[0]] += self_us
+    return {
+        "total_s": sum(r[0] for r in rows) / 1e6,
+        "maxrss_mb": info["maxrss_kb"] / 1024,
+        "modules": info["modules"],
+        "packages": {k: v / 1e6 for k, v in sorted(by_package.items(), key=lambda kv: -kv[1])},
+    }
+
+
+def compare(results: dict, baseline_path: str, threshold: float) -> int:
+    with open(baseline_path, encoding="utf-8") as f:
+        base = json.load(f)["results"]
+    print(f"\nvs {baseline_path}")
+    print(f"  {'target':<36} {'old s':>7} {'new s':>7} {'change':>8}")
+    regressions = 0
+    for name, res in results.items():
+        if name not in base:
+            continue
+        o, c = base[name]["total_s"], res["total_s"]
+        change = (c - o) / o if o else 0.0
+        flag = ""
+        if change > threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"  {name:<36} {o:>7.2f} {c:>7.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--target", action="append", help="module to measure (repeatable, default: the entry points)")
+    ap.add_argument("--settings", default="rag_django.settings")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--top", type=int, default=8, help="heaviest packages listed per target")
+    ap.add_argument("--forbid", default=FORBIDDEN, help="comma-separated packages no entry point may import")
+    ap.add_argument("--json", help="write results to this file")
+    ap.add_argument("--compare", help="baseline JSON from an earlier --json run")
+    ap.add_argument("--threshold", type=float, default=0.25)
+    opts = ap.parse_args()
+
+    targets = [(t, True) for t in opts.target] if opts.target else TARGETS
+    forbidden = {p for p in opts.forbid.split(",") if p}
+    results, violations = {}, []
+    for module, django in targets:
+        runs = [measure(module, django, opts.settings) for _ in range(max(1, opts.repeat))]
+        runs.sort(key=lambda r: r["total_s"])
+        res = runs[len(runs) // 2]
+        res["runs_s"] = [r["total_s"] for r in runs]
+        results[module] = res
+        loaded = sorted(forbidden & set(res["modules"]))
+        if loaded:
+            violations.append((module, loaded))
+        heavy = ", ".join(f"{p} {s:.2f}" for p, s in list(res["packages"].items())[:opts.top])
+        print(f"{module:<36} {res['total_s']:>6.2f}s  {res['maxrss_mb']:>6.0f} MB  [{heavy}]"
+              + (f"  LOADS {', '.join(loaded)}" if loaded else ""))
+
+    if opts.json:
+        with open(opts.json, "w") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+    failed = bool(violations)
+    if opts.compare:
+        failed |= compare(results, opts.compare, opts.threshold) > 0
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Recall of quantized schema indexes (float16, int8) against full float32 precision.
+
+    python benchmarks/recall_quantized.py --conn-str postgresql://user:pw@host/db [--conn-str ...]
+        [--questions questions.txt] [-k 3] [--fake-embeddings]
+
+Table documents come from the live schema (core.rag.retriever.build_table_documents).
+Questions are read one per line from --questions, or generated from table and column names.
+Embeddings use the configured embedding endpoint unless --fake-embeddings is given.
+"""
+import os
+import sys
+import random
+import hashlib
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from core.rag.schema_cache import snapshot_schema
+from core.rag.retriever import build_table_documents
+from core.rag.vector_store import NumpyVectorStore, quantize, dequantize, _normalise
+
+
+class FakeEmbeddings:
+    """Bag-of-words hashing embedder, good enough to exercise quantization offline."""
+    def __init__(self, dim=768):
+        self.dim = dim
+
+    def embed_query(self, text):
+        v = np.zeros(self.dim, dtype=np.float32)
+        for w in text.lower().replace("_", " ").split():
+            h = int(hashlib.md5(w.encode("utf-8")).hexdigest(), 16)
+            v[h % self.dim] += 1.0 if (h >> 64) & 1 else -1.0
+        return v.tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+
+def generated_questions(snapshot, n=200, seed=0):
+    rnd = random.Random(seed)
+    tables = list(snapshot["tables"].items())
+    out = []
+    for _ in range(n):
+        t, info = rnd.choice(tables)
+        cols = [c["name"] for c in info["columns"]] or [t]
+        out.append(f"show {rnd.choice(cols).replace('_', ' ')} by {rnd.choice(cols).replace('_', ' ')} for {t.replace('_', ' ')}")
+    return out
+
+
+def top_k(store, queries, k):
+    sims = store.scores(queries)
+    return [set(np.argsort(-row)[:k]) for row in sims]
+
+
+def evaluate(docs, questions, embeddings, k):
+    full = NumpyVectorStore.from_documents(docs, embeddings)
+    qvecs = _normalise(np.vstack([embeddings.embed_query(q) for q in questions]))
+    truth = top_k(full, qvecs, k)
+    rows = [("float32", full.nbytes(), 1.0, 0.0)]
+    for precision in ("float16", "int8"):
+        data, scales = quantize(np.asarray(full.vectors), precision)
+        store = NumpyVectorStore(embeddings, data, full.documents, precision=precision, scales=scales)
+        # question vectors go through the same quantization as the question cache
+        qq = np.vstack([dequantize(*quantize(v[None, :], precision)) for v in qvecs])
+        got = top_k(store, qq, k)
+        recall = np.mean([len(a & b) / len(a) for a, b in zip(truth, got)])
+        err = float(np.abs(store.scores(qq) - full.scores(qvecs)).max())
+        rows.append((precision, store.nbytes(), recall, err))
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--conn-str", action="append", required=True)
+    ap.add_argument("--questions", help="file with one question per line")
+    ap.add_argument("-k", type=int, default=3)
+    ap.add_argument("--fake-embeddings", action="store_true")
+    args = ap.parse_args()
+
+    if args.fake_embeddings:
+        embeddings = FakeEmbeddings()
+    else:
+        from core.rag.llm_utils import load_embeddings
+        embeddings = load_embeddings()
+
+    for conn_str in args.conn_str:
+        engine = create_engine(conn_str)
+        snapshot = snapshot_schema(engine)
+        docs = build_table_documents(snapshot)
+        if args.questions:
+            with open(args.questions, encoding="utf-8") as f:
+                questions = [l.strip() for l in f if l.strip()]
+        else:
+            questions = generated_questions(snapshot)
+        k = min(args.k, len(docs))
+        print(f"{engine.url.render_as_string(hide_password=True)}: {len(docs)} tables, {len(questions)} questions, k={k}")
+        print(f"  {'precision':>9} {'bytes':>10} {'recall@k':>9} {'max |dsim|':>11}")
+        for precision, nbytes, recall, err in evaluate(docs, questions, embeddings, k):
+            print(f"  {precision:>9} {nbytes:>10} {recall:>9.3f} {err:>11.4f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
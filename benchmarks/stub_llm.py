@@ -0,0 +1,141 @@
+"""
+Stand-in for the OpenAI-compatible LLM server (LM Studio) with configurable latency.
+
+    python benchmarks/stub_llm.py --port 8765 --chat-latency 0.8 --embed-latency 0.05
+
+/v1/chat/completions answers SQL prompts with a SELECT over the first table and columns of the
+schema in the prompt, and chart_detector prompts with a JSON decision. /v1/embeddings returns
+deterministic hashed vectors (see synthetic.FakeEmbeddings).
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic import FakeEmbeddings
+
+_TABLE_RE = re.compile(r"Table:\s*(\w+)")
+_COLUMN_RE = re.compile(r"^\s*-\s*(\w+)\s*\(", re.M)
+
+
+def _sql_for(prompt: str) -> str:
+    tables = _TABLE_RE.findall(prompt)
+    if not tables:
+        return "SELECT 1"
+    block = prompt[prompt.index("Table: " + tables[0]):]
+    nxt = _TABLE_RE.search(block, 7)
+    cols = [c for c in _COLUMN_RE.findall(block[:nxt.start()] if nxt else block) if c != "id"][:2]
+    return f"SELECT {', '.join(cols) or '*'} FROM {tables[0]} LIMIT 50"
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class StubState:
+    def __init__(self, chat_latency=0.5, embed_latency=0.05, jitter=0.2, dim=768, seed=0):
+        self.chat_latency = chat_latency
+        self.embed_latency = embed_latency
+        self.jitter = jitter
+        self.embedder = FakeEmbeddings(dim)
+        self.rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def sleep(self, base):
+        with self.lock:
+            self.requests += 1
+            factor = 1 + self.rnd.uniform(-self.jitter, self.jitter)
+        if base > 0:
+            time.sleep(base * factor)
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # headers and body go out in separate writes: with Nagle on, every keep-alive
+        # response waits ~40 ms for the client's delayed ACK
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                return self._send(200, {"object": "list", "data": [{"id": "stub", "object": "model"}]})
+            self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path.endswith("/chat/completions"):
+                prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+                state.sleep(state.chat_latency)
+                if "plot (true/false)" in prompt:
+                    content = json.dumps({"plot": True, "plot_type": "bar", "sql": _sql_for(prompt)})
+                else:
+                    content = _sql_for(prompt)
+                return self._send(200, {
+                    "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": body.get("model"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": {"prompt_tokens": _tokens(prompt), "completion_tokens": _tokens(content),
+                              "total_tokens": _tokens(prompt) + _tokens(content)},
+                })
+            if self.path.endswith("/embeddings"):
+                inputs = body.get("input") or []
+                inputs = [inputs] if isinstance(inputs, str) else inputs
+                state.sleep(state.embed_latency)
+                data = [{"object": "embedding", "index": i, "embedding": state.embedder.embed_query(t)}
+                        for i, t in enumerate(inputs)]
+                n = sum(_tokens(t) for t in inputs)
+                return self._send(200, {"object": "list", "data": data, "model": body.get("model"),
+                                        "usage": {"prompt_tokens": n, "total_tokens": n}})
+            self._send(404, {"error": "not found"})
+
+    return Handler
+
+
+def start_stub(port: int = 0, **kwargs):
+    """
+    Start the stub in a daemon thread. Returns (server, base_url) with base_url ending in /v1.
+    """
+    state = StubState(**kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--chat-latency", type=float, default=0.5, help="seconds per chat completion")
+    ap.add_argument("--embed-latency", type=float, default=0.05, help="seconds per embeddings request")
+    ap.add_argument("--jitter", type=float, default=0.2, help="relative latency jitter (0.2 = +-20%%)")
+    args = ap.parse_args()
+    server, url = start_stub(args.port, chat_latency=args.chat_latency, embed_latency=args.embed_latency,
+                             jitter=args.jitter)
+    print(f"Stub LLM listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Synthetic schemas and a deterministic embedder shared by the benchmarks.
+"""
+import random
+import hashlib
+import datetime
+import numpy as np
+from sqlalchemy import (MetaData, Table, Column, Integer, String, Numeric, Date, ForeignKey,
+                        create_engine, insert)
+
+ENTITIES = ["customer", "product", "store", "employee", "supplier", "region", "category", "warehouse",
+            "invoice", "shipment", "payment", "sales_order", "campaign", "ticket", "account", "vendor"]
+ATTRIBUTES = [("name", String(80)), ("city", String(60)), ("status", String(20)), ("amount", Numeric(12, 2)),
+              ("quantity", Integer), ("price", Numeric(10, 2)), ("created_at", Date), ("country", String(60)),
+              ("email", String(120)), ("score", Numeric(6, 2)), ("segment", String(30)), ("updated_at", Date)]
+
+
+def table_names(n: int) -> list:
+    names = []
+    for i in range(n):
+        base = ENTITIES[i % len(ENTITIES)]
+        names.append(base if i < len(ENTITIES) else f"{base}_{i // len(ENTITIES)}")
+    return names
+
+
+def build_metadata(n_tables: int, n_columns: int = 6, seed: int = 0) -> MetaData:
+    """
+    n_tables tables with an id key, n_columns attribute columns and, after the first
+    few tables, a foreign key to an earlier table (so join paths exist).
+    """
+    rnd = random.Random(seed)
+    md = MetaData()
+    names = table_names(n_tables)
+    for i, name in enumerate(names):
+        cols = [Column("id", Integer, primary_key=True)]
+        if i >= 3:
+            parent = names[rnd.randrange(0, i)]
+            cols.append(Column(f"{parent}_id", Integer, ForeignKey(f"{parent}.id")))
+        for attr, typ in rnd.sample(ATTRIBUTES, min(n_columns, len(ATTRIBUTES))):
+            cols.append(Column(attr, typ, comment=f"{attr.replace('_', ' ')} of the {name.split('_')[0]}"))
+        Table(name, md, *cols, comment=f"{name.replace('_', ' ')} records")
+    return md
+
+
+def _value(col, rnd, fake, n_parent):
+    if col.primary_key:
+        return None
+    if col.foreign_keys:
+        return rnd.randint(1, n_parent) if n_parent else None
+    typ = type(col.type)
+    if typ is Integer:
+        return rnd.randint(1, 500)
+    if typ is Numeric:
+        return round(rnd.uniform(1, 10000), 2)
+    if typ is Date:
+        return datetime.date(2023, 1, 1) + datetime.timedelta(days=rnd.randrange(730))
+    name = col.name
+    if name == "name":
+        return fake.name()
+    if name == "city":
+        return fake.city()
+    if name == "country":
+        return fake.country()[:60]
+    if name == "email":
+        return fake.email()
+    return rnd.choice(["new", "active", "closed", "gold", "silver", "bronze"])
+
+
+def make_schema(url: str, n_tables: int, n_rows: int = 0, n_columns: int = 6, seed: int = 0):
+    """
+    Create the synthetic schema on url (SQLite or PostgreSQL) and fill every table with n_rows
+    Faker rows. Returns the engine.
+    """
+    engine = create_engine(url)
+    md = build_metadata(n_tables, n_columns, seed)
+    md.drop_all(engine)
+    md.create_all(engine)
+    if n_rows:
+        from faker import Faker
+        fake = Faker()
+        Faker.seed(seed)
+        rnd = random.Random(seed)
+        with engine.begin() as conn:
+            for table in md.sorted_tables:
+                rows = []
+                for _ in range(n_rows):
+                    rows.append({c.name: _value(c, rnd, fake, n_rows) for c in table.columns if not c.primary_key})
+                conn.execute(insert(table), rows)
+    return engine
+
+
+class FakeEmbeddings:
+    """
+    Deterministic hashed bag-of-words embedder: texts sharing words get similar vectors,
+    without any model or network call.
+    """
+    def __init__(self, dim: int = 768):
+        self.dim = dim
+        self.embed_model = f"fake-{dim}"
+
+    def embed_query(self, text: str) -> list:
+        v = np.zeros(self.dim, dtype=np.float32)
+        for w in text.lower().replace("_", " ").split():
+            h = int(hashlib.md5(w.encode("utf-8")).hexdigest(), 16)
+            v[h % self.dim] += 1.0 if (h >> 64) & 1 else -1.0
+        n = np.linalg.norm(v)
+        return (v / n if n else v).tolist()
+
+    def embed_documents(self, texts) -> list:
+        return [self.embed_query(t) for t in texts]
@@ -0,0 +1,145 @@
+import re
+import threading
+from collections import defaultdict
+from core.rag.tokens import words as tokens, STOP_WORDS
+from .detect import is_identifier, TREND_WORDS
+
+# matched against whole words of the type name: a substring test made POINT and INTERVAL numeric
+NUMERIC_TYPES = {"int", "integer", "smallint", "bigint", "tinyint", "mediumint", "int2", "int4", "int8",
+                 "serial", "bigserial", "smallserial", "numeric", "decimal", "float", "float4", "float8",
+                 "real", "double", "money", "smallmoney", "number", "binary_float", "binary_double"}
+TEMPORAL_TYPES = {"date", "time", "timetz", "datetime", "datetime2", "smalldatetime", "datetimeoffset",
+                  "timestamp", "timestamptz", "year"}
+CATEGORICAL_TYPES = {"char", "varchar", "varchar2", "nchar", "nvarchar", "nvarchar2", "character", "text",
+                     "ntext", "tinytext", "mediumtext", "longtext", "citext", "string", "enum", "bool",
+                     "boolean", "clob", "nclob"}
+COUNT_WORDS = ("count", "how many", "number of")
+AVG_WORDS = ("average", "avg", "mean")
+
+_NAME_RE = re.compile(r"[a-z0-9_]+")
+_TYPE_WORD_RE = re.compile(r"[a-z][a-z0-9_]*")
+
+
+def column_role(col: dict, primary_key=()) -> str:
+    """
+    Classify a snapshot column as numeric, categorical, temporal or identifier (None if unusable).
+    """
+    name = col["name"]
+    typ = set(_TYPE_WORD_RE.findall(col["type"].lower()))
+    if name in primary_key or is_identifier(name):
+        return "identifier"
+    if "interval" in typ:
+        return None
+    if typ & TEMPORAL_TYPES:
+        return "temporal"
+    if typ & NUMERIC_TYPES:
+        return "numeric"
+    if typ & CATEGORICAL_TYPES:
+        return "categorical"
+    return None
+
+
+class ColumnIndex:
+    """
+    Column roles for every table of a schema snapshot, plus an inverted index from
+    name/comment tokens to tables and columns, so chart candidates can be ranked
+    against a question in memory.
+    """
+    def __init__(self, snapshot: dict):
+        self.key = snapshot.get("key")
+        self.built_at = snapshot.get("built_at")
+        self.tables = {}
+        self.postings = defaultdict(set)
+        self.names = defaultdict(set)
+        self.default = None
+        for t, info in snapshot["tables"].items():
+            roles = {"numeric": [], "categorical": [], "temporal": [], "identifier": []}
+            pk = info.get("primary_key") or ()
+            for col in info["columns"]:
+                role = column_role(col, pk)
+                # grouping by a primary key is never a useful chart
+                if role and col["name"] not in pk:
+                    roles[role].append(col["name"])
+                self.names[col["name"].lower()].add((t, col["name"]))
+                for tok in tokens(col["name"]) | tokens(col.get("comment")):
+                    self.postings[tok].add((t, col["name"]))
+            for tok in tokens(t) | tokens(info.get("comment")):
+                self.postings[tok].add((t, None))
+            self.tables[t] = roles
+            if self.default is None and roles["numeric"] and (roles["categorical"] or roles["temporal"]):
+                self.default = t
+
+    def _hits(self, question: str):
+        table_hits = defaultdict(int)
+        column_hits = defaultdict(int)
+        for tok in tokens(question) - STOP_WORDS:
+            for t, c in self.postings.get(tok, ()):
+                if c is None:
+                    table_hits[t] += 3
+                else:
+                    column_hits[(t, c)] += 2
+                    table_hits[t] += 1
+        # a column named verbatim ("per store_id") beats partial token matches
+        for word in set(_NAME_RE.findall((question or "").lower())):
+            for t, c in self.names.get(word, ()):
+                column_hits[(t, c)] += 4
+                table_hits[t] += 1
+        return table_hits, column_hits
+
+    def best_candidate(self, question: str):
+        """
+        Best (table, label, value) for question, or None.
+        Returns dict: table, label, value (None means COUNT(*)), agg, plot_type, score.
+        """
+        q = (question or "").lower()
+        trend = any(w in q for w in TREND_WORDS)
+        counting = any(w in q for w in COUNT_WORDS)
+        averaging = any(w in q for w in AVG_WORDS)
+        table_hits, column_hits = self._hits(question)
+
+        candidates = list(table_hits)
+        if self.default and self.default not in table_hits:
+            candidates.append(self.default)
+        best = None
+        for t in candidates:
+            roles = self.tables[t]
+            labels = roles["temporal"] + roles["categorical"] if trend else roles["categorical"] + roles["temporal"]
+            # identifiers only label a chart when the question names them ("per store_id")
+            labels = labels + [c for c in roles["identifier"] if column_hits.get((t, c))]
+            if not labels:
+                continue
+            label = max(labels, key=lambda c: column_hits.get((t, c), 0))
+            value = max(roles["numeric"], key=lambda c: column_hits.get((t, c), 0)) if roles["numeric"] else None
+            if value is not None and counting and not column_hits.get((t, value)):
+                value = None
+            if value is None and not counting and not roles["numeric"]:
+                continue
+            score = table_hits.get(t, 0) + column_hits.get((t, label), 0) + (column_hits.get((t, value), 0) if value else 0)
+            if best is None or score > best["score"]:
+                plot_type = "line" if trend and label in roles["temporal"] else "bar"
+                best = {"table": t, "label": label, "value": value, "agg": "AVG" if averaging else "SUM",
+                        "plot_type": plot_type, "score": score}
+        return best
+
+    def chart_sql(self, candidate: dict) -> str:
+        label = candidate["label"]
+        agg = f"{candidate['agg']}({candidate['value']})" if candidate["value"] else "COUNT(*)"
+        order = "label" if candidate["plot_type"] == "line" else "value DESC"
+        return f"SELECT {label} as label, {agg} as value FROM {candidate['table']} GROUP BY {label} ORDER BY {order};"
+
+
+_INDEXES = {}
+_LOCK = threading.Lock()
+
+def get_column_index(snapshot: dict) -> ColumnIndex:
+    """
+    ColumnIndex for a (cached) schema snapshot; rebuilt only when the snapshot is refreshed.
+    """
+    idx = _INDEXES.get(snapshot["key"])
+    if idx is None or idx.built_at != snapshot["built_at"]:
+        with _LOCK:
+            idx = _INDEXES.get(snapshot["key"])
+            if idx is None or idx.built_at != snapshot["built_at"]:
+                idx = ColumnIndex(snapshot)
+                _INDEXES[snapshot["key"]] = idx
+    return idx
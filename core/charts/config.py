@@ -0,0 +1,22 @@
+import os
+
+RENDER_WORKERS      = int(os.environ.get("CHART_RENDER_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+RENDER_QUEUE_DEPTH  = int(os.environ.get("CHART_RENDER_QUEUE_DEPTH", 16))
+RENDER_TIMEOUT      = float(os.environ.get("CHART_RENDER_TIMEOUT", 20))
+RENDER_DPI          = 150
+
+# "png" renders server side, "spec" returns a Vega-Lite spec for the browser
+CHART_OUTPUT        = os.environ.get("CHART_OUTPUT", "spec")
+
+# charting reuses the RAG result set when it has at most this many rows
+REUSE_MAX_ROWS      = int(os.environ.get("CHART_REUSE_MAX_ROWS", 5000))
+
+# upper bound on rendered marks: LTTB for lines, grid bins for scatter, top-N + "Other" for bar/pie
+MAX_POINTS          = int(os.environ.get("CHART_MAX_POINTS", 2000))
+MAX_CATEGORIES      = int(os.environ.get("CHART_MAX_CATEGORIES", 30))
+PIE_MAX_SLICES      = int(os.environ.get("CHART_PIE_MAX_SLICES", 12))
+
+# generated plot files: size/age budget enforced by the plot store sweeper
+PLOT_STORE_MAX_BYTES       = int(os.environ.get("PLOT_STORE_MAX_BYTES", 512 * 1024 * 1024))
+PLOT_STORE_MAX_AGE         = float(os.environ.get("PLOT_STORE_MAX_AGE", 24 * 3600))
+PLOT_STORE_SWEEP_INTERVAL  = float(os.environ.get("PLOT_STORE_SWEEP_INTERVAL", 600))
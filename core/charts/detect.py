@@ -0,0 +1,86 @@
+import datetime
+from decimal import Decimal
+from .config import PIE_MAX_SLICES
+
+TREND_WORDS = ("trend", "over time", "per month", "per year", "per day", "monthly", "yearly", "daily", "timeline")
+SHARE_WORDS = ("share", "percentage", "proportion", "breakdown", "distribution", "pie")
+
+
+def wants_chart(question: str) -> bool:
+    q = (question or "").lower()
+    keywords = ["plot","chart","trend","count","by","distribution","compare","histogram","per","per month","per year","over time"]
+    wants_plot = any(k in q for k in keywords)
+
+    if any(k in q for k in ["list ", "show ", "give ", "return "]) and "per" not in q:
+        wants_plot = wants_plot and ("per" in q or "by" in q or "trend" in q)
+    return wants_plot
+
+
+def _value_kind(v):
+    if isinstance(v, bool):
+        return "categorical"
+    if isinstance(v, (int, float, Decimal)):
+        return "numeric"
+    if isinstance(v, (datetime.date, datetime.datetime)):
+        return "temporal"
+    if isinstance(v, str):
+        try:
+            datetime.date.fromisoformat(v[:10])
+            return "temporal"
+        except ValueError:
+            return "categorical"
+    return "categorical"
+
+
+def is_identifier(name: str) -> bool:
+    name = str(name).lower()
+    return name == "id" or name.endswith("_id")
+
+
+def column_kinds(cols, rows) -> dict:
+    """
+    Classify each result column as numeric, temporal, categorical or identifier
+    from its name and non-null values.
+    """
+    kinds = {}
+    for i, c in enumerate(cols):
+        seen = {_value_kind(r[i]) for r in rows if r[i] is not None}
+        kind = seen.pop() if len(seen) == 1 else "categorical"
+        if kind == "numeric" and is_identifier(c):
+            kind = "identifier"
+        kinds[c] = kind
+    return kinds
+
+
+def choose_plot_for_result(question: str, cols, rows):
+    """
+    Decide plot type and columns for an already-fetched result set.
+    Returns {"plot_type", "x", "y"} or None when the rows cannot be charted as they are
+    (then the caller needs a query with a different aggregation).
+    """
+    if not cols or not rows or len(cols) < 2 or len(rows) < 2:
+        return None
+    cols = list(cols)
+    kinds = column_kinds(cols, rows)
+    numeric = [c for c in cols if kinds[c] == "numeric"]
+    temporal = [c for c in cols if kinds[c] == "temporal"]
+    # identifiers are poor values but fine as bar/pie labels
+    categorical = [c for c in cols if kinds[c] == "categorical"] + [c for c in cols if kinds[c] == "identifier"]
+    if not numeric:
+        return None
+
+    q = (question or "").lower()
+    if temporal:
+        return {"plot_type": "line", "x": temporal[0], "y": numeric[0]}
+    if categorical:
+        x = categorical[0]; y = numeric[0]
+        if any(w in q for w in SHARE_WORDS) and len({r[cols.index(x)] for r in rows}) <= PIE_MAX_SLICES:
+            return {"plot_type": "pie", "x": x, "y": y}
+        if any(w in q for w in TREND_WORDS):
+            return {"plot_type": "line", "x": x, "y": y}
+        return {"plot_type": "bar", "x": x, "y": y}
+    if len(numeric) >= 2:
+        if any(w in q for w in TREND_WORDS):
+            return {"plot_type": "line", "x": numeric[0], "y": numeric[1]}
+        return {"plot_type": "scatter", "x": numeric[0], "y": numeric[1]}
+    return None
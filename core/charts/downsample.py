@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+OTHER_LABEL = "Other"
+
+
+def lttb_indices(x, y, n_out: int):
+    """
+    Largest-Triangle-Three-Buckets: indices of n_out points that keep the visual shape of (x, y).
+    x must be sorted ascending. First and last points are always kept.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0] = 0
+    out[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        nxt_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:nxt_end].mean()
+        avg_y = y[end:nxt_end].mean()
+        xs = x[start:end]; ys = y[start:end]
+        area = np.abs((x[a] - avg_x) * (ys - y[a]) - (x[a] - xs) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def grid_bin(x, y, max_points: int):
+    """
+    Bin a scatter into a square grid of at most max_points cells.
+    Returns centre x, centre y and point count of every non-empty cell.
+    """
+    side = max(1, int(np.sqrt(max_points)))
+    counts, x_edges, y_edges = np.histogram2d(np.asarray(x, dtype=float), np.asarray(y, dtype=float), bins=side)
+    ix, iy = np.nonzero(counts)
+    xc = (x_edges[ix] + x_edges[ix + 1]) / 2
+    yc = (y_edges[iy] + y_edges[iy + 1]) / 2
+    return xc, yc, counts[ix, iy].astype(np.int64)
+
+
+def top_n(data, x, y, n: int):
+    """
+    Keep the n-1 largest values of y and sum the rest into an "Other" row.
+    """
+    if len(data) <= n:
+        return data
+    values = data[y].to_numpy(dtype=float)
+    keep = np.zeros(len(data), dtype=bool)
+    keep[np.argpartition(-values, n - 2)[:n - 1]] = True
+    head = data[keep]
+    other = pd.DataFrame({x: [OTHER_LABEL], y: [values[~keep].sum()]})
+    return pd.concat([pd.DataFrame({x: head[x].astype(str), y: head[y]}), other], ignore_index=True)
+
+
+def _as_float(series):
+    if series.dtype.kind == "M":
+        return series.astype("int64").to_numpy(dtype=float)
+    if series.dtype.kind in "iuf":
+        return series.to_numpy(dtype=float)
+    return np.arange(len(series), dtype=float)
+
+
+def downsample_plan(plan, max_points: int, max_categories: int, max_slices: int):
+    """
+    Reduce plan["data"] to a bounded number of marks before plotting:
+    LTTB for lines, grid binning for scatter, top-N plus "Other" for bar and pie.
+    Records plan["points"] = {"original": ..., "rendered": ...}.
+    """
+    data = plan["data"]; mark = plan["mark"]; x = plan["x"]; y = plan["y"]
+    original = len(data)
+    if mark == "line" and original > max_points:
+        if x is not None:
+            data = data.dropna(subset=[y])
+            if data[x].dtype.kind in "iufM":
+                data = data.sort_values(x, kind="stable")
+            idx = lttb_indices(_as_float(data[x]), data[y].to_numpy(dtype=float), max_points)
+        else:
+            # several series against the row index: union of each series' LTTB points
+            pos = np.arange(len(data), dtype=float)
+            picked = [lttb_indices(pos, data[s].fillna(0).to_numpy(dtype=float), max_points // max(1, len(plan["series"])))
+                      for s in plan["series"]]
+            idx = np.unique(np.concatenate(picked)) if picked else np.arange(len(data))
+        data = data.iloc[idx]
+    elif mark == "scatter" and x is not None and original > max_points \
+            and data[x].dtype.kind in "iuf" and data[y].dtype.kind in "iuf":
+        data = data.dropna(subset=[x, y])
+        xc, yc, counts = grid_bin(data[x], data[y], max_points)
+        data = pd.DataFrame({x: xc, y: yc, "count": counts})
+        plan["size"] = "count"
+    elif mark == "bar" and x is not None and y is not None:
+        data = top_n(data, x, y, max_categories)
+    elif mark == "bar" and original > max_categories:
+        data = data.head(max_categories)
+    elif mark == "pie":
+        data = top_n(data, x, y, max_slices)
+    plan["data"] = data
+    plan["points"] = {"original": int(original), "rendered": int(len(data))}
+    return plan
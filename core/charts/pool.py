@@ -0,0 +1,90 @@
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from .config import RENDER_WORKERS, RENDER_QUEUE_DEPTH, RENDER_TIMEOUT
+
+_LOG = logging.getLogger(__name__)
+
+
+class RenderPoolBusy(RuntimeError):
+    pass
+
+
+class RenderPool:
+    """
+    Process pool for chart rendering.
+    At most workers + queue_depth renders are admitted at once; further submits are
+    rejected with RenderPoolBusy instead of piling up behind a slow render.
+    """
+    def __init__(self, workers: int = RENDER_WORKERS, queue_depth: int = RENDER_QUEUE_DEPTH,
+                 timeout: float = RENDER_TIMEOUT):
+        self.workers = max(1, int(workers))
+        self.queue_depth = max(0, int(queue_depth))
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_depth)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a threaded server process is unsafe
+                ctx = multiprocessing.get_context("spawn")
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+            return self._executor
+
+    def _reset_executor(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _submit(self, cols, rows, plot_type, img_file, x, y, max_points):
+        # pandas/matplotlib are only imported once a chart is rendered
+        from .render import render_chart
+        args = (render_chart, cols, rows, plot_type, img_file, self.timeout, x, y, max_points)
+        try:
+            return self._get_executor().submit(*args)
+        except BrokenProcessPool:
+            self._reset_executor()
+            return self._get_executor().submit(*args)
+
+    def render(self, cols, rows, plot_type: str, img_file: str, x=None, y=None, max_points: int = None) -> dict:
+        if not self._slots.acquire(blocking=False):
+            raise RenderPoolBusy("Chart render queue is full, try again later")
+        try:
+            future = self._submit(cols, rows, plot_type, img_file, x, y, max_points)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        try:
+            # queued time counts against the deadline too; the worker enforces the render time itself
+            return future.result(timeout=self.timeout * 2 if self.timeout else None)
+        except FutureTimeout:
+            future.cancel()
+            raise TimeoutError(f"Chart rendering did not finish within {self.timeout}s")
+        except BrokenProcessPool:
+            _LOG.warning("Render pool broke, restarting workers")
+            self._reset_executor()
+            raise RuntimeError("Chart render worker crashed")
+
+    def shutdown(self):
+        self._reset_executor()
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def get_render_pool() -> RenderPool:
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = RenderPool()
+    return _POOL
+
+def render_in_pool(cols, rows, plot_type: str, img_file: str, x=None, y=None, max_points: int = None) -> dict:
+    return get_render_pool().render(cols, rows, plot_type, img_file, x, y, max_points)
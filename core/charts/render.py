@@ -0,0 +1,167 @@
+import signal
+from decimal import Decimal
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from .config import RENDER_DPI, MAX_POINTS, MAX_CATEGORIES, PIE_MAX_SLICES
+from .downsample import downsample_plan
+
+PLOT_TYPES = ("bar", "line", "pie", "scatter", "table")
+
+
+def _is_number(v) -> bool:
+    return v is None or (isinstance(v, (int, float, Decimal)) and not isinstance(v, bool))
+
+
+def build_frame(cols, rows):
+    try:
+        df = pd.DataFrame(rows, columns=cols)
+    except Exception:
+        df = pd.DataFrame([list(map(str, r)) for r in rows])
+        df.columns = [f"col_{i}" for i in range(len(df.columns))]
+    # NUMERIC/DECIMAL results arrive as Decimal objects; treat them as numbers
+    for c in df.columns:
+        if df[c].dtype == object and df[c].notna().any() and df[c].map(_is_number).all():
+            df[c] = pd.to_numeric(df[c].map(lambda v: float(v) if isinstance(v, Decimal) else v))
+    return df
+
+
+def chart_plan(df, plot_type: str, x=None, y=None, max_points: int = None):
+    """
+    Pick the columns for plot_type, aggregate them and downsample to at most
+    max_points marks. Shared by the PNG renderer and the chart-spec output so both
+    show the same data.
+    x/y, when given (e.g. by the chart detector), override the column selection.
+    Returns dict: mark, x, y (column names or None), series (list of y columns when
+    several are plotted against the row index), size (per-mark count column of a
+    binned scatter, or None), data (DataFrame to plot) and points (original and
+    rendered mark counts).
+    """
+    plan = _select_columns(df, plot_type, x, y)
+    return downsample_plan(plan, max_points or MAX_POINTS, MAX_CATEGORIES, PIE_MAX_SLICES)
+
+
+def _select_columns(df, plot_type, x, y):
+    plan = {"mark": plot_type, "x": None, "y": None, "series": [], "size": None, "data": df}
+    if plot_type not in PLOT_TYPES or plot_type == "table":
+        plan.update(mark="table", data=df.head(20))
+        return plan
+
+    if x in df.columns and y in df.columns and x != y:
+        if plot_type in ("bar", "pie"):
+            data = df.groupby(df[x].astype(str), sort=False)[y].sum().reset_index()
+        else:
+            data = df[[x, y]]
+        plan.update(x=x, y=y, data=data)
+        return plan
+
+    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+    if plot_type == "bar":
+        cat_cols = df.select_dtypes(include=['object', 'category', 'string']).columns.tolist()
+        if cat_cols and numeric_cols:
+            x = cat_cols[0]; y = numeric_cols[0]
+            plan.update(x=x, y=y, data=df.groupby(x, sort=False)[y].sum().reset_index())
+        elif numeric_cols and len(numeric_cols) >= 2:
+            plan.update(x=numeric_cols[0], y=numeric_cols[1], data=df[[numeric_cols[0], numeric_cols[1]]])
+        else:
+            plan.update(series=numeric_cols)
+
+    elif plot_type == "line":
+        plan.update(series=numeric_cols)
+
+    elif plot_type == "pie":
+        if numeric_cols:
+            x = df.columns[0]; y = numeric_cols[0]
+            if x == y:
+                data = pd.DataFrame({"label": df[y].astype(str), y: df[y]})
+                x = "label"
+            else:
+                data = pd.DataFrame({x: df[x].astype(str), y: df[y]})
+            plan.update(x=x, y=y, data=data)
+        else:
+            x = df.columns[1] if df.shape[1] >= 2 else df.columns[0]
+            counts = df[x].astype(str).value_counts()
+            plan.update(x=x, y="count", data=pd.DataFrame({x: counts.index, "count": counts.values}))
+
+    elif plot_type == "scatter":
+        if len(numeric_cols) >= 2:
+            plan.update(x=numeric_cols[0], y=numeric_cols[1], data=df[[numeric_cols[0], numeric_cols[1]]])
+        elif df.shape[1] >= 2:
+            plan.update(x=df.columns[0], y=df.columns[1], data=df[[df.columns[0], df.columns[1]]])
+        else:
+            plan.update(mark="bar", series=numeric_cols)
+    return plan
+
+
+def _draw_table(ax, df):
+    ax.axis('off')
+    tbl = ax.table(cellText=df.values, colLabels=df.columns, loc='center')
+    tbl.auto_set_font_size(False)
+    tbl.set_fontsize(8)
+
+
+def draw_chart(fig, plan):
+    """
+    Draw a chart_plan onto fig.
+    Returns True when the figure should be saved with a tight bounding box.
+    """
+    ax = fig.add_subplot(111)
+    mark = plan["mark"]; data = plan["data"]; x = plan["x"]; y = plan["y"]
+    if mark == "table":
+        _draw_table(ax, data)
+        return True
+
+    if mark == "pie":
+        ax.pie(data[y], labels=data[x].astype(str), autopct='%1.1f%%')
+    elif mark == "scatter" and plan["size"]:
+        counts = data[plan["size"]]
+        sc = ax.scatter(data[x], data[y], s=8 + 40 * counts / counts.max(), c=counts, cmap="viridis")
+        fig.colorbar(sc, ax=ax, label="points")
+        ax.set_xlabel(x); ax.set_ylabel(y)
+    elif mark == "scatter":
+        try:
+            data.plot(kind="scatter", x=x, y=y, ax=ax)
+        except Exception:
+            ax.clear()
+            data.plot(kind="bar", ax=ax)
+    elif x is not None:
+        data.plot(kind=mark, x=x, y=y, ax=ax, legend=False)
+    else:
+        data.plot(kind=mark, y=plan["series"] or None, ax=ax)
+    return False
+
+
+def _on_timeout(signum, frame):
+    raise TimeoutError("Chart rendering timed out")
+
+
+def render_chart(cols, rows, plot_type: str, img_file: str, timeout: float = None, x=None, y=None,
+                 max_points: int = None):
+    """
+    Render rows to a PNG at img_file using a private Figure/FigureCanvasAgg,
+    so no global pyplot state is shared between renders.
+    Runs inside a render worker process; timeout (seconds) is enforced with SIGALRM.
+    Returns the original and rendered point counts.
+    """
+    use_alarm = bool(timeout) and hasattr(signal, "setitimer")
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        plan = chart_plan(build_frame(cols, rows), plot_type, x, y, max_points)
+        fig = Figure(figsize=(8,4))
+        FigureCanvasAgg(fig)
+        tight_bbox = draw_chart(fig, plan)
+        if tight_bbox:
+            fig.savefig(img_file, bbox_inches='tight', dpi=RENDER_DPI)
+        else:
+            fig.tight_layout()
+            fig.savefig(img_file, dpi=RENDER_DPI)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    return plan["points"]
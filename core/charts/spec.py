@@ -0,0 +1,89 @@
+import json
+
+VEGA_LITE_SCHEMA = "https://vega.github.io/schema/vega-lite/v5.json"
+
+
+def _field_type(series) -> str:
+    kind = series.dtype.kind
+    if kind in "iuf":
+        return "quantitative"
+    if kind == "M":
+        return "temporal"
+    return "nominal"
+
+
+def _records(data) -> list:
+    return json.loads(data.to_json(orient="records", date_format="iso", default_handler=str))
+
+
+def build_chart_spec(cols, rows, plot_type: str, x=None, y=None, max_points: int = None) -> dict:
+    """
+    Build a compact Vega-Lite spec (data inlined) for the browser to render.
+    Uses the same column selection, aggregation and downsampling as the PNG renderer;
+    point counts are reported under usermeta.points.
+    """
+    from .render import build_frame, chart_plan  # pandas: loaded on the first chart only
+    plan = chart_plan(build_frame(cols, rows), plot_type, x, y, max_points)
+    data = plan["data"]; mark = plan["mark"]; x = plan["x"]; y = plan["y"]
+    spec = {"$schema": VEGA_LITE_SCHEMA, "width": "container", "height": 300,
+            "usermeta": {"points": plan["points"]}}
+
+    if mark == "table":
+        # not a Vega-Lite mark: the chat page renders these values as an HTML table
+        spec.update(mark="table", data={"values": _records(data)})
+        return spec
+
+    if mark == "pie":
+        spec.update(
+            mark={"type": "arc", "tooltip": True},
+            encoding={
+                "theta": {"field": y, "type": "quantitative"},
+                "color": {"field": x, "type": "nominal"},
+            },
+        )
+    elif plan["size"]:
+        spec.update(
+            mark={"type": "circle", "tooltip": True},
+            encoding={
+                "x": {"field": x, "type": "quantitative"},
+                "y": {"field": y, "type": "quantitative"},
+                "size": {"field": plan["size"], "type": "quantitative", "title": "points"},
+                "color": {"field": plan["size"], "type": "quantitative", "title": "points"},
+            },
+        )
+    elif x is not None:
+        x_type = _field_type(data[x])
+        if mark == "bar" and x_type == "quantitative":
+            x_type = "ordinal"
+        spec.update(
+            mark={"type": "point" if mark == "scatter" else mark, "tooltip": True},
+            encoding={
+                "x": {"field": x, "type": x_type, "sort": None},
+                "y": {"field": y, "type": _field_type(data[y])},
+            },
+        )
+    else:
+        # several numeric columns against the row index, like DataFrame.plot()
+        series = [str(c) for c in plan["series"]]
+        if not series:
+            raise ValueError("No numeric columns to plot")
+        data = data[plan["series"]].reset_index(drop=True)
+        data.columns = series
+        data.insert(0, "row", data.index)
+        spec.update(
+            mark={"type": mark, "tooltip": True},
+            transform=[{"fold": series, "as": ["series", "value"]}],
+            encoding={
+                "x": {"field": "row", "type": "ordinal" if mark == "bar" else "quantitative"},
+                "y": {"field": "value", "type": "quantitative"},
+                "color": {"field": "series", "type": "nominal"},
+            },
+        )
+        if mark == "bar":
+            spec["encoding"]["xOffset"] = {"field": "series"}
+
+    if mark in ("line", "scatter"):
+        # wheel zoom / drag pan on continuous axes
+        spec["params"] = [{"name": "zoom", "select": "interval", "bind": "scales"}]
+    spec["data"] = {"values": _records(data)}
+    return spec
@@ -0,0 +1,145 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from .config import PLOT_STORE_MAX_BYTES, PLOT_STORE_MAX_AGE, PLOT_STORE_SWEEP_INTERVAL
+
+_LOG = logging.getLogger(__name__)
+
+
+class PlotStore:
+    """
+    Generated plot files under <root>/plots, sharded by the first two hex digits of the key.
+    The store is kept within a size and age budget: sweep() drops expired files, then evicts
+    the oldest ones (by mtime, i.e. creation: plots are served as static media, so reads are
+    not tracked) until the size budget fits.
+    """
+    def __init__(self, root, url_prefix: str = "/media/", max_bytes: int = PLOT_STORE_MAX_BYTES,
+                 max_age: float = PLOT_STORE_MAX_AGE, subdir: str = "plots"):
+        self.root = os.path.join(str(root), subdir)
+        self.url_prefix = url_prefix.rstrip('/') + "/" + subdir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._sweeper = None
+        self._lock = threading.Lock()
+
+    def _relpath(self, key: str) -> str:
+        return os.path.join(key[5:7], key)
+
+    def allocate(self, ext: str = "png"):
+        """
+        Reserve a new plot key and return (key, absolute file path).
+        """
+        key = f"plot_{uuid.uuid4().hex}.{ext}"
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return key, path
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, self._relpath(key))
+
+    def url(self, key: str) -> str:
+        return self.url_prefix + "/" + self._relpath(key).replace(os.sep, "/")
+
+    def discard(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _entries(path: str) -> list:
+        try:
+            with os.scandir(path) as it:
+                return list(it)
+        except FileNotFoundError:
+            return []
+
+    def _scan(self):
+        # other processes sweep the same media root: files or shards may vanish mid-scan
+        files = []
+        for shard in self._entries(self.root):
+            for e in self._entries(shard.path) if shard.is_dir() else [shard]:
+                if not e.name.startswith("plot_"):
+                    continue
+                try:
+                    if not e.is_file():
+                        continue
+                    st = e.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, e.path))
+        return files
+
+    def stats(self) -> dict:
+        files = self._scan()
+        return {"files": len(files), "bytes": sum(f[1] for f in files)}
+
+    def sweep(self, dry_run: bool = False) -> dict:
+        """
+        Enforce the age and size budget. Returns counts before/after and what was removed.
+        """
+        with self._lock:
+            files = sorted(self._scan())
+            total = sum(f[1] for f in files)
+            before = {"files": len(files), "bytes": total}
+            cutoff = time.time() - self.max_age if self.max_age else None
+            removed = vanished = freed = 0
+            for mtime, size, path in files:
+                expired = cutoff is not None and mtime < cutoff
+                if not expired and (not self.max_bytes or total <= self.max_bytes):
+                    break
+                total -= size
+                if not dry_run:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        # removed by another process since the scan: gone, but not freed by us
+                        vanished += 1
+                        continue
+                removed += 1
+                freed += size
+            return {"before": before, "removed": removed, "freed_bytes": freed,
+                    "after": {"files": before["files"] - removed - vanished, "bytes": total}}
+
+    def start_sweeper(self, interval: float = PLOT_STORE_SWEEP_INTERVAL):
+        """
+        Sweep periodically from a daemon thread (once per process).
+        """
+        with self._lock:
+            if self._sweeper is not None or not interval:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_loop, args=(interval,),
+                                             name="plot-store-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self, interval):
+        while True:
+            try:
+                res = self.sweep()
+                if res["removed"]:
+                    _LOG.info("Plot store sweep removed %d files (%d bytes)", res["removed"], res["freed_bytes"])
+            except Exception:
+                _LOG.exception("Plot store sweep failed")
+            time.sleep(interval)
+
+
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+def get_plot_store(root, url_prefix: str = "/media/", start_sweeper: bool = True) -> PlotStore:
+    """
+    Process-wide PlotStore per media root; the first call starts its periodic sweeper.
+    """
+    key = (str(root), url_prefix)
+    store = _STORES.get(key)
+    if store is None:
+        with _STORES_LOCK:
+            store = _STORES.get(key)
+            if store is None:
+                store = PlotStore(root, url_prefix)
+                _STORES[key] = store
+    if start_sweeper:
+        store.start_sweeper()
+    return store
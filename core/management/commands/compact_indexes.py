@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from core.models import ConnectionConfig
+from core.views import conn_str_for
+from core.rag.schema_cache import url_key
+from core.rag.config import CHROMA_DIR, NUMPY_INDEX_DIR
+from core.rag.vector_index import list_indexes, drop_index, LEGACY_COLLECTION
+
+
+class Command(BaseCommand):
+    help = ("Report schema vector index sizes and drop indexes of deleted connections (and the legacy "
+            "shared Chroma collection). Live indexes hold one entry per table already.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chroma-dir", default=CHROMA_DIR, help="Chroma persist directory (default: CHROMA_DIR)")
+        parser.add_argument("--numpy-dir", default=NUMPY_INDEX_DIR, help="NumPy index directory (default: NUMPY_INDEX_DIR)")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be done")
+
+    def _live_namespaces(self):
+        live = set()
+        for conn in ConnectionConfig.objects.all():
+            try:
+                live.add(url_key(conn_str_for(conn)))
+            except ValueError:
+                continue
+        return live
+
+    def _report(self, title, indexes):
+        self.stdout.write(title)
+        for ix in indexes:
+            docs = "-" if ix["documents"] is None else ix["documents"]
+            size = "-" if ix["bytes"] is None else f"{ix['bytes'] / 1e6:.2f} MB"
+            self.stdout.write(f"  {ix['backend']:<7} {ix['name']:<32} {docs:>7} docs  {size:>10}")
+
+    def handle(self, *args, **opts):
+        chroma_dir, numpy_dir, dry = opts["chroma_dir"], opts["numpy_dir"], opts["dry_run"]
+        live = self._live_namespaces()
+        indexes = list_indexes(chroma_dir, numpy_dir)
+        self._report("Before:", indexes)
+
+        for ix in indexes:
+            if ix["name"] == "(total)":
+                continue
+            orphan = ix["namespace"] not in live if ix["namespace"] else ix["name"] == LEGACY_COLLECTION
+            if orphan:
+                self.stdout.write(f"{'Would drop' if dry else 'Dropping'} {ix['backend']} index {ix['name']}")
+                if not dry:
+                    drop_index(ix["backend"], ix["name"], chroma_dir, numpy_dir)
+
+        if not dry:
+            self._report("After:", list_indexes(chroma_dir, numpy_dir))
@@ -0,0 +1,138 @@
+import time
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Max
+from django.utils import timezone
+from core.models import ConnectionConfig, QueryLog
+from core.views import conn_str_for
+from core.mcp_client import call_tool
+from core.rag.db_utils import connect_db
+from core.rag.llm_utils import load_llm, load_embeddings, llm_priority, PRIORITY_BACKGROUND
+from core.rag.retriever import build_retriever
+from core.rag.rag_pipeline import RAGPipeline
+from core.rag.answer_cache import get_answer_cache, answer_fingerprint
+from core.charts.config import REUSE_MAX_ROWS
+
+
+class Command(BaseCommand):
+    help = ("Pre-compute the SQL (and optionally results and charts) of the most frequent questions per "
+            "connection from the query log, so the next day's repeats skip the LLM. Meant for an off-peak cron job.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connection", type=int, action="append", dest="connections",
+                            help="ConnectionConfig id (repeatable, default: all)")
+        parser.add_argument("--days", type=int, default=30, help="Query log window in days (default: 30)")
+        parser.add_argument("--top", type=int, default=20, help="Questions per connection (default: 20)")
+        parser.add_argument("--min-count", type=int, default=2, help="Minimum times asked (default: 2)")
+        parser.add_argument("--results", action="store_true", help="Also run the SQL and cache the result")
+        parser.add_argument("--charts", action="store_true", help="Also cache the chart of each result (implies --results)")
+        parser.add_argument("--reuse-logged-sql", action="store_true",
+                            help="Reuse the last successful logged SQL when it still validates, instead of calling the LLM")
+        parser.add_argument("--workers", type=int, default=2, help="Connections processed in parallel (default: 2)")
+        parser.add_argument("--dry-run", action="store_true", help="Only list the questions that would be pre-warmed")
+
+    def popular_questions(self, conn, since, top, min_count):
+        # follow-ups ("now only for 2024") only make sense after the turn they refine
+        groups = (QueryLog.objects.filter(connection=conn, success=True, follow_up=False, created_at__gte=since)
+                  .values("normalized_question")
+                  .annotate(asked=Count("id"), last_id=Max("id"))
+                  .filter(asked__gte=min_count)
+                  .order_by("-asked", "-last_id")[:top])
+        latest = QueryLog.objects.in_bulk([g["last_id"] for g in groups])
+        return [(latest[g["last_id"]], g["asked"]) for g in groups]
+
+    def _chart(self, conn, question, cols, rows):
+        detector = call_tool("chart_detector", conn, {"question": question, "cols": cols, "sample_rows": rows[:50]})
+        if not detector.get("plot"):
+            return None
+        if detector.get("reuse"):
+            render = {"cols": cols, "rows": rows, "limit_rows": len(rows), "x": detector.get("x"), "y": detector.get("y")}
+        elif detector.get("sql"):
+            render = {"sql": detector["sql"], "limit_rows": 500}
+        else:
+            return None
+        # inline spec only: plot files are swept, a cached URL could outlive its file
+        return call_tool("chart_renderer", conn, {**render, "plot_type": detector.get("plot_type") or "bar", "output": "spec"})
+
+    def _prewarm_background(self, *args):
+        # batch work: queue as background (longer LLM_BACKGROUND_TIMEOUT wait for a slot)
+        with llm_priority(PRIORITY_BACKGROUND):
+            return self._prewarm_connection(*args)
+
+    def _prewarm_connection(self, conn, questions, opts, llm, embeddings):
+        engine = connect_db(conn_str_for(conn))
+        try:
+            retriever = build_retriever(engine, embeddings)
+            pipeline = RAGPipeline(llm, retriever, engine, conn.custom_prompt or "")
+            fingerprint = answer_fingerprint(pipeline.schema, pipeline.user_prompt)
+            entries, failed = [], 0
+            for log, _ in questions:
+                try:
+                    sql = None
+                    if opts["reuse_logged_sql"] and log.sql:
+                        try:
+                            pipeline.validate_sql(log.sql)
+                            sql = log.sql
+                        except ValueError:
+                            pass
+                    sql = sql or pipeline.generate_sql(log.question)
+                    entry = {"question": log.question, "sql": sql, "fingerprint": fingerprint, "created": time.time()}
+                    if opts["results"] or opts["charts"]:
+                        rows = [list(r) for r in pipeline.execute(sql)]
+                        if len(rows) <= REUSE_MAX_ROWS:
+                            entry.update(columns=pipeline.columns, rows=rows, results_at=time.time())
+                            if opts["charts"] and rows:
+                                chart = self._chart(conn, log.question, pipeline.columns, rows)
+                                if chart:
+                                    entry["chart"] = chart
+                    else:
+                        pipeline.validate_sql(sql)
+                    entries.append(entry)
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"connection {conn.pk}: {log.question!r}: {e}")
+            get_answer_cache().replace(pipeline.schema["key"], entries)
+            return len(entries), failed
+        finally:
+            engine.dispose()
+
+    def handle(self, *args, **opts):
+        conns = ConnectionConfig.objects.all()
+        if opts["connections"]:
+            conns = conns.filter(pk__in=opts["connections"])
+            missing = set(opts["connections"]) - set(conns.values_list("pk", flat=True))
+            if missing:
+                raise CommandError(f"Unknown connection id(s): {', '.join(map(str, sorted(missing)))}")
+        since = timezone.now() - datetime.timedelta(days=opts["days"])
+        work = []
+        for conn in conns:
+            questions = self.popular_questions(conn, since, opts["top"], opts["min_count"])
+            if not questions:
+                continue
+            work.append((conn, questions))
+            if opts["dry_run"]:
+                self.stdout.write(f"connection {conn.pk} ({conn.database_name}):")
+                for log, asked in questions:
+                    self.stdout.write(f"  {asked:>5}x  {log.question}")
+        if opts["dry_run"] or not work:
+            if not work:
+                self.stdout.write("No frequent questions in the query log")
+            return
+
+        llm, embeddings = load_llm(), load_embeddings()
+        started = time.perf_counter()
+        failures = 0
+        with ThreadPoolExecutor(max_workers=max(1, opts["workers"])) as pool:
+            jobs = {conn: pool.submit(self._prewarm_background, conn, questions, opts, llm, embeddings)
+                    for conn, questions in work}
+            for conn, job in jobs.items():
+                try:
+                    cached, failed = job.result()
+                except Exception as e:
+                    failures += 1
+                    self.stderr.write(f"connection {conn.pk} ({conn.database_name}): FAILED: {e}")
+                    continue
+                failures += failed
+                self.stdout.write(f"connection {conn.pk} ({conn.database_name}): {cached} answers cached, {failed} failed")
+        self.stdout.write(f"Pre-warm finished in {time.perf_counter() - started:.2f}s, {failures} failure(s)")
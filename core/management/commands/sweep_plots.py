@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.charts.store import get_plot_store
+
+
+class Command(BaseCommand):
+    help = "Evict generated plot files from MEDIA_ROOT/plots to stay within the plot store size/age budget."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-mb", type=float, help="Size budget in MB (default: PLOT_STORE_MAX_BYTES)")
+        parser.add_argument("--max-age-hours", type=float, help="Maximum file age in hours (default: PLOT_STORE_MAX_AGE)")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+
+    def handle(self, *args, **opts):
+        store = get_plot_store(settings.MEDIA_ROOT, settings.MEDIA_URL, start_sweeper=False)
+        if opts["max_mb"] is not None:
+            store.max_bytes = int(opts["max_mb"] * 1024 * 1024)
+        if opts["max_age_hours"] is not None:
+            store.max_age = opts["max_age_hours"] * 3600
+
+        res = store.sweep(dry_run=opts["dry_run"])
+        verb = "Would remove" if opts["dry_run"] else "Removed"
+        self.stdout.write(
+            f"Before: {res['before']['files']} files, {res['before']['bytes'] / 1e6:.1f} MB\n"
+            f"{verb}: {res['removed']} files, {res['freed_bytes'] / 1e6:.1f} MB\n"
+            f"After: {res['after']['files']} files, {res['after']['bytes'] / 1e6:.1f} MB"
+        )
@@ -0,0 +1,103 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from core.models import ConnectionConfig
+from core.views import conn_str_for
+from core.rag.db_utils import connect_db
+from core.rag.llm_utils import load_llm, load_embeddings
+from core.rag.retriever import build_retriever
+from core.rag.schema_cache import get_schema_snapshot, save_snapshot
+from core.rag.lexical import get_lexical_index
+from core.rag.join_graph import get_join_graph
+from core.charts.column_index import get_column_index
+
+
+class Command(BaseCommand):
+    help = ("Build schema snapshots and retriever indexes for connections in parallel, persist them to disk, "
+            "load the Whisper model(s) and prime the LLM/embedding endpoints. Exits non-zero if any step fails.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connection", type=int, action="append", dest="connections",
+                            help="ConnectionConfig id (repeatable, default: all)")
+        parser.add_argument("--workers", type=int, default=4, help="Connections warmed in parallel (default: 4)")
+        parser.add_argument("--whisper-model", action="append", dest="whisper_models",
+                            help="Whisper model size to load (repeatable, default: tiny and base)")
+        parser.add_argument("--skip-whisper", action="store_true")
+        parser.add_argument("--skip-llm", action="store_true", help="Do not call the LLM/embedding endpoints")
+
+    def _timed(self, timings, name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timings.append((name, time.perf_counter() - start))
+
+    def _warm_connection(self, conn, embeddings):
+        timings = []
+        engine = self._timed(timings, "connect", connect_db, conn_str_for(conn))
+        try:
+            snapshot = self._timed(timings, "schema", get_schema_snapshot, engine, refresh=True)
+            self._timed(timings, "persist", save_snapshot, snapshot)
+            self._timed(timings, "indexes", lambda: (get_lexical_index(snapshot), get_join_graph(snapshot),
+                                                      get_column_index(snapshot)))
+            if embeddings is not None:
+                self._timed(timings, "retriever", build_retriever, engine, embeddings)
+        finally:
+            engine.dispose()
+        return timings, len(snapshot["tables"])
+
+    def _warm_whisper(self, sizes):
+        import whisper
+        timings = []
+        for size in sizes:
+            # downloads the checkpoint on first use and checks that it loads
+            self._timed(timings, f"whisper:{size}", whisper.load_model, size, device="cpu")
+        return timings
+
+    def _warm_llm(self):
+        timings = []
+        self._timed(timings, "embeddings", load_embeddings().embed_query, "warm up")
+        self._timed(timings, "llm", load_llm().generate, "Reply with OK.")
+        return timings
+
+    def _format(self, timings):
+        return ", ".join(f"{name} {secs:.2f}s" for name, secs in timings)
+
+    def handle(self, *args, **opts):
+        conns = ConnectionConfig.objects.all()
+        if opts["connections"]:
+            conns = conns.filter(pk__in=opts["connections"])
+            missing = set(opts["connections"]) - set(conns.values_list("pk", flat=True))
+            if missing:
+                raise CommandError(f"Unknown connection id(s): {', '.join(map(str, sorted(missing)))}")
+        conns = list(conns)
+        embeddings = None if opts["skip_llm"] else load_embeddings()
+
+        failures = 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, opts["workers"])) as pool:
+            jobs = {}
+            if not opts["skip_whisper"]:
+                jobs["whisper"] = pool.submit(self._warm_whisper, opts["whisper_models"] or ["tiny", "base"])
+            if not opts["skip_llm"]:
+                jobs["llm"] = pool.submit(self._warm_llm)
+            for conn in conns:
+                jobs[f"connection {conn.pk} ({conn.database_name})"] = pool.submit(self._warm_connection, conn, embeddings)
+
+            for label, job in jobs.items():
+                try:
+                    res = job.result()
+                except Exception as e:
+                    failures += 1
+                    self.stderr.write(f"{label}: FAILED: {e}")
+                    continue
+                if label.startswith("connection"):
+                    timings, n_tables = res
+                    total = sum(t for _, t in timings)
+                    self.stdout.write(f"{label}: {n_tables} tables, {self._format(timings)}, total {total:.2f}s")
+                else:
+                    self.stdout.write(f"{label}: {self._format(res)}")
+
+        self.stdout.write(f"Warm-up finished in {time.perf_counter() - started:.2f}s, {failures} failure(s)")
+        if failures:
+            raise CommandError(f"{failures} warm-up step(s) failed")
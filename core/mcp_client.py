@@ -1,9 +1,15 @@
 import os
+import json
 import requests
 from django.shortcuts import get_object_or_404
 from core.models import ConnectionConfig
+from core.metrics import span
+from core.rag.db_utils import json_default
+from core.profiling import current_request, PROFILE_HEADER, PROFILE_PARENT_HEADER
 
 MCP_URL = os.environ.get("MCP_URL", "http://127.0.0.1:5001")
+# shared with the tools server; lets a profiled Django request profile its tool calls too
+MCP_PROFILE_TOKEN = os.environ.get("MCP_PROFILE_TOKEN")
 
 def build_conn_str(conn):
     DIALECT_MAP = {
@@ -32,9 +38,20 @@ def call_tool(tool_name: str, conn, input_payload: dict, timeout: int = 60):
     else:
         conn_str = conn
     payload = {"tool": tool_name, "input": {"conn_str": conn_str, **(input_payload or {})}}
-    resp = requests.post(f"{MCP_URL}/call", json=payload, timeout=timeout)
-    resp.raise_for_status()
-    data = resp.json()
+    headers = {"Content-Type": "application/json"}
+    profiling = current_request()
+    if profiling and MCP_PROFILE_TOKEN:
+        headers[PROFILE_HEADER] = MCP_PROFILE_TOKEN
+        headers[PROFILE_PARENT_HEADER] = profiling["id"]
+    with span(f"mcp_call.{tool_name}"):
+        resp = requests.post(
+            f"{MCP_URL}/call",
+            data=json.dumps(payload, default=json_default),
+            headers=headers,
+            timeout=timeout,
+        )
+        resp.raise_for_status()
+        data = resp.json()
     if "result" in data:
         return data["result"]
     if "error" in data:
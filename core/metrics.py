@@ -0,0 +1,207 @@
+"""
+Process-local timing spans and Prometheus text exposition.
+Django-free so the FastAPI tools server can expose the same metrics; every process
+(and every worker of a multi-process server) keeps and serves its own registry.
+"""
+import time
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_LOG = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+COUNT_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+TOKEN_FIELDS = ("prompt_tokens", "completion_tokens", "context_tokens")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None) -> str:
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, n) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, c in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += c
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, ('le', le))} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+_METRICS = {}
+_METRICS_LOCK = threading.Lock()
+
+def _get_or_create(cls, name, help, labelnames, **kwargs):
+    metric = _METRICS.get(name)
+    if metric is None:
+        with _METRICS_LOCK:
+            metric = _METRICS.get(name)
+            if metric is None:
+                metric = _METRICS[name] = cls(name, help, labelnames, **kwargs)
+    return metric
+
+
+def counter(name: str, help: str, labelnames=()) -> Counter:
+    return _get_or_create(Counter, name, help, labelnames)
+
+
+def gauge(name: str, help: str, labelnames=()) -> Gauge:
+    return _get_or_create(Gauge, name, help, labelnames)
+
+
+def histogram(name: str, help: str, labelnames=(), buckets=SECONDS_BUCKETS) -> Histogram:
+    return _get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+
+STAGE_SECONDS = histogram("rag_stage_duration_seconds", "Duration of chat pipeline stages.", ("stage", "status"))
+STAGE_ROWS = histogram("rag_stage_rows", "Rows returned or charted by a stage.", ("stage",), COUNT_BUCKETS)
+STAGE_TOKENS = counter("rag_stage_tokens_total", "Tokens sent to or generated by a stage.", ("stage", "kind"))
+
+_LISTENERS = []
+
+def add_span_listener(fn):
+    """
+    Call fn(stage, status, seconds, attrs) after every span (benchmarks collect raw timings this way).
+    """
+    _LISTENERS.append(fn)
+
+
+def remove_span_listener(fn):
+    if fn in _LISTENERS:
+        _LISTENERS.remove(fn)
+
+
+_RECORDER = ContextVar("span_recorder", default=None)
+
+@contextmanager
+def record_spans():
+    """
+    Collect {stage: seconds} of the spans finished inside the block in this context (one
+    request), e.g. for the query log. Repeated stages are summed.
+    """
+    timings = {}
+    token = _RECORDER.set(timings)
+    try:
+        yield timings
+    finally:
+        _RECORDER.reset(token)
+
+
+@contextmanager
+def span(stage: str, **fields):
+    """
+    Time a pipeline stage. The yielded dict takes result fields (rows, prompt_tokens,
+    completion_tokens, context_tokens ...) that are aggregated and logged with the timing.
+
+        with span("sql_execute") as s:
+            rows = ...
+            s["rows"] = len(rows)
+    """
+    attrs = dict(fields)
+    status = "ok"
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage, status=status)
+        if isinstance(attrs.get("rows"), (int, float)):
+            STAGE_ROWS.observe(attrs["rows"], stage=stage)
+        for kind in TOKEN_FIELDS:
+            if isinstance(attrs.get(kind), (int, float)):
+                STAGE_TOKENS.inc(attrs[kind], stage=stage, kind=kind.replace("_tokens", ""))
+        _LOG.info("span stage=%s status=%s ms=%.1f %s", stage, status, elapsed * 1000,
+                  " ".join(f"{k}={v}" for k, v in attrs.items()))
+        timings = _RECORDER.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+        for fn in list(_LISTENERS):
+            fn(stage, status, elapsed, attrs)
+
+
+def render_prometheus() -> str:
+    """
+    All registered metrics in the Prometheus text exposition format (version 0.0.4).
+    """
+    with _METRICS_LOCK:
+        metrics = list(_METRICS.values())
+    lines = []
+    for m in metrics:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -0,0 +1,38 @@
+from django.conf import settings
+from core.profiling import (profile_request, PROFILE_HEADER, PROFILE_ID_HEADER, PROFILE_QUERY_PARAM)
+
+
+def profiling_requested(request) -> bool:
+    """
+    Staff users ask for a profile with an X-Profile: 1 header or a ?_profile=1 query flag.
+    """
+    if not getattr(settings, 'PROFILING_ENABLED', True):
+        return False
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_staff:
+        return False
+    flag = request.headers.get(PROFILE_HEADER) or request.GET.get(PROFILE_QUERY_PARAM)
+    return flag not in (None, '', '0', 'false')
+
+
+class ProfilingMiddleware:
+    """
+    cProfile a single request on demand and store it under settings.PROFILE_DIR
+    (listed on the staff "profiles" page). Must come after AuthenticationMiddleware.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling_requested(request):
+            return self.get_response(request)
+        meta = {
+            'source': 'django',
+            'label': f"{request.method} {request.path}",
+            'user': request.user.get_username(),
+        }
+        with profile_request(str(settings.PROFILE_DIR), meta, getattr(settings, 'PROFILE_KEEP', 100)) as prof:
+            response = self.get_response(request)
+        if prof is not None:
+            response[PROFILE_ID_HEADER] = prof['id']
+        return response
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question', models.TextField()),
+                ('normalized_question', models.CharField(max_length=500)),
+                ('is_voice', models.BooleanField(default=False)),
+                ('sql', models.TextField(blank=True)),
+                ('row_count', models.IntegerField(blank=True, null=True)),
+                ('success', models.BooleanField(default=False)),
+                ('error', models.TextField(blank=True)),
+                ('timings', models.JSONField(blank=True, default=dict)),
+                ('total_ms', models.FloatField(blank=True, null=True)),
+                ('cache', models.CharField(blank=True, max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('connection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='query_logs', to='core.connectionconfig')),
+                ('owner', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='query_logs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['connection', 'normalized_question'], name='core_queryl_connect_ff99a4_idx')],
+            },
+        ),
+    ]
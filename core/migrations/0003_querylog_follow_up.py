@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_querylog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='querylog',
+            name='follow_up',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -29,4 +29,36 @@ class AudioQuery(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.owner.username} @ {self.created_at:%Y-%m-%d %H:%M}"
\ No newline at end of file
+        return f"{self.owner.username} @ {self.created_at:%Y-%m-%d %H:%M}"
+
+class QueryLog(models.Model):
+    """
+    One chat turn: what was asked on which connection, the SQL it produced and how it went.
+    Mined by `manage.py prewarm` for the most frequent questions.
+    """
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='query_logs')
+    connection = models.ForeignKey(ConnectionConfig, on_delete=models.CASCADE, related_name='query_logs')
+    question = models.TextField()
+    # lower-cased, whitespace/punctuation-normalised question used to group repeats
+    normalized_question = models.CharField(max_length=500)
+    is_voice = models.BooleanField(default=False)
+    sql = models.TextField(blank=True)
+    row_count = models.IntegerField(null=True, blank=True)
+    success = models.BooleanField(default=False)
+    error = models.TextField(blank=True)
+    # {stage: milliseconds} from core.metrics spans
+    timings = models.JSONField(default=dict, blank=True)
+    total_ms = models.FloatField(null=True, blank=True)
+    # "" (computed), "sql" (pre-warmed SQL), "result" (pre-warmed result) or "context" (follow-up
+    # that reused the previous turn's schema context)
+    cache = models.CharField(max_length=10, blank=True)
+    # refers back to the previous turn ("now only for 2024"), meaningless as a standalone question
+    follow_up = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['connection', 'normalized_question'])]
+
+    def __str__(self):
+        return f"{self.connection_id}: {self.question[:60]}"
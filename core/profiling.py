@@ -0,0 +1,163 @@
+"""
+On-demand cProfile capture of single requests.
+Django-free so the FastAPI tools server can use the same store: every profile is a raw
+pstats file (<id>.prof) plus a JSON summary (<id>.json) with its top functions.
+"""
+import os
+import io
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_LOG = logging.getLogger(__name__)
+
+TOP_FUNCTIONS = 25
+# request header asking for a profile (staff users in Django, MCP_PROFILE_TOKEN on the tools server)
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+# id of the Django request profile an MCP tool call was made from
+PROFILE_PARENT_HEADER = "X-Profile-Parent"
+PROFILE_QUERY_PARAM = "_profile"
+# where the MCP tools server stores profiles unless MCP_PROFILE_DIR is set: the project's
+# profiles/ directory, the same as Django's settings.PROFILE_DIR whatever the working directory
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "profiles")
+
+# one profile at a time per process: concurrent requests are served unprofiled
+_LOCK = threading.Lock()
+# set while a profile is being taken: {"id": ..., "label": ...}
+_REQUEST = ContextVar("profile_request", default=None)
+# set by async front ends whose work runs in worker threads (see profile_wanted)
+_WANTED = ContextVar("profile_wanted", default=None)
+
+
+def _safe_id(profile_id: str) -> str:
+    if not profile_id or not all(c.isalnum() or c == "-" for c in profile_id):
+        raise ValueError(f"bad profile id: {profile_id!r}")
+    return profile_id
+
+
+def top_functions(stats: pstats.Stats, n: int = TOP_FUNCTIONS, sort: str = "cumulative") -> list:
+    stats.sort_stats(sort)
+    out = []
+    for func in stats.fcn_list[:n]:
+        cc, ncalls, tottime, cumtime, _ = stats.stats[func]
+        filename, line, name = func
+        out.append({"function": f"{os.path.basename(filename)}:{line}({name})" if line else name,
+                    "ncalls": ncalls, "primitive_calls": cc, "tottime": tottime, "cumtime": cumtime})
+    return out
+
+
+def save_profile(profiler: cProfile.Profile, directory: str, meta: dict, keep: int = 100) -> dict:
+    os.makedirs(directory, exist_ok=True)
+    profile_id = meta.get("id") or uuid.uuid4().hex[:12]
+    path = os.path.join(directory, profile_id + ".prof")
+    profiler.dump_stats(path)
+    stats = pstats.Stats(path, stream=io.StringIO())
+    meta = {**meta, "id": profile_id, "created": meta.get("created", time.time()),
+            "total_calls": stats.total_calls, "total_time": stats.total_tt, "top": top_functions(stats)}
+    with open(os.path.join(directory, profile_id + ".json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    prune_profiles(directory, keep)
+    return meta
+
+
+def list_profiles(directory: str, limit: int = 100) -> list:
+    """
+    Summaries of the stored profiles, newest first.
+    """
+    if not os.path.isdir(directory):
+        return []
+    out = []
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                out.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    out.sort(key=lambda m: m.get("created", 0), reverse=True)
+    return out[:limit]
+
+
+def profile_path(directory: str, profile_id: str) -> str:
+    return os.path.join(directory, _safe_id(profile_id) + ".prof")
+
+
+def prune_profiles(directory: str, keep: int):
+    for meta in list_profiles(directory, limit=10 ** 9)[keep:]:
+        for ext in (".prof", ".json"):
+            try:
+                os.remove(os.path.join(directory, meta["id"] + ext))
+            except OSError:
+                pass
+
+
+@contextmanager
+def profile_request(directory: str, meta: dict, keep: int = 100):
+    """
+    Profile the enclosed block and store it. Yields the request dict ({"id", ...}) or None when
+    another profile is already running in this process. While active, current_request()
+    returns it, so code further down (e.g. MCP calls) can tag its work with the same id.
+    """
+    if not _LOCK.acquire(blocking=False):
+        _LOG.warning("Profile of %s skipped: another profile is running", meta.get("label"))
+        yield None
+        return
+    request = {**meta, "id": uuid.uuid4().hex[:12], "created": time.time()}
+    token = _REQUEST.set(request)
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        profiler.enable()
+        try:
+            yield request
+        finally:
+            profiler.disable()
+            request["elapsed"] = time.perf_counter() - start
+            try:
+                save_profile(profiler, directory, request, keep)
+                _LOG.info("Profile %s of %s stored (%.1f ms)", request["id"], request.get("label"),
+                          request["elapsed"] * 1000)
+            except OSError:
+                _LOG.exception("Could not store profile %s", request["id"])
+    finally:
+        _REQUEST.reset(token)
+        _LOCK.release()
+
+
+def current_request():
+    return _REQUEST.get()
+
+
+@contextmanager
+def profile_wanted(**meta):
+    """
+    Mark the current context as asking for a profile, without profiling this thread. An async
+    server runs its sync endpoints in a thread pool, so the profile is taken there by
+    profile_if_wanted; the yielded dict then carries its "id".
+    """
+    wanted = dict(meta)
+    token = _WANTED.set(wanted)
+    try:
+        yield wanted
+    finally:
+        _WANTED.reset(token)
+
+
+@contextmanager
+def profile_if_wanted(directory: str, label: str, keep: int = 100):
+    wanted = _WANTED.get()
+    if wanted is None or "id" in wanted or current_request() is not None:
+        yield None
+        return
+    with profile_request(directory, {**wanted, "label": label}, keep) as request:
+        if request is not None:
+            wanted["id"] = request["id"]
+        yield request
@@ -0,0 +1,107 @@
+"""
+Pre-computed answers to frequent questions, written by `manage.py prewarm` and read by the
+chat view. One JSON file per connection key under ANSWER_CACHE_DIR, so the web workers and
+the scheduled job share it without a cache server.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from .db_utils import json_default
+from .config import ANSWER_CACHE_DIR, ANSWER_SQL_TTL, ANSWER_RESULT_TTL
+
+_LOG = logging.getLogger(__name__)
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """
+    Grouping key for repeated questions: lower case, single spaces, no trailing punctuation.
+    """
+    return _SPACE_RE.sub(" ", (question or "").lower()).strip().rstrip("?!.;, ")[:500]
+
+
+def answer_fingerprint(snapshot: dict, user_prompt: str = "") -> str:
+    """
+    Cached SQL is only valid for the schema and custom prompt it was generated with.
+    """
+    h = hashlib.sha1()
+    for t in sorted(snapshot["tables"]):
+        cols = ",".join(f"{c['name']}:{c['type']}" for c in snapshot["tables"][t]["columns"])
+        h.update(f"{t}({cols});".encode("utf-8"))
+    h.update((user_prompt or "").strip().encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+class AnswerCache:
+    """
+    {normalized question: entry} per connection key, reloaded when the file changes. Entries:
+    {"question", "sql", "fingerprint", "created"} plus, when results were pre-computed,
+    {"columns", "rows", "results_at"} and optionally {"chart": chart_renderer result}.
+    """
+    def __init__(self, directory: str = ANSWER_CACHE_DIR, sql_ttl: float = ANSWER_SQL_TTL,
+                 result_ttl: float = ANSWER_RESULT_TTL):
+        self.directory = directory
+        self.sql_ttl = sql_ttl
+        self.result_ttl = result_ttl
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def entries(self, key: str) -> dict:
+        path = self._path(key)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return {}
+        cached = self._files.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with self._lock:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                _LOG.warning("Unreadable answer cache %s", path)
+                entries = {}
+            self._files[key] = (mtime, entries)
+        return entries
+
+    def get(self, key: str, question: str, fingerprint: str):
+        """
+        The entry for question if its SQL is still valid, else None. Results older than
+        result_ttl are dropped from the returned copy.
+        """
+        entry = self.entries(key).get(normalize_question(question))
+        now = time.time()
+        if not entry or entry.get("fingerprint") != fingerprint or now - entry.get("created", 0) > self.sql_ttl:
+            return None
+        if now - entry.get("results_at", 0) > self.result_ttl:
+            entry = {k: v for k, v in entry.items() if k not in ("columns", "rows", "results_at", "chart")}
+        return entry
+
+    def replace(self, key: str, entries: list):
+        """
+        Atomically replace the cached answers of a connection.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        data = {normalize_question(e["question"]): e for e in entries}
+        tmp = self._path(key) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, default=json_default)
+        os.replace(tmp, self._path(key))
+
+
+_DEFAULT = None
+
+def get_answer_cache() -> AnswerCache:
+    global _DEFAULT
+    if _DEFAULT is None:
+        _DEFAULT = AnswerCache()
+    return _DEFAULT
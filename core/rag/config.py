@@ -1,6 +1,68 @@
+import os
+
+# runtime caches and indexes live in the project directory, not the process's working directory
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 MODEL_NAME      = "google/gemma-3-12b"
 EMBED_MODEL     = "text-embedding-nomic-embed-text-v1.5"
 BASE_URL        = "http://192.168.3.50:1234/v1"
 API_KEY         = "lm-studio"
 TEMPERATURE     = 0.0
 MAX_TOKENS      = 2048
+
+# seconds a cached schema snapshot (and indexes derived from it) stays valid
+SCHEMA_CACHE_TTL       = 600
+# snapshots persisted by `manage.py warm_up`, picked up by fresh processes while younger than SCHEMA_DISK_TTL
+SCHEMA_SNAPSHOT_DIR    = os.path.join(PROJECT_DIR, "schema_cache")
+SCHEMA_DISK_TTL        = 24 * 3600
+# generated SQL failing validation re-introspects the schema only if the snapshot is older than this
+SCHEMA_REFRESH_MIN_AGE = 60
+
+RETRIEVER_K                 = 3
+# hard token budget for the schema context of the SQL generation prompt
+CONTEXT_TOKEN_BUDGET        = 2000
+# table documents retrieved for the chart_detector prompt, and its schema token budget
+CHART_DETECTOR_K            = 5
+CHART_DETECTOR_TOKEN_BUDGET = 1500
+# "hybrid" fuses the BM25 table index with vector similarity, "vector" is similarity only
+RETRIEVER_MODE              = "hybrid"
+# "rrf" (reciprocal rank fusion) or "weighted" (min-max normalised scores)
+RETRIEVER_FUSION            = "rrf"
+RRF_K                       = 60
+# weight of the vector score in weighted fusion, 1 - weight goes to BM25
+HYBRID_VECTOR_WEIGHT        = 0.5
+# check generated SQL against the cached schema before it reaches the database
+VALIDATE_SQL                = True
+# schema vector index: "chroma" (CHROMA_DIR) or "numpy" (one memory-mapped .npy per connection)
+VECTOR_BACKEND              = "chroma"
+CHROMA_DIR                  = os.path.join(PROJECT_DIR, "chromadb")
+NUMPY_INDEX_DIR             = os.path.join(PROJECT_DIR, "vector_index")
+# numpy backend storage: "float32", "float16" or "int8" (per-vector scale)
+VECTOR_PRECISION            = "float32"
+# question embeddings kept (LRU, same precision) so repeated questions skip the embedding call
+QUESTION_EMBED_CACHE_SIZE   = 1024
+# answers to frequent questions pre-computed by `manage.py prewarm` (see core.rag.answer_cache);
+# the SQL is reused while the schema and custom prompt are unchanged, results only while fresh
+ANSWER_CACHE_DIR            = os.path.join(PROJECT_DIR, "answer_cache")
+ANSWER_SQL_TTL              = 7 * 24 * 3600
+ANSWER_RESULT_TTL           = 6 * 3600
+# pooled HTTP connections of the shared LLM/embedding client, and its request timeout in seconds
+LLM_MAX_CONNECTIONS         = 16
+LLM_TIMEOUT                 = 120
+# admission control in front of the LLM backend (per process): concurrent requests, waiting
+# requests, and seconds an interactive / background request waits for a slot before failing
+LLM_MAX_CONCURRENT          = 4
+LLM_MAX_QUEUE               = 32
+LLM_QUEUE_TIMEOUT           = 30
+LLM_BACKGROUND_TIMEOUT      = 120
+# separate concurrency limit for embedding requests, so query embeddings never wait behind generations
+EMBED_MAX_CONCURRENT        = 8
+# chat follow-ups (see core.rag.conversation): turns kept per session, cap on the serialized
+# session state in characters, and seconds of inactivity after which the history is dropped
+CONVERSATION_MAX_TURNS      = 5
+CONVERSATION_MAX_CHARS      = 24000
+CONVERSATION_TTL            = 1800
+# longest question (in words) an opener like "now ..." or "only ..." marks as a follow-up
+FOLLOW_UP_MAX_WORDS         = 12
+# seconds the dashboard's catalog row estimates and table sizes are cached per connection
+TABLE_STATS_TTL             = 300
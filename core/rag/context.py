@@ -0,0 +1,181 @@
+import re
+from .tokens import estimate_tokens, truncate_to_budget, words, STOP_WORDS
+from .join_graph import get_join_graph
+from .config import CONTEXT_TOKEN_BUDGET
+
+_TYPE_ABBREV = [
+    (re.compile(r"\s+COLLATE\s+\S+", re.I), ""),
+    (re.compile(r"CHARACTER VARYING", re.I), "varchar"),
+    (re.compile(r"TIMESTAMP WITHOUT TIME ZONE", re.I), "timestamp"),
+    (re.compile(r"TIMESTAMP WITH TIME ZONE", re.I), "timestamptz"),
+    (re.compile(r"DOUBLE PRECISION", re.I), "double"),
+    (re.compile(r"\bINTEGER\b", re.I), "int"),
+    (re.compile(r"\bBOOLEAN\b", re.I), "bool"),
+    (re.compile(r"\(\s*\d+(\s*,\s*\d+)?\s*\)"), ""),
+]
+
+
+def abbreviate_type(typ: str) -> str:
+    for pattern, repl in _TYPE_ABBREV:
+        typ = pattern.sub(repl, typ)
+    return typ.strip().lower()
+
+
+def _is_key(name: str, pk) -> bool:
+    name = name.lower()
+    return name in pk or name == "id" or name.endswith("_id")
+
+
+class ContextBuilder:
+    """
+    Render retrieved table documents into prompt context under a hard token budget.
+    Compression steps, applied only while the context is over budget:
+      1. abbreviate column types
+      2. drop column comments
+      3. prune columns, keeping keys and the columns most similar to the question
+    Join hints for the shortest foreign-key paths between the retrieved tables are
+    appended and counted against the budget first. If table headers and hints alone are over
+    budget, the hints and then the lowest-ranked tables are dropped.
+    """
+    def __init__(self, snapshot: dict = None, budget: int = CONTEXT_TOKEN_BUDGET, join_hints: bool = True):
+        self.snapshot = snapshot or {"tables": {}}
+        self.budget = budget
+        self.join_graph = get_join_graph(self.snapshot) if join_hints else None
+
+    def _join_hints(self, tables) -> tuple:
+        if self.join_graph is None:
+            return "", 0
+        conditions, bridges = self.join_graph.join_hints([t for t, info, _ in tables if info])
+        if not conditions:
+            return "", 0
+        lines = ["Joins:"] + [f" - {c}" for c in conditions]
+        for b in bridges:
+            info = self.snapshot["tables"][b]
+            pk = {c.lower() for c in info.get("primary_key") or ()}
+            keys = [c["name"] for c in info["columns"] if _is_key(c["name"], pk)]
+            lines.append(f"Bridge table: {b} ({', '.join(keys)})")
+        return "\n".join(lines), len(conditions)
+
+    def _render_table(self, table, info, columns, abbrev, comments, omitted=0):
+        lines = [f"Table: {table}"]
+        if info.get("comment") and comments:
+            lines.append(f"Description: {info['comment']}")
+        lines.append("Columns:")
+        for col in columns:
+            typ = abbreviate_type(col["type"]) if abbrev else col["type"]
+            line = f" - {col['name']} ({typ})"
+            if comments and col.get("comment"):
+                line += f"  # {col['comment']}"
+            lines.append(line)
+        if omitted:
+            lines.append(f" - ... {omitted} more columns omitted")
+        return "\n".join(lines)
+
+    def _render(self, tables, abbrev, comments, kept=None):
+        parts = []
+        for table, info, raw in tables:
+            if info is None:
+                parts.append(raw)
+                continue
+            cols = info["columns"] if kept is None else [c for c in info["columns"] if (table, c["name"]) in kept]
+            parts.append(self._render_table(table, info, cols, abbrev, comments, len(info["columns"]) - len(cols)))
+        text = "\n".join(parts)
+        return text, estimate_tokens(text)
+
+    def _relevance(self, question_words, col) -> float:
+        col_words = words(col["name"])
+        score = 2.0 * len(question_words & col_words)
+        if col.get("comment"):
+            score += len(question_words & words(col["comment"]))
+        return score
+
+    def _compress(self, question, tables, budget):
+        """
+        (text, used_tokens, columns_kept, steps) of tables, compressed until it fits budget or
+        only table headers are left.
+        """
+        steps = []
+        text, used = self._render(tables, abbrev=False, comments=True)
+        kept = sum(len(info["columns"]) for _, info, _ in tables if info)
+        if used > budget:
+            steps.append("abbreviate_types")
+            text, used = self._render(tables, abbrev=True, comments=True)
+        if used > budget:
+            steps.append("drop_comments")
+            text, used = self._render(tables, abbrev=True, comments=False)
+        if used > budget:
+            steps.append("prune_columns")
+            text, used, kept = self._prune(question, tables, budget)
+        return text, used, kept, steps
+
+    def build(self, question: str, docs):
+        """
+        Returns (context_text, stats). stats: budget, full_tokens, used_tokens, dropped_tokens,
+        columns_kept, columns_dropped, join_hints, tables_dropped, steps (compression steps that
+        were needed). used_tokens never exceeds the budget: when table headers and join hints
+        alone do not fit, the hints and then the lowest-ranked tables are dropped.
+        """
+        tables = []
+        for d in docs:
+            table = (d.metadata or {}).get("table")
+            tables.append((table, self.snapshot["tables"].get(table), d.page_content))
+
+        hints, n_hints = self._join_hints(tables)
+        hint_tokens = estimate_tokens(hints) + 1 if hints else 0
+        total_cols = sum(len(info["columns"]) for _, info, _ in tables if info)
+        _, full = self._render(tables, abbrev=False, comments=True)
+        stats = {"budget": self.budget, "full_tokens": full + hint_tokens, "join_hints": n_hints,
+                 "tables_dropped": 0}
+
+        dropped_steps = []
+        while True:
+            text, used, kept, steps = self._compress(question, tables, max(0, self.budget - hint_tokens))
+            if used + hint_tokens <= self.budget:
+                break
+            # fixed costs (headers, raw documents, join hints) are over budget
+            if hints:
+                dropped_steps.append("drop_join_hints")
+                hints, hint_tokens, stats["join_hints"] = "", 0, 0
+            elif len(tables) > 1:
+                if "drop_tables" not in dropped_steps:
+                    dropped_steps.append("drop_tables")
+                tables = tables[:-1]
+                stats["tables_dropped"] += 1
+            else:
+                dropped_steps.append("truncate")
+                text, used, _ = truncate_to_budget([text], self.budget)
+                break
+        if hints:
+            text = text + "\n" + hints
+            used += hint_tokens
+        stats["steps"] = steps + dropped_steps
+        stats["columns_kept"] = kept
+        stats["columns_dropped"] = total_cols - kept
+        stats["used_tokens"] = used
+        stats["dropped_tokens"] = max(0, stats["full_tokens"] - used)
+        return text, stats
+
+    def _prune(self, question, tables, budget):
+        q_words = words(question) - STOP_WORDS
+        ranked = []
+        for t_rank, (table, info, _) in enumerate(tables):
+            if info is None:
+                continue
+            pk = {c.lower() for c in info.get("primary_key") or ()}
+            for pos, col in enumerate(info["columns"]):
+                # question similarity, with a bonus for keys (needed for joins); ties by retrieval rank and column order
+                priority = self._relevance(q_words, col) + (1.5 if _is_key(col["name"], pk) else 0)
+                ranked.append(((-priority, t_rank, pos), table, col))
+        ranked.sort()
+
+        # fixed cost: table headers and the raw documents of tables missing from the snapshot
+        _, used = self._render(tables, abbrev=True, comments=False, kept=set())
+        kept = set()
+        for _, table, col in ranked:
+            cost = estimate_tokens(f" - {col['name']} ({abbreviate_type(col['type'])})") + 1
+            if used + cost > budget:
+                continue
+            kept.add((table, col["name"]))
+            used += cost
+        text, used = self._render(tables, abbrev=True, comments=False, kept=kept)
+        return text, used, len(kept)
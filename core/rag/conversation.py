@@ -0,0 +1,99 @@
+"""
+Per-session conversation state for follow-up questions ("now only for 2024", "sort it by
+amount"). The last turns keep the question and generated SQL, the latest one also the schema
+context it was generated from, so a follow-up skips retrieval and sends a short "modify this
+SQL" prompt. The state is a plain JSON-able dict, stored by the chat view in the Django session.
+"""
+import re
+import json
+import time
+from .tokens import words
+from .config import CONVERSATION_MAX_TURNS, CONVERSATION_MAX_CHARS, CONVERSATION_TTL, FOLLOW_UP_MAX_WORDS
+
+# openers that only make sense relative to the previous answer ("now only for 2024", "sort it by
+# amount"); verbs count only when followed by a back-reference, "Group payments by month" stands alone
+_OPENER_RE = re.compile(
+    r"^\s*(and|but|now|also|instead|then|ok(ay)?|what about|how about|same|only|just|except|excluding|without"
+    r"|(sort|order|group|filter|limit|restrict|exclude|include|add|remove|drop|change|modify|update)\s+"
+    r"(it|them|this|that|these|those|by|to|only|the (query|sql|results?|list)))\b",
+    re.I)
+# explicit references to the previous turn, anywhere in the question
+_REFERENCE_RE = re.compile(r"\b(the same|previous|instead|(this|that) (query|sql))\b", re.I)
+
+
+def is_follow_up(question: str) -> bool:
+    """
+    True when the question refers back to the previous turn rather than standing on its own:
+    a short question starting with an opener, or an explicit back-reference.
+    """
+    question = question or ""
+    if _REFERENCE_RE.search(question):
+        return True
+    return len(question.split()) <= FOLLOW_UP_MAX_WORDS and bool(_OPENER_RE.search(question))
+
+
+class Conversation:
+    """
+    Bounded history of one chat session for one connection. Turns are
+    {"question", "sql", "tables", "at"}; only the latest keeps "context" (the rendered schema).
+    History is cut to max_turns and to max_chars of serialized state, oldest turns first,
+    and dropped when idle for longer than ttl or when the schema/custom prompt changes.
+    """
+    def __init__(self, state: dict = None, max_turns: int = CONVERSATION_MAX_TURNS,
+                 max_chars: int = CONVERSATION_MAX_CHARS, ttl: float = CONVERSATION_TTL):
+        state = state or {}
+        self.key = state.get("key", "")
+        self.fingerprint = state.get("fingerprint", "")
+        self.turns = list(state.get("turns") or [])
+        self.max_turns = max_turns
+        self.max_chars = max_chars
+        self.ttl = ttl
+        if self.turns and time.time() - self.turns[-1].get("at", 0) > ttl:
+            self.turns = []
+
+    def bind(self, key: str, fingerprint: str):
+        """
+        Attach to a connection snapshot; history from another connection, schema or prompt is dropped.
+        """
+        if (key, fingerprint) != (self.key, self.fingerprint):
+            self.key, self.fingerprint, self.turns = key, fingerprint, []
+
+    @property
+    def last(self):
+        return self.turns[-1] if self.turns else None
+
+    def follow_up(self, question: str) -> bool:
+        return self.last is not None and is_follow_up(question)
+
+    def reusable_context(self, question: str, snapshot: dict):
+        """
+        The previous schema context, unless the question names a table it does not cover.
+        """
+        last = self.last
+        if not last or not last.get("context"):
+            return None
+        q_words = words(question)
+        covered = {t.lower() for t in last.get("tables") or ()}
+        for table in snapshot["tables"]:
+            if table.lower() not in covered and words(table) and words(table) <= q_words:
+                return None
+        return last["context"]
+
+    def add(self, question: str, sql: str, context: str = None, tables=()):
+        for turn in self.turns:
+            turn.pop("context", None)
+        turn = {"question": question, "sql": sql, "tables": list(tables), "at": time.time()}
+        if context:
+            turn["context"] = context
+        self.turns = (self.turns + [turn])[-max(1, self.max_turns):]
+        while len(self.turns) > 1 and len(json.dumps(self.state())) > self.max_chars:
+            self.turns.pop(0)
+        if len(json.dumps(self.state())) > self.max_chars:
+            # a single oversized context is not worth keeping, the SQL still is
+            self.turns[-1].pop("context", None)
+
+    def clear(self):
+        self.turns = []
+
+    def state(self) -> dict:
+        return {"key": self.key, "fingerprint": self.fingerprint, "turns": self.turns}
@@ -1,6 +1,8 @@
 from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
 from sqlalchemy.exc import SQLAlchemyError
+from decimal import Decimal
+import datetime
 import re
 
 def connect_db(connection_string: str) -> Engine:
@@ -20,3 +22,14 @@ def connect_db(connection_string: str) -> Engine:
         return engine
     except SQLAlchemyError as e:
         raise SQLAlchemyError(f"Failed to connect to database: {e}")
+
+
+def json_default(value):
+    '''
+    json.dumps default for DB-native values in result rows (Decimal, dates, anything else as str).
+    '''
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    return str(value)
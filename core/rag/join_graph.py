@@ -0,0 +1,93 @@
+import threading
+from collections import deque, defaultdict
+
+
+class JoinGraph:
+    """
+    Undirected foreign-key graph of a schema snapshot. Shortest join paths are found
+    by BFS, one search per source table, cached for the life of the graph.
+    """
+    def __init__(self, snapshot: dict):
+        self.key = snapshot.get("key")
+        self.built_at = snapshot.get("built_at")
+        self.edges = defaultdict(dict)
+        tables = snapshot["tables"]
+        for table, info in tables.items():
+            for fk in info.get("foreign_keys") or ():
+                ref = fk["referred_table"]
+                if ref not in tables or ref == table:
+                    continue
+                cond = " AND ".join(f"{table}.{c} = {ref}.{r}" for c, r in zip(fk["columns"], fk["referred_columns"]))
+                # keep the first constraint between a pair; it is only a hint
+                self.edges[table].setdefault(ref, cond)
+                self.edges[ref].setdefault(table, cond)
+        self._parents = {}
+        self._lock = threading.Lock()
+
+    def _bfs(self, source: str) -> dict:
+        parents = self._parents.get(source)
+        if parents is None:
+            parents = {source: None}
+            queue = deque([source])
+            while queue:
+                node = queue.popleft()
+                for nxt in sorted(self.edges.get(node, ())):
+                    if nxt not in parents:
+                        parents[nxt] = node
+                        queue.append(nxt)
+            with self._lock:
+                self._parents[source] = parents
+        return parents
+
+    def path(self, source: str, target: str):
+        """
+        Shortest list of tables from source to target (inclusive), or None if unconnected.
+        """
+        parents = self._bfs(source)
+        if target not in parents:
+            return None
+        path = [target]
+        while parents[path[-1]] is not None:
+            path.append(parents[path[-1]])
+        return path[::-1]
+
+    def join_hints(self, tables, max_hops: int = 3):
+        """
+        Join conditions along the shortest paths between tables, plus the bridge tables
+        those paths pass through that are not in tables.
+        Returns (conditions, bridges), both ordered and without duplicates.
+        """
+        tables = [t for t in tables if t in self.edges]
+        conditions, bridges = [], []
+        for i, a in enumerate(tables):
+            for b in tables[i + 1:]:
+                path = self.path(a, b)
+                if not path or len(path) - 1 > max_hops:
+                    continue
+                for u, v in zip(path, path[1:]):
+                    cond = self.edges[u][v]
+                    if cond not in conditions:
+                        conditions.append(cond)
+                for t in path[1:-1]:
+                    if t not in tables and t not in bridges:
+                        bridges.append(t)
+        return conditions, bridges
+
+
+_GRAPHS = {}
+_LOCK = threading.Lock()
+
+def get_join_graph(snapshot: dict) -> JoinGraph:
+    """
+    JoinGraph for a (cached) schema snapshot; rebuilt only when the snapshot is refreshed.
+    """
+    if snapshot.get("key") is None:
+        return JoinGraph(snapshot)
+    graph = _GRAPHS.get(snapshot["key"])
+    if graph is None or graph.built_at != snapshot["built_at"]:
+        with _LOCK:
+            graph = _GRAPHS.get(snapshot["key"])
+            if graph is None or graph.built_at != snapshot["built_at"]:
+                graph = JoinGraph(snapshot)
+                _GRAPHS[snapshot["key"]] = graph
+    return graph
@@ -0,0 +1,75 @@
+import re
+import math
+import threading
+from collections import defaultdict, Counter
+from .tokens import words, STOP_WORDS
+
+_IDENT_RE = re.compile(r"[a-z0-9_]+")
+
+
+def lexical_terms(text: str) -> list:
+    """
+    Split words plus whole identifiers, so "film_actor" matches both the exact
+    table name and questions about films and actors.
+    """
+    text = (text or "").lower()
+    terms = list(words(text))
+    terms += [t for t in _IDENT_RE.findall(text) if "_" in t]
+    return terms
+
+
+class BM25Index:
+    """
+    In-memory BM25 over one document per table: table name (boosted), column names
+    and comments, taken from the cached schema snapshot.
+    """
+    def __init__(self, snapshot: dict, k1: float = 1.2, b: float = 0.75, name_boost: int = 3):
+        self.key = snapshot.get("key")
+        self.built_at = snapshot.get("built_at")
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)
+        self.doc_len = {}
+        for table, info in snapshot["tables"].items():
+            terms = lexical_terms(table) * name_boost
+            terms += lexical_terms(info.get("comment"))
+            for col in info["columns"]:
+                terms += lexical_terms(col["name"]) + lexical_terms(col.get("comment"))
+            for term, tf in Counter(terms).items():
+                self.postings[term][table] = tf
+            self.doc_len[table] = len(terms)
+        n = len(self.doc_len) or 1
+        self.avg_len = sum(self.doc_len.values()) / n if self.doc_len else 0
+        self.idf = {t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()}
+
+    def search(self, query: str, k: int = 10):
+        """
+        Returns [(table, score)] best first; only tables sharing a term with query.
+        """
+        scores = defaultdict(float)
+        for term in set(lexical_terms(query)) - STOP_WORDS:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf[term]
+            for table, tf in posting.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[table] / self.avg_len)
+                scores[table] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda x: -x[1])[:k]
+
+
+_INDEXES = {}
+_LOCK = threading.Lock()
+
+def get_lexical_index(snapshot: dict) -> BM25Index:
+    """
+    BM25Index for a (cached) schema snapshot; rebuilt only when the snapshot is refreshed.
+    """
+    idx = _INDEXES.get(snapshot["key"])
+    if idx is None or idx.built_at != snapshot["built_at"]:
+        with _LOCK:
+            idx = _INDEXES.get(snapshot["key"])
+            if idx is None or idx.built_at != snapshot["built_at"]:
+                idx = BM25Index(snapshot)
+                _INDEXES[snapshot["key"]] = idx
+    return idx
@@ -1,53 +1,322 @@
-import openai
-from openai import OpenAI
-from .config import MODEL_NAME, EMBED_MODEL, BASE_URL, API_KEY, TEMPERATURE, MAX_TOKENS
+import time
+import heapq
+import hashlib
+import itertools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from .config import (MODEL_NAME, EMBED_MODEL, BASE_URL, API_KEY, TEMPERATURE, MAX_TOKENS,
+                     LLM_MAX_CONNECTIONS, LLM_TIMEOUT, LLM_MAX_CONCURRENT, LLM_MAX_QUEUE,
+                     LLM_QUEUE_TIMEOUT, LLM_BACKGROUND_TIMEOUT, EMBED_MAX_CONCURRENT)
+from core.metrics import span, counter, gauge, histogram
 
-class OpenAIClient:
+COALESCED = counter("llm_coalesced_requests_total",
+                    "LLM/embedding requests served by an identical in-flight backend call.", ("kind",))
+
+
+# lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND  = 10
+_PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BACKGROUND: "background"}
+
+# pool label: "generate" (completions) or "embed" (embeddings), see get_scheduler
+QUEUE_DEPTH = gauge("llm_queue_depth", "LLM requests waiting for a backend slot.", ("pool", "priority"))
+INFLIGHT = gauge("llm_inflight_requests", "LLM requests holding a backend slot.", ("pool",))
+QUEUE_WAIT = histogram("llm_queue_wait_seconds", "Time LLM requests waited for a backend slot.",
+                       ("pool", "priority", "outcome"))
+REJECTED = counter("llm_rejected_requests_total", "LLM requests refused by admission control.",
+                   ("pool", "priority", "reason"))
+
+
+class LLMOverloaded(RuntimeError):
+    """
+    The LLM backend is saturated: the wait queue is full or the request's deadline passed.
+    """
+
+
+class _Ticket:
+    __slots__ = ("priority", "seq", "state")
+
+    def __init__(self, priority, seq):
+        self.priority = priority
+        self.seq = seq
+        self.state = "waiting"  # -> "granted" | "evicted" | "expired"
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class LLMScheduler:
+    """
+    Admission control for the LLM backend: at most max_concurrent requests run at once, up to
+    max_queue wait for a slot in priority order (FIFO within a priority), each until its deadline.
+    A full queue evicts its lowest-priority waiter for a more urgent request, or refuses the new one.
+    The limit is per process and per pool (get_scheduler): size it so
+    workers x (LLM_MAX_CONCURRENT + EMBED_MAX_CONCURRENT) fits the backend.
+    """
+    def __init__(self, max_concurrent: int = LLM_MAX_CONCURRENT, max_queue: int = LLM_MAX_QUEUE,
+                 name: str = "generate"):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.active = 0
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _depth(self, priority):
+        QUEUE_DEPTH.set(sum(1 for t in self._queue if t.priority == priority), pool=self.name,
+                        priority=_PRIORITY_NAMES.get(priority, priority))
+
+    def _grant_next(self):
+        while self._queue and self.active < self.max_concurrent:
+            ticket = heapq.heappop(self._queue)
+            ticket.state = "granted"
+            self.active += 1
+            self._depth(ticket.priority)
+        INFLIGHT.set(self.active, pool=self.name)
+        self._cond.notify_all()
+
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE, timeout: float = None):
+        name = _PRIORITY_NAMES.get(priority, priority)
+        start = time.monotonic()
+        with self._cond:
+            if self.active < self.max_concurrent and not self._queue:
+                self.active += 1
+                INFLIGHT.set(self.active, pool=self.name)
+                QUEUE_WAIT.observe(0.0, pool=self.name, priority=name, outcome="granted")
+                return
+            if len(self._queue) >= self.max_queue:
+                worst = max(self._queue)
+                if worst.priority <= priority:
+                    REJECTED.inc(pool=self.name, priority=name, reason="queue_full")
+                    raise LLMOverloaded("LLM backend is busy (queue full), please retry shortly")
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                worst.state = "evicted"
+                self._depth(worst.priority)
+                self._cond.notify_all()
+            ticket = _Ticket(priority, next(self._seq))
+            heapq.heappush(self._queue, ticket)
+            self._depth(priority)
+            deadline = None if timeout is None else start + timeout
+            while ticket.state == "waiting":
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                    ticket.state = "expired"
+                    self._depth(priority)
+                    break
+                self._cond.wait(remaining)
+            waited = time.monotonic() - start
+            QUEUE_WAIT.observe(waited, pool=self.name, priority=name, outcome=ticket.state)
+            if ticket.state == "granted":
+                return
+            reason = "deadline" if ticket.state == "expired" else "evicted"
+            REJECTED.inc(pool=self.name, priority=name, reason=reason)
+            raise LLMOverloaded(f"LLM backend is busy ({reason} after {waited:.1f}s in queue), please retry shortly")
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._grant_next()
+
+    @contextmanager
+    def slot(self, priority: int = None, timeout: float = None):
+        """
+        Hold a backend slot for the block. priority/timeout default to the llm_priority() context.
+        """
+        ctx_priority, ctx_timeout = _PRIORITY.get()
+        priority = ctx_priority if priority is None else priority
+        if timeout is None:
+            timeout = ctx_timeout if ctx_timeout is not None else (
+                LLM_QUEUE_TIMEOUT if priority <= PRIORITY_INTERACTIVE else LLM_BACKGROUND_TIMEOUT)
+        self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+_PRIORITY = ContextVar("llm_priority", default=(PRIORITY_INTERACTIVE, None))
+
+@contextmanager
+def llm_priority(priority: int, timeout: float = None):
+    """
+    LLM calls made inside the block (in this thread/context) queue at priority, waiting at
+    most timeout seconds for a slot.
+
+        with llm_priority(PRIORITY_BACKGROUND):
+            raw = llm.generate(prompt)
+    """
+    token = _PRIORITY.set((priority, timeout))
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+_SCHEDULERS = {}
+_SCHEDULER_LOCK = threading.Lock()
+# embeddings are short and sit in front of every interactive question: they get their own slots
+# instead of queueing behind long completions
+_POOL_LIMITS = {"generate": LLM_MAX_CONCURRENT, "embed": EMBED_MAX_CONCURRENT}
+
+def get_scheduler(pool: str = "generate") -> LLMScheduler:
+    scheduler = _SCHEDULERS.get(pool)
+    if scheduler is None:
+        with _SCHEDULER_LOCK:
+            scheduler = _SCHEDULERS.get(pool)
+            if scheduler is None:
+                scheduler = _SCHEDULERS[pool] = LLMScheduler(_POOL_LIMITS[pool], name=pool)
+    return scheduler
+
+
+def _record_usage(s, resp):
+    usage = getattr(resp, "usage", None)
+    if usage is not None:
+        s["prompt_tokens"] = getattr(usage, "prompt_tokens", None)
+        s["completion_tokens"] = getattr(usage, "completion_tokens", None)
+
+class SingleFlight:
+    """
+    Run fn once per key at a time: callers arriving while a call for the same key is in
+    flight wait for it and share its result (or exception). Waiters inherit the leader's
+    scheduling, so OpenAIClient puts the llm_priority() into the key.
+    """
     def __init__(self):
-        openai.api_base = BASE_URL
-        openai.api_key  = API_KEY
-        self.client     = OpenAI(base_url=BASE_URL, api_key=API_KEY)
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, kind: str = ""):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event()}
+        if not leader:
+            COALESCED.inc(kind=kind)
+            call["done"].wait()
+            if "error" in call:
+                raise call["error"]
+            return call["result"]
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+
+def _key(*parts) -> str:
+    h = hashlib.sha1()
+    for p in parts:
+        h.update(repr(p).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class OpenAIClient:
+    """
+    Use load_llm()/load_embeddings(): one instance per process shares a pooled HTTP client,
+    and identical concurrent generate/embedding requests are coalesced into one backend call.
+    """
+    def __init__(self, base_url: str = None, api_key: str = None):
+        # imported on first use: the openai SDK costs most of a second at worker start
+        import httpx
+        import openai
+        from openai import OpenAI
+        base_url = base_url or BASE_URL
+        api_key = api_key or API_KEY
+        openai.api_base = base_url
+        openai.api_key  = api_key
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+            timeout=LLM_TIMEOUT,
+        )
+        self.client     = OpenAI(base_url=base_url, api_key=api_key, http_client=self.http_client)
         self.model      = MODEL_NAME
         self.embed_model  = EMBED_MODEL
         self.temperature = TEMPERATURE
         self.max_tokens  = MAX_TOKENS
+        self._flights    = SingleFlight()
 
     def generate(self, prompt: str) -> str:
         """
         endpoint /chat/completions
         """
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=self.temperature,
-            max_tokens=self.max_tokens,
-        )
+        key = _key("chat", self.model, self.temperature, self.max_tokens, prompt, _PRIORITY.get()[0])
+        return self._flights.do(key, lambda: self._generate(prompt), "generate")
+
+    def _generate(self, prompt: str) -> str:
+        with get_scheduler().slot(), span("llm_generate", model=self.model) as s:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+            )
+            _record_usage(s, response)
         return response.choices[0].message.content.strip()
 
     def embed_query(self, text: str) -> list[float]:
         """
         endpoint /embeddings
         """
-        resp = self.client.embeddings.create(
-            model=self.embed_model,
-            input=[text]
-        )
+        return self._flights.do(_key("embed", self.embed_model, text, _PRIORITY.get()[0]),
+                                lambda: self._embed_query(text), "embed_query")
+
+    def _embed_query(self, text: str) -> list[float]:
+        with get_scheduler("embed").slot(), span("embed_query") as s:
+            resp = self.client.embeddings.create(
+                model=self.embed_model,
+                input=[text]
+            )
+            _record_usage(s, resp)
         if not resp.data:
             raise ValueError("No embedding data received (empty response)")
         return resp.data[0].embedding
 
     def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        texts = list(texts)
+        return self._flights.do(_key("embed_documents", self.embed_model, texts, _PRIORITY.get()[0]),
+                                lambda: self._embed_documents(texts), "embed_documents")
+
+    def _embed_documents(self, texts: list[str]) -> list[list[float]]:
         # print("🔍 Embedding input texts:", texts)
-        resp = self.client.embeddings.create(
-            model=self.embed_model,
-            input=texts
-        )
+        with get_scheduler("embed").slot(), span("embed_documents", texts=len(texts)) as s:
+            resp = self.client.embeddings.create(
+                model=self.embed_model,
+                input=texts
+            )
+            _record_usage(s, resp)
         if not resp.data:
             raise ValueError("No embedding data received (empty response)")
         return [d.embedding for d in resp.data]
 
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+def get_client(base_url: str = None, api_key: str = None) -> OpenAIClient:
+    """
+    The process-wide client for an endpoint (BASE_URL by default).
+    """
+    key = (base_url or BASE_URL, api_key or API_KEY)
+    client = _CLIENTS.get(key)
+    if client is None:
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.get(key)
+            if client is None:
+                client = _CLIENTS[key] = OpenAIClient(*key)
+    return client
+
 def load_llm(**kwargs) -> OpenAIClient:
-    return OpenAIClient(**kwargs)
+    return get_client(**kwargs)
 
 def load_embeddings() -> OpenAIClient:
-    return OpenAIClient()
\ No newline at end of file
+    return get_client()
\ No newline at end of file
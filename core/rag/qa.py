@@ -1,6 +1,7 @@
 from .llm_utils import load_llm
 from .retriever import build_retriever
 from .rag_pipeline import RAGPipeline
+from .conversation import Conversation
 
 class interactive_loop:
     def __init__(self, engine):
@@ -8,7 +9,7 @@ class interactive_loop:
         self.llm = load_llm()
         self.embeddings = self.llm
         self.retriever = build_retriever(self.engine, self.embeddings)
-        self.pipeline = RAGPipeline(self.llm, self.retriever, self.engine)
+        self.pipeline = RAGPipeline(self.llm, self.retriever, self.engine, conversation=Conversation())
 
     def run(self):
         print("❓Ask question from system or type 'exit' for leave.")
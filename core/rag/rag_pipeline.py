@@ -1,6 +1,15 @@
-from langchain.chains import LLMChain
 from langchain_core.prompts import PromptTemplate
 from sqlalchemy import text
+import time
+import logging
+from .context import ContextBuilder
+from .schema_cache import get_schema_snapshot
+from .sql_validator import validate_sql, rewrite_dialect_functions, SQLValidationError
+from .answer_cache import answer_fingerprint
+from .config import CONTEXT_TOKEN_BUDGET, VALIDATE_SQL, SCHEMA_REFRESH_MIN_AGE
+from core.metrics import span
+
+_LOG = logging.getLogger(__name__)
 
 
 def clean_sql_output(sql_text: str) -> str:
@@ -11,11 +20,35 @@ def clean_sql_output(sql_text: str) -> str:
 
 
 class RAGPipeline:
-    def __init__(self, llm, retriever, engine, user_prompt):
+    """
+    retriever is a retriever or a zero-argument callable building one; a callable is only called
+    when a question needs retrieval, not for answer-cache hits or follow-ups reusing the context.
+    """
+    def __init__(self, llm, retriever, engine, user_prompt: str = "", schema: dict = None,
+                 token_budget: int = CONTEXT_TOKEN_BUDGET, validate: bool = VALIDATE_SQL, answer_cache=None,
+                 conversation=None):
         self.llm = llm
-        self.retriever = retriever
+        self._retriever = retriever
         self.engine = engine
         self.user_prompt = user_prompt.strip()
+        self.schema = schema or get_schema_snapshot(engine)
+        self._cached_schema = schema is None
+        self.validate = validate
+        self.answer_cache = answer_cache
+        # "" when the answer was computed, "sql" or "result" when it came from the answer cache,
+        # "context" for a follow-up that reused the previous turn's schema context
+        self.cache_hit = ""
+        self.cached_entry = None
+        self.conversation = conversation
+        # the last question was answered as a follow-up of the previous turn
+        self.follow_up = False
+        if conversation is not None:
+            conversation.bind(self.schema["key"], answer_fingerprint(self.schema, self.user_prompt))
+        self.context_builder = ContextBuilder(self.schema, token_budget)
+        self.context_stats = {}
+        self.context = None
+        self.context_tables = []
+        self.columns = []
         
         self.prompt_tmpl = PromptTemplate.from_template(
             """Schema:
@@ -34,23 +67,134 @@ class RAGPipeline:
 
                 Only output the SQL."""
         )
-        
-    def run(self, question: str):
-        docs = self.retriever.invoke(question)
-        context = "\n".join([d.page_content for d in docs])
-        prompt = self.prompt_tmpl.format(
-            context=context,
-            question=question,
-            user_prompt=self.user_prompt
+        self.follow_up_tmpl = PromptTemplate.from_template(
+            """Schema:
+                {context}
+
+                {user_prompt}
+
+                Previous question: {previous_question}
+                Previous SQL:
+                {previous_sql}
+
+                Modify the previous SQL so it answers the follow-up, using only tables and columns shown above:
+                {question}
+
+                Only output the SQL."""
         )
-        sql = self.llm.generate(prompt)
+
+    @property
+    def retriever(self):
+        if callable(self._retriever) and not hasattr(self._retriever, "invoke"):
+            self._retriever = self._retriever()
+        return self._retriever
+
+    def validate_sql(self, sql: str):
+        """
+        Raise SQLValidationError for unknown tables/columns/functions, before any database call.
+        A cached snapshot may be stale, so it is refreshed once before giving up, unless it is
+        younger than SCHEMA_REFRESH_MIN_AGE or only functions were rejected.
+        """
+        try:
+            validate_sql(sql, self.schema, self.engine.dialect.name)
+        except SQLValidationError as e:
+            if not self._cached_schema or time.time() - self.schema.get("built_at", 0) < SCHEMA_REFRESH_MIN_AGE \
+                    or all(err.startswith("function ") for err in e.errors):
+                raise
+            self.schema = get_schema_snapshot(self.engine, refresh=True)
+            self._cached_schema = False
+            validate_sql(sql, self.schema, self.engine.dialect.name)
+
+    def cached_answer(self, question: str):
+        if self.answer_cache is None:
+            return None
+        return self.answer_cache.get(self.schema["key"], question, answer_fingerprint(self.schema, self.user_prompt))
+
+    def _retrieve_context(self, question: str) -> str:
+        with span("retrieval") as s:
+            docs = self.retriever.invoke(question)
+            s["documents"] = len(docs)
+        with span("context_build") as s:
+            context, self.context_stats = self.context_builder.build(question, docs)
+            s["context_tokens"] = self.context_stats["used_tokens"]
+        _LOG.info("RAG context: %(used_tokens)d tokens used, %(dropped_tokens)d dropped (budget %(budget)d)", self.context_stats)
+        self.context_tables = [t for t in ((d.metadata or {}).get("table") for d in docs) if t]
+        return context
+
+    def _finish_sql(self, sql: str) -> str:
         sql = clean_sql_output(sql)
         clean = sql.strip()
         if not clean or clean.startswith("--"):
             raise ValueError("Model requested schema info or returned comment-only SQL.")
+        return rewrite_dialect_functions(self.engine.dialect.name, sql)
+
+    def generate_sql(self, question: str) -> str:
+        self.context = self._retrieve_context(question)
+        prompt = self.prompt_tmpl.format(
+            context=self.context,
+            question=question,
+            user_prompt=self.user_prompt
+        )
+        return self._finish_sql(self.llm.generate(prompt))
+
+    def generate_follow_up(self, question: str) -> str:
+        """
+        Rewrite the previous turn's SQL for a follow-up question, reusing its schema context
+        when the question stays on the same tables.
+        """
+        last = self.conversation.last
+        self.context = self.conversation.reusable_context(question, self.schema)
+        if self.context is not None:
+            self.cache_hit = "context"
+            self.context_tables = list(last.get("tables") or ())
+        else:
+            self.context = self._retrieve_context(f"{last['question']} {question}")
+        prompt = self.follow_up_tmpl.format(
+            context=self.context,
+            user_prompt=self.user_prompt,
+            previous_question=last["question"],
+            previous_sql=last["sql"],
+            question=question,
+        )
+        return self._finish_sql(self.llm.generate(prompt))
+
+    def execute(self, sql: str):
+        if self.validate:
+            with span("sql_validate"):
+                self.validate_sql(sql)
 
         # run query on database
-        with self.engine.connect() as conn:
+        with span("sql_execute") as s, self.engine.connect() as conn:
             result = conn.execute(text(sql))
+            self.columns = list(result.keys())
             rows = result.fetchall()
-        return sql, rows
\ No newline at end of file
+            s["rows"] = len(rows)
+        return rows
+
+    def run(self, question: str):
+        self.context, self.context_tables = None, []
+        self.follow_up = self.conversation is not None and self.conversation.follow_up(question)
+        if self.follow_up:
+            # the answer cache holds standalone questions only, "now only for 2024" means nothing on its own
+            self.cached_entry = None
+            self.cache_hit = ""
+            sql = self.generate_follow_up(question)
+            rows = self.execute(sql)
+        else:
+            self.cached_entry = self.cached_answer(question)
+            if self.cached_entry and "rows" in self.cached_entry:
+                self.cache_hit = "result"
+                self.columns = self.cached_entry["columns"]
+                sql, rows = self.cached_entry["sql"], self.cached_entry["rows"]
+            else:
+                if self.cached_entry:
+                    self.cache_hit = "sql"
+                    sql = self.cached_entry["sql"]
+                else:
+                    self.cache_hit = ""
+                    sql = self.generate_sql(question)
+                rows = self.execute(sql)
+        if self.conversation is not None:
+            # only SQL that ran becomes the base of the next follow-up
+            self.conversation.add(question, sql, self.context, self.context_tables)
+        return sql, rows
@@ -1,38 +1,143 @@
-from langchain_community.vectorstores import Chroma
-from sqlalchemy import inspect
-from sqlalchemy.schema import Table
-from langchain.schema import Document
+import os
+import threading
+from typing import Any
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from .schema_cache import get_schema_snapshot
+from .lexical import get_lexical_index
+from .vector_store import NumpyVectorStore, question_cache
+from .vector_index import sync_chroma
+from .config import (RETRIEVER_K, RETRIEVER_MODE, RETRIEVER_FUSION, RRF_K, HYBRID_VECTOR_WEIGHT,
+                     VECTOR_BACKEND, CHROMA_DIR, NUMPY_INDEX_DIR, VECTOR_PRECISION, QUESTION_EMBED_CACHE_SIZE)
+
+
+def table_document(table_name: str, info: dict) -> Document:
+    schema = f"Table: {table_name}\n"
+    if info.get('comment'):
+        schema += f"Description: {info['comment']}\n"
+
+    schema += "Columns:\n"
+    for col in info['columns']:
+        line = f" - {col['name']} ({col['type']})"
+        if col.get('comment'):
+            line += f"  # {col['comment']}"
+        schema += line + "\n"
+    return Document(page_content=schema, metadata={"table": table_name})
+
 
 # extract tabel's metadata
-def build_retriever(engine, embeddings, persist_directory: str = "chromadb"):
-    inspector = inspect(engine)  #list of tabels and columns
-    docs = []
-    for table_name in inspector.get_table_names():
-        cols = inspector.get_columns(table_name)
-        tbl_comment = inspector.get_table_comment(table_name).get('text') or ''
-        schema = f"Table: {table_name}\n"
-        if tbl_comment:
-            schema += f"Description: {tbl_comment}\n"
-
-        schema += "Columns:\n"
-        for col in cols:
-            name = col['name']
-            typ  = col['type']
-            comment = col.get('comment') or ''
-            line = f" - {name} ({typ})"
-            if comment:
-                line += f"  # {comment}"
-            schema += line + "\n"
-        docs.append(Document(page_content=schema, metadata={"table": table_name}))
-
-    vector_store = Chroma.from_documents(
-        documents=docs,
-        embedding=embeddings,
-        persist_directory=persist_directory
-    )
+def build_table_documents(snapshot: dict) -> list[Document]:
+    return [table_document(t, info) for t, info in snapshot['tables'].items()]
+
+
+def _normalise(scores: dict) -> dict:
+    if not scores:
+        return {}
+    lo, hi = min(scores.values()), max(scores.values())
+    return {t: (s - lo) / (hi - lo) if hi > lo else 1.0 for t, s in scores.items()}
+
+
+def fuse_rankings(vector: list, lexical: list, fusion: str = RETRIEVER_FUSION,
+                  rrf_k: int = RRF_K, vector_weight: float = HYBRID_VECTOR_WEIGHT) -> list:
+    """
+    Fuse two [(table, score)] rankings (best first) into one list of tables.
+    rrf: sum of 1 / (rrf_k + rank); weighted: min-max normalised scores mixed by vector_weight.
+    """
+    fused = {}
+    if fusion == "rrf":
+        for ranking in (vector, lexical):
+            for rank, (table, _) in enumerate(ranking, 1):
+                fused[table] = fused.get(table, 0.0) + 1.0 / (rrf_k + rank)
+    elif fusion == "weighted":
+        for table, s in _normalise(dict(vector)).items():
+            fused[table] = fused.get(table, 0.0) + vector_weight * s
+        for table, s in _normalise(dict(lexical)).items():
+            fused[table] = fused.get(table, 0.0) + (1 - vector_weight) * s
+    else:
+        raise ValueError(f"Unknown retriever fusion: {fusion}")
+    return sorted(fused, key=lambda t: -fused[t])
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Table retriever fusing vector similarity with the in-memory BM25 index of the
+    schema snapshot, so exact table/column names ("film_actor") are not missed.
+    The lexical side needs no embedding calls.
+    """
+    vector_store: Any
+    snapshot: dict
+    k: int = RETRIEVER_K
+    fetch_k: int = 0
+    fusion: str = RETRIEVER_FUSION
+    rrf_k: int = RRF_K
+    vector_weight: float = HYBRID_VECTOR_WEIGHT
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> list[Document]:
+        fetch_k = self.fetch_k or self.k * 3
+        hits = self.vector_store.similarity_search_with_score(query, k=fetch_k)
+        vector, docs = [], {}
+        for doc, distance in hits:
+            table = (doc.metadata or {}).get("table")
+            if table not in docs:
+                docs[table] = doc
+                vector.append((table, -distance))
+        lexical = get_lexical_index(self.snapshot).search(query, fetch_k)
+        tables = self.snapshot["tables"]
+        out = []
+        for table in fuse_rankings(vector, lexical, self.fusion, self.rrf_k, self.vector_weight)[:self.k]:
+            doc = docs.get(table)
+            if doc is None and table in tables:
+                doc = table_document(table, tables[table])
+            if doc is not None:
+                out.append(doc)
+        return out
+
+
+_NUMPY_STORES = {}
+_LOCK = threading.Lock()
+_STORE_LOCKS = {}
+
+
+def numpy_store(snapshot: dict, embeddings, directory: str = NUMPY_INDEX_DIR,
+                precision: str = VECTOR_PRECISION) -> NumpyVectorStore:
+    """
+    NumpyVectorStore of the snapshot's connection, kept loaded per process until the snapshot
+    is refreshed: requests neither rebuild and fingerprint the table documents nor re-read the
+    index metadata, only a new snapshot goes through load_or_build.
+    """
+    key = (os.path.abspath(directory), snapshot["key"])
+    version = (snapshot["built_at"], precision, id(embeddings))
+    entry = _NUMPY_STORES.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    with _LOCK:
+        store_lock = _STORE_LOCKS.setdefault(key, threading.Lock())
+    with store_lock:
+        entry = _NUMPY_STORES.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        store = NumpyVectorStore.load_or_build(
+            build_table_documents(snapshot), embeddings, directory, snapshot["key"], precision=precision,
+            query_cache=question_cache(precision, QUESTION_EMBED_CACHE_SIZE),
+        )
+        with _LOCK:
+            _NUMPY_STORES[key] = (version, store)
+    return store
+
+
+def build_retriever(engine, embeddings, persist_directory: str = CHROMA_DIR, k: int = RETRIEVER_K,
+                    mode: str = RETRIEVER_MODE, fusion: str = RETRIEVER_FUSION, backend: str = VECTOR_BACKEND):
+    snapshot = get_schema_snapshot(engine)
+
+    if backend == "numpy":
+        vector_store = numpy_store(snapshot, embeddings)
+    else:
+        vector_store = sync_chroma(build_table_documents(snapshot), embeddings, persist_directory, snapshot["key"])
     
     # print(f"📄 Number of extracted documents: {len(docs)}")
     # for i, doc in enumerate(docs[:5]):
     #     print(f"➡️ Document {i+1}:\n{doc.page_content}")
 
-    return vector_store.as_retriever(search_kwargs={"k": 3})
\ No newline at end of file
+    if mode == "hybrid":
+        return HybridRetriever(vector_store=vector_store, snapshot=snapshot, k=k, fusion=fusion)
+    return vector_store.as_retriever(search_kwargs={"k": k})
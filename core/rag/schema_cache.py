@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from sqlalchemy import inspect
+from sqlalchemy.engine import make_url
+from .config import SCHEMA_CACHE_TTL, SCHEMA_SNAPSHOT_DIR, SCHEMA_DISK_TTL
+
+_LOG = logging.getLogger(__name__)
+_CACHE = {}
+_LOCK = threading.Lock()
+_KEY_LOCKS = {}
+
+
+def url_key(url) -> str:
+    """
+    Stable short key for a connection URL or string (credentials are hashed, never stored).
+    """
+    url = make_url(url).render_as_string(hide_password=False)
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+
+
+def connection_key(engine) -> str:
+    return url_key(engine.url)
+
+
+def snapshot_schema(engine) -> dict:
+    """
+    Introspect tables, columns and foreign keys once into a plain, JSON-serialisable dict.
+    """
+    inspector = inspect(engine)
+    tables = {}
+    for table_name in inspector.get_table_names():
+        try:
+            tbl_comment = inspector.get_table_comment(table_name).get('text') or ''
+        except NotImplementedError:
+            tbl_comment = ''
+        pk = inspector.get_pk_constraint(table_name).get('constrained_columns') or []
+        cols = []
+        for col in inspector.get_columns(table_name):
+            cols.append({
+                "name": col['name'],
+                "type": str(col['type']),
+                "comment": col.get('comment') or '',
+                "nullable": bool(col.get('nullable', True)),
+            })
+        fks = []
+        for fk in inspector.get_foreign_keys(table_name):
+            if fk.get('referred_table') and fk.get('constrained_columns'):
+                fks.append({
+                    "columns": list(fk['constrained_columns']),
+                    "referred_table": fk['referred_table'],
+                    "referred_columns": list(fk.get('referred_columns') or []),
+                })
+        tables[table_name] = {"comment": tbl_comment, "columns": cols, "primary_key": pk, "foreign_keys": fks}
+    return {
+        "key": connection_key(engine),
+        "dialect": engine.dialect.name,
+        "built_at": time.time(),
+        "tables": tables,
+    }
+
+
+def _snapshot_path(key: str, directory: str) -> str:
+    return os.path.join(directory, f"{key}.json")
+
+
+def save_snapshot(snapshot: dict, directory: str = SCHEMA_SNAPSHOT_DIR) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = _snapshot_path(snapshot["key"], directory)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({k: v for k, v in snapshot.items() if k != "cached_at"}, f)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def load_snapshot(key: str, directory: str = SCHEMA_SNAPSHOT_DIR, max_age: float = SCHEMA_DISK_TTL):
+    """
+    Snapshot persisted by save_snapshot, or None if missing, unreadable or older than max_age.
+    """
+    try:
+        with open(_snapshot_path(key, directory), encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - snapshot.get("built_at", 0) >= max_age:
+        return None
+    return snapshot
+
+
+def _fresh(entry, ttl) -> bool:
+    return entry is not None and time.time() - entry.get("cached_at", entry["built_at"]) < ttl
+
+
+def _key_lock(key: str) -> threading.Lock:
+    with _LOCK:
+        return _KEY_LOCKS.setdefault(key, threading.Lock())
+
+
+def get_schema_snapshot(engine, ttl: float = SCHEMA_CACHE_TTL, refresh: bool = False) -> dict:
+    """
+    Cached snapshot_schema(engine), per database, refreshed after ttl seconds.
+    On a cold start a snapshot persisted by `manage.py warm_up` is used if it is recent enough.
+    Introspection holds a per-database lock only, so different connections build in parallel
+    and concurrent callers for the same one wait for a single build.
+    """
+    key = connection_key(engine)
+    entry = _CACHE.get(key)
+    if not refresh and _fresh(entry, ttl):
+        return entry
+    requested = time.time()
+    with _key_lock(key):
+        entry = _CACHE.get(key)
+        if _fresh(entry, ttl) and (not refresh or entry["built_at"] >= requested):
+            # fresh, or refreshed by another caller while this one waited
+            return entry
+        if entry is None and not refresh:
+            entry = load_snapshot(key)
+            if entry is not None:
+                _LOG.info("Schema snapshot %s loaded from disk", key)
+                entry["cached_at"] = time.time()
+        if entry is None or refresh or not _fresh(entry, ttl):
+            entry = snapshot_schema(engine)
+        with _LOCK:
+            _CACHE[key] = entry
+    return entry
+
+
+def invalidate_schema(engine=None):
+    with _LOCK:
+        if engine is None:
+            _CACHE.clear()
+        else:
+            _CACHE.pop(connection_key(engine), None)
@@ -0,0 +1,247 @@
+import re
+import difflib
+import sqlparse
+from sqlparse import sql as S
+from sqlparse import tokens as T
+
+# (pattern, replacement) rewrites of common date formatting into the dialect's own function
+DIALECT_REWRITES = {
+    "postgresql": [(re.compile(r"STRFTIME\(\s*'%Y-?%m'\s*,\s*([^\)]+)\)", re.I), r"TO_CHAR(\1, 'YYYY-MM')")],
+    "mysql": [(re.compile(r"STRFTIME\(\s*'%Y-?%m'\s*,\s*([^\)]+)\)", re.I), r"DATE_FORMAT(\1, '%Y-%m')")],
+    "mariadb": [(re.compile(r"STRFTIME\(\s*'%Y-?%m'\s*,\s*([^\)]+)\)", re.I), r"DATE_FORMAT(\1, '%Y-%m')")],
+    "mssql": [(re.compile(r"STRFTIME\(\s*'%Y-?%m'\s*,\s*([^\)]+)\)", re.I), r"FORMAT(\1, 'yyyy-MM')")],
+    "sqlite": [(re.compile(r"TO_CHAR\(\s*([^\),]+)\s*,\s*'YYYY-?MM'\s*\)", re.I), r"STRFTIME('%Y-%m', \1)")],
+}
+
+# functions models like to use that the dialect does not have
+UNSUPPORTED_FUNCTIONS = {
+    "sqlite": {"to_char", "date_trunc", "date_format", "extract", "now", "getdate", "dateadd", "datediff", "year", "month"},
+    "postgresql": {"strftime", "date_format", "ifnull", "getdate", "dateadd", "datediff", "year", "month"},
+    "mysql": {"strftime", "to_char", "date_trunc", "getdate", "dateadd"},
+    "mariadb": {"strftime", "date_trunc", "getdate", "dateadd"},
+    "mssql": {"strftime", "to_char", "date_trunc", "date_format", "now", "ifnull"},
+    "oracle": {"strftime", "date_trunc", "date_format", "now", "ifnull", "getdate"},
+}
+
+# names sqlparse leaves as plain names although they are not column references
+_NON_COLUMNS = {"epoch", "dow", "doy", "isodow", "isoyear", "week", "quarter", "day", "hour", "minute", "second",
+                "microseconds", "milliseconds", "current_date", "current_timestamp", "current_time",
+                "sysdate", "systimestamp", "localtimestamp", "rownum", "rowid", "level", "user", "current_user",
+                "session_user"}
+# built-in one-row tables, never in the snapshot
+_PSEUDO_TABLES = {"dual"}
+# SQL Server row limit, stripped before parsing: sqlparse reads "TOP 10 title" as two identifiers
+_TOP_RE = re.compile(r"(\bSELECT\s+(?:DISTINCT\s+|ALL\s+)?)TOP\s*(?:\(\s*[^)]*\)|\d+)(?:\s+PERCENT)?(?:\s+WITH\s+TIES)?",
+                     re.I)
+
+
+class SQLValidationError(ValueError):
+    """
+    Generated SQL references tables, columns or functions the target database does not have.
+    """
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("Invalid SQL: " + "; ".join(self.errors))
+
+
+def rewrite_dialect_functions(dialect: str, sql: str) -> str:
+    """
+    Rewrite date formatting written for another dialect (STRFTIME / TO_CHAR ...) into dialect's.
+    """
+    for pattern, repl in DIALECT_REWRITES.get((dialect or "").lower(), ()):
+        sql = pattern.sub(repl, sql)
+    return sql
+
+
+_NAMES = (T.Name, T.String.Symbol)
+
+
+def _unquote(name: str) -> str:
+    if len(name) > 1 and name[0] in '"`[' and name[-1] in '"`]':
+        name = name[1:-1]
+    return name.lower()
+
+
+def _meaningful(tlist):
+    return [t for t in tlist.tokens if not t.is_whitespace and t.ttype not in T.Comment]
+
+
+def _is_subquery(tlist) -> bool:
+    toks = _meaningful(tlist)
+    return len(toks) > 1 and toks[1].ttype is T.DML
+
+
+class _References:
+    """
+    Tables, aliases, columns and functions referenced anywhere in one statement.
+    """
+    def __init__(self):
+        self.tables = []          # (real name, alias)
+        self.opaque = set()       # CTE names and derived-table aliases: columns unknown
+        self.aliases = set()      # output column aliases
+        self.columns = []         # (qualifier or None, name)
+        self.functions = set()
+        # set on constructs the walker cannot classify; unqualified columns are then not checked
+        self.uncertain = False
+
+    def walk(self, tlist, tables_allowed: bool):
+        expect = None
+        for tok in _meaningful(tlist):
+            if tok.ttype is T.CTE:
+                expect = "cte"
+                continue
+            if tok.ttype in T.Keyword:
+                kw = tok.normalized.upper()
+                if tables_allowed and (kw == "FROM" or kw.endswith("JOIN")):
+                    expect = "table"
+                elif kw == "AS" and expect is None:
+                    # "<literal> AS name": sqlparse does not group keyword literals (TRUE, NULL) with their alias
+                    expect = "alias"
+                elif kw != "AS":
+                    expect = None
+                continue
+            if expect == "alias" and isinstance(tok, (S.Identifier, S.IdentifierList)) or \
+                    expect == "alias" and tok.ttype in _NAMES:
+                items = self._items(tok) if isinstance(tok, S.TokenList) else [tok]
+                self.aliases.add(_unquote(items[0].value.split()[0]))
+                for item in items[1:]:
+                    if isinstance(item, S.Identifier):
+                        self._identifier(item)
+                    elif isinstance(item, S.Function):
+                        self._function(item)
+                expect = None
+                continue
+            if expect == "table" and isinstance(tok, (S.Identifier, S.IdentifierList, S.Function)):
+                for ident in self._items(tok):
+                    self._table(ident)
+                expect = None
+            elif expect == "cte" and isinstance(tok, (S.Identifier, S.IdentifierList)):
+                for ident in self._items(tok):
+                    self.opaque.add(_unquote(ident.get_real_name() or ident.value))
+                    for child in ident.tokens:
+                        if isinstance(child, S.Parenthesis):
+                            self.walk(child, True)
+                expect = None
+            elif isinstance(tok, S.Identifier):
+                self._identifier(tok)
+            elif isinstance(tok, S.Function):
+                self._function(tok)
+            elif isinstance(tok, S.TokenList):
+                self.walk(tok, isinstance(tok, S.Parenthesis) and _is_subquery(tok) or
+                          (tables_allowed and not isinstance(tok, S.Parenthesis)))
+            elif tok.ttype in _NAMES:
+                self.columns.append((None, _unquote(tok.value)))
+
+    def _items(self, tok):
+        if isinstance(tok, S.IdentifierList):
+            return [t for t in tok.get_identifiers() if isinstance(t, (S.Identifier, S.Function))]
+        return [tok]
+
+    def _table(self, ident):
+        alias = ident.get_alias()
+        inner = [c for c in ident.tokens if isinstance(c, (S.Parenthesis, S.Function))]
+        if isinstance(ident, S.Function) or inner:
+            # derived table or table-valued function
+            self.opaque.add(_unquote(alias or ident.get_real_name() or ""))
+            for c in inner or [ident]:
+                self.walk(c, True)
+            return
+        self.tables.append((_unquote(ident.get_real_name()), _unquote(alias) if alias else None))
+
+    def _function(self, func):
+        name = func.get_real_name()
+        if name:
+            self.functions.add(name.lower())
+        for child in func.tokens:
+            if isinstance(child, S.Parenthesis):
+                self.walk(child, False)
+            elif isinstance(child, S.TokenList) and not isinstance(child, S.Identifier):
+                self.walk(child, False)
+
+    def _identifier(self, ident):
+        alias = ident.get_alias()
+        if alias:
+            self.aliases.add(_unquote(alias))
+        chain, rest = [], []
+        for i, child in enumerate(ident.tokens):
+            if child.ttype in _NAMES and (not chain or ident.tokens[i - 1].match(T.Punctuation, ".")):
+                chain.append(_unquote(child.value))
+            elif child.match(T.Punctuation, ".") and chain:
+                continue
+            elif child.ttype is T.Wildcard and chain:
+                chain.append("*")
+            else:
+                rest = ident.tokens[i:]
+                break
+        if chain:
+            *qualifier, name = chain
+            self.columns.append((qualifier[-1] if qualifier else None, name))
+        elif rest and not isinstance(rest[0], S.TokenList) and rest[0].ttype not in T.Literal \
+                and rest[0].ttype not in T.Operator:
+            self.uncertain = True
+        for child in rest:
+            if isinstance(child, S.Identifier) and alias and _unquote(child.value) == _unquote(alias):
+                continue
+            if isinstance(child, S.Function):
+                self._function(child)
+            elif isinstance(child, S.Identifier):
+                self._identifier(child)
+            elif isinstance(child, S.TokenList):
+                self.walk(child, isinstance(child, S.Parenthesis) and _is_subquery(child))
+
+
+def _suggest(name, candidates) -> str:
+    match = difflib.get_close_matches(name, list(candidates), n=1)
+    return f" (did you mean '{match[0]}'?)" if match else ""
+
+
+def validate_sql(sql: str, snapshot: dict, dialect: str = None):
+    """
+    Resolve table, column and function references of sql against a schema snapshot
+    without touching the database. Raises SQLValidationError listing every unknown reference.
+    References into CTEs and derived tables are not checked.
+    """
+    statements = [s for s in sqlparse.parse(_TOP_RE.sub(r"\1", sql)) if s.token_first(skip_cm=True) is not None]
+    if not statements:
+        raise SQLValidationError(["empty statement"])
+    schema = {t.lower(): {c["name"].lower() for c in info["columns"]} for t, info in snapshot["tables"].items()}
+    dialect = (dialect or snapshot.get("dialect") or "").lower()
+
+    errors = []
+    for statement in statements:
+        refs = _References()
+        refs.walk(statement, True)
+
+        scope = {name: None for name in refs.opaque}
+        for real, alias in refs.tables:
+            if real in refs.opaque or real in _PSEUDO_TABLES:
+                cols = None
+            elif real in schema:
+                cols = schema[real]
+            else:
+                errors.append(f"unknown table '{real}'{_suggest(real, schema)}")
+                cols = None
+            scope[real] = cols
+            if alias:
+                scope[alias] = cols
+
+        known = [cols for cols in scope.values() if cols is not None]
+        all_known = set().union(*known) if known else set()
+        opaque = any(cols is None for cols in scope.values())
+        for qualifier, name in refs.columns:
+            if qualifier is not None:
+                if qualifier not in scope:
+                    errors.append(f"unknown table or alias '{qualifier}'{_suggest(qualifier, scope)}")
+                    continue
+                cols = scope[qualifier]
+                if cols is not None and name != "*" and name not in cols:
+                    errors.append(f"unknown column '{qualifier}.{name}'{_suggest(name, cols)}")
+            elif scope and not opaque and not refs.uncertain and name != "*" and name not in all_known \
+                    and name not in refs.aliases and name not in _NON_COLUMNS and name not in scope:
+                errors.append(f"unknown column '{name}'{_suggest(name, all_known)}")
+
+        for func in sorted(refs.functions & UNSUPPORTED_FUNCTIONS.get(dialect, set())):
+            errors.append(f"function {func.upper()}() is not available on {dialect}")
+
+    if errors:
+        raise SQLValidationError(dict.fromkeys(errors))
@@ -0,0 +1,111 @@
+"""
+Per-table row estimates and on-disk sizes from the database catalog, for the dashboard.
+One bulk catalog query per connection (never COUNT(*)), cached for TABLE_STATS_TTL seconds.
+"""
+import time
+import logging
+import threading
+from sqlalchemy import inspect, text
+from .schema_cache import connection_key
+from .config import TABLE_STATS_TTL
+
+_LOG = logging.getLogger(__name__)
+_CACHE = {}
+_LOCK = threading.Lock()
+_KEY_LOCKS = {}
+
+# (name, row_estimate, total_bytes) for the tables of the default schema; tried in order,
+# later queries need fewer privileges. Estimates are as fresh as the last ANALYZE / stats job.
+_STATS_SQL = {
+    "postgresql": [
+        """SELECT c.relname, c.reltuples, pg_total_relation_size(c.oid)
+           FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+           WHERE c.relkind IN ('r', 'p') AND n.nspname = current_schema()""",
+    ],
+    "mssql": [
+        """SELECT t.name, SUM(CASE WHEN p.index_id IN (0, 1) THEN p.row_count ELSE 0 END),
+                  SUM(CAST(p.reserved_page_count AS BIGINT)) * 8192
+           FROM sys.tables t JOIN sys.dm_db_partition_stats p ON p.object_id = t.object_id
+           WHERE t.schema_id = SCHEMA_ID()
+           GROUP BY t.name""",
+        # sys.dm_db_partition_stats needs VIEW DATABASE STATE
+        """SELECT t.name, SUM(CASE WHEN p.index_id IN (0, 1) THEN p.rows ELSE 0 END), NULL
+           FROM sys.tables t JOIN sys.partitions p ON p.object_id = t.object_id
+           WHERE t.schema_id = SCHEMA_ID()
+           GROUP BY t.name""",
+    ],
+    "oracle": [
+        """SELECT t.table_name, t.num_rows, s.bytes
+           FROM user_tables t
+           LEFT JOIN (SELECT segment_name, SUM(bytes) AS bytes FROM user_segments
+                      WHERE segment_type LIKE 'TABLE%' GROUP BY segment_name) s
+             ON s.segment_name = t.table_name""",
+    ],
+    "mysql": [
+        """SELECT table_name, table_rows, data_length + index_length
+           FROM information_schema.tables
+           WHERE table_schema = DATABASE() AND table_type = 'BASE TABLE'""",
+    ],
+}
+
+
+def _number(value):
+    # PostgreSQL reports -1 reltuples for tables never analyzed, Oracle NULL num_rows
+    if value is None or value < 0:
+        return None
+    return int(value)
+
+
+def _catalog_stats(engine):
+    for sql in _STATS_SQL.get(engine.dialect.name, ()):
+        try:
+            with engine.connect() as conn:
+                rows = conn.execute(text(sql)).fetchall()
+        except Exception as e:
+            _LOG.warning("Catalog statistics query failed on %s: %s", engine.dialect.name, e)
+            continue
+        return {name: (_number(n), _number(size)) for name, n, size in rows}
+    return None
+
+
+def table_stats(engine) -> dict:
+    """
+    {"key", "built_at", "source": "catalog" or "names", "tables": [{"name", "rows", "bytes"}]}
+    sorted by name. rows/bytes are None where the catalog has no estimate; "names" means the
+    dialect has no catalog query (or none was permitted) and only table names are listed.
+    """
+    stats = _catalog_stats(engine)
+    if stats is None:
+        tables = [{"name": name, "rows": None, "bytes": None} for name in sorted(inspect(engine).get_table_names())]
+    else:
+        dialect = engine.dialect
+        # same spelling as the inspector (Oracle's upper-case catalog names come back lower case)
+        normalize = dialect.normalize_name if getattr(dialect, "requires_name_normalize", False) else str
+        tables = sorted(({"name": normalize(name), "rows": n, "bytes": size} for name, (n, size) in stats.items()),
+                        key=lambda t: t["name"])
+    return {"key": connection_key(engine), "built_at": time.time(),
+            "source": "names" if stats is None else "catalog", "tables": tables}
+
+
+def get_table_stats(engine, ttl: float = TABLE_STATS_TTL, refresh: bool = False) -> dict:
+    """
+    Cached table_stats(engine), per database, refreshed after ttl seconds. The catalog query
+    holds a per-database lock only, so a slow database does not block the others.
+    """
+    key = connection_key(engine)
+    entry = _CACHE.get(key)
+    if not refresh and entry is not None and time.time() - entry["built_at"] < ttl:
+        return entry
+    requested = time.time()
+    with _LOCK:
+        key_lock = _KEY_LOCKS.setdefault(key, threading.Lock())
+    with key_lock:
+        entry = _CACHE.get(key)
+        fresh = entry is not None and time.time() - entry["built_at"] < ttl
+        if fresh and (not refresh or entry["built_at"] >= requested):
+            # fresh, or refreshed by another request while this one waited
+            return entry
+        entry = table_stats(engine)
+        with _LOCK:
+            _CACHE[key] = entry
+    return entry
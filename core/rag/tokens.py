@@ -0,0 +1,50 @@
+import re
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# question words that never identify a table or column
+STOP_WORDS = {"the", "of", "by", "per", "and", "for", "in", "on", "a", "an", "to", "each", "what", "how",
+              "many", "number", "show", "list", "plot", "chart", "give", "me", "all", "with", "over", "time",
+              "is", "are", "was", "which", "who", "that", "from", "their", "most", "top"}
+
+
+def words(text: str) -> set:
+    """
+    Lowercase word set for lexical matching; identifiers are split on underscores
+    and a plural "s" is dropped.
+    """
+    out = set()
+    for t in _WORD_RE.findall((text or "").lower().replace("_", " ")):
+        out.add(t)
+        if len(t) > 3 and t.endswith("s"):
+            out.add(t[:-1])
+    return out
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local BPE-ish estimate: one token per punctuation mark, ~4 characters per word token.
+    Close enough to budget prompts without shipping a tokenizer.
+    """
+    n = 0
+    for piece in _PIECE_RE.findall(text or ""):
+        n += 1 if len(piece) <= 4 else (len(piece) + 3) // 4
+    return n
+
+
+def truncate_to_budget(texts, budget: int):
+    """
+    Keep texts in order, line by line, until budget tokens are used.
+    Returns (kept_text, used_tokens, dropped_tokens).
+    """
+    kept, used, dropped = [], 0, 0
+    for text in texts:
+        for line in text.splitlines():
+            cost = estimate_tokens(line) + 1
+            if not dropped and used + cost <= budget:
+                kept.append(line)
+                used += cost
+            else:
+                dropped += cost
+    return "\n".join(kept), used, dropped
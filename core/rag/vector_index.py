@@ -0,0 +1,121 @@
+import os
+import glob
+import json
+import hashlib
+import logging
+import threading
+from langchain_core.documents import Document
+
+_LOG = logging.getLogger(__name__)
+
+# one Chroma collection per connection namespace (see schema_cache.connection_key)
+COLLECTION_PREFIX = "schema_"
+# collection that build_retriever used to append every request to, before namespacing
+LEGACY_COLLECTION = "langchain"
+
+_SYNCED = {}
+_LOCK = threading.Lock()
+_SYNC_LOCKS = {}
+
+
+def collection_name(namespace: str) -> str:
+    return COLLECTION_PREFIX + namespace
+
+
+def _doc_hash(doc: Document) -> str:
+    return hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()[:16]
+
+
+def sync_chroma(docs, embeddings, persist_directory: str, namespace: str):
+    """
+    Chroma collection of namespace holding exactly docs, one entry per table (id = table name).
+    Only new or changed documents are embedded; documents of dropped tables are deleted.
+    """
+    from langchain_community.vectorstores import Chroma
+    store = Chroma(collection_name=collection_name(namespace), embedding_function=embeddings,
+                   persist_directory=persist_directory)
+    want = {d.metadata["table"]: Document(page_content=d.page_content, metadata={**d.metadata, "hash": _doc_hash(d)})
+            for d in docs}
+    fingerprint = sorted((t, d.metadata["hash"]) for t, d in want.items())
+    sync_key = (os.path.abspath(persist_directory), namespace)
+    # count() guards against the collection being dropped by another process
+    if _SYNCED.get(sync_key) == fingerprint and store._collection.count() == len(want):
+        return store
+
+    # per collection: embedding the changed documents of one connection must not block the others
+    with _LOCK:
+        sync_lock = _SYNC_LOCKS.setdefault(sync_key, threading.Lock())
+    with sync_lock:
+        existing = store.get(include=["metadatas"])
+        have = {i: (m or {}).get("hash") for i, m in zip(existing["ids"], existing["metadatas"])}
+        stale = [i for i in have if i not in want]
+        changed = [t for t, d in want.items() if have.get(t) != d.metadata["hash"]]
+        if stale:
+            store.delete(ids=stale)
+        if changed:
+            store.add_documents([want[t] for t in changed], ids=changed)
+        if stale or changed:
+            _LOG.info("Vector collection %s: %d embedded, %d removed", namespace, len(changed), len(stale))
+        with _LOCK:
+            _SYNCED[sync_key] = fingerprint
+    return store
+
+
+def _chroma_client(persist_directory: str):
+    import chromadb
+    return chromadb.PersistentClient(path=persist_directory)
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+
+def list_indexes(persist_directory: str, numpy_dir: str) -> list:
+    """
+    Every schema index on disk: [{backend, name, namespace (None if not namespaced), documents, bytes}].
+    documents is None where the collection cannot be read.
+    Chroma byte sizes are only known for the whole directory and are reported on a "(total)" row.
+    """
+    out = []
+    if os.path.isdir(persist_directory):
+        client = _chroma_client(persist_directory)
+        for c in client.list_collections():
+            name = getattr(c, "name", c)
+            ns = name[len(COLLECTION_PREFIX):] if name.startswith(COLLECTION_PREFIX) else None
+            try:
+                count = client.get_collection(name).count()
+            except Exception as e:
+                # a damaged collection (e.g. a missing HNSW segment) can still be dropped
+                _LOG.warning("Cannot count vector collection %s: %s", name, e)
+                count = None
+            out.append({"backend": "chroma", "name": name, "namespace": ns, "documents": count, "bytes": None})
+        out.append({"backend": "chroma", "name": "(total)", "namespace": None, "documents": None,
+                    "bytes": _dir_size(persist_directory)})
+    for meta in sorted(glob.glob(os.path.join(numpy_dir, "*.json"))):
+        ns = os.path.basename(meta)[:-len(".json")]
+        try:
+            with open(meta, encoding="utf-8") as f:
+                n_docs = len(json.load(f).get("documents", []))
+        except (OSError, ValueError) as e:
+            _LOG.warning("Cannot read NumPy index %s: %s", meta, e)
+            n_docs = None
+        size = sum(os.path.getsize(p) for p in glob.glob(os.path.join(numpy_dir, ns + ".*")))
+        out.append({"backend": "numpy", "name": ns, "namespace": ns, "documents": n_docs, "bytes": size})
+    return out
+
+
+def drop_index(backend: str, name: str, persist_directory: str, numpy_dir: str):
+    if backend == "chroma":
+        _chroma_client(persist_directory).delete_collection(name)
+    else:
+        for path in glob.glob(os.path.join(numpy_dir, name + ".*")):
+            os.remove(path)
+    with _LOCK:
+        _SYNCED.clear()
@@ -0,0 +1,262 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+_LOG = logging.getLogger(__name__)
+
+# rows scored per matrix product; bounds the working set when the index is memory-mapped
+SEARCH_BATCH = 4096
+PRECISIONS = ("float32", "float16", "int8")
+
+
+def documents_fingerprint(docs) -> str:
+    h = hashlib.sha1()
+    for d in docs:
+        h.update(d.page_content.encode("utf-8"))
+        h.update(json.dumps(d.metadata or {}, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _normalise(vectors) -> np.ndarray:
+    mat = np.asarray(vectors, dtype=np.float32)
+    if mat.ndim == 1:
+        mat = mat[None, :]
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+def quantize(mat: np.ndarray, precision: str = "float32"):
+    """
+    Returns (data, scales). int8 uses one scale per row (max |x| / 127), scales is None otherwise.
+    """
+    if precision == "float32":
+        return np.asarray(mat, dtype=np.float32), None
+    if precision == "float16":
+        return np.asarray(mat, dtype=np.float16), None
+    if precision == "int8":
+        scales = np.abs(mat).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        data = np.clip(np.rint(mat / scales[:, None]), -127, 127).astype(np.int8)
+        return data, scales.astype(np.float32)
+    raise ValueError(f"Unknown vector precision: {precision}")
+
+
+def dequantize(data: np.ndarray, scales=None) -> np.ndarray:
+    mat = np.asarray(data, dtype=np.float32)
+    return mat * scales[:, None] if scales is not None else mat
+
+
+class QuestionEmbeddingCache:
+    """
+    Bounded LRU of question embeddings, stored quantized like the index they are searched against.
+    """
+    def __init__(self, max_entries: int = 1024, precision: str = "float32"):
+        self.max_entries = max_entries
+        self.precision = precision
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, embedding, query: str) -> np.ndarray:
+        key = (getattr(embedding, "embed_model", type(embedding).__name__), self.precision, query)
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None:
+                self._entries.move_to_end(key)
+                return dequantize(*hit)
+        vec = _normalise(embedding.embed_query(query))
+        entry = quantize(vec, self.precision)
+        if self.max_entries:
+            with self._lock:
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return dequantize(*entry)
+
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(d.nbytes + (s.nbytes if s is not None else 0) for d, s in self._entries.values())
+
+
+_QUESTIONS = {}
+
+def question_cache(precision: str = "float32", max_entries: int = 1024) -> QuestionEmbeddingCache:
+    cache = _QUESTIONS.get(precision)
+    if cache is None:
+        cache = _QUESTIONS.setdefault(precision, QuestionEmbeddingCache(max_entries, precision))
+    return cache
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Brute-force cosine index for small collections (schema documents of one connection).
+    Vectors are L2-normalised rows stored as float32, float16 or int8 with a per-row scale
+    (precision); scores are computed on the stored form, chunk by chunk. When persisted they
+    live in <dir>/<namespace>.npy (memory-mapped on load, int8 scales in <namespace>.scales.npy)
+    next to <namespace>.json holding the documents.
+    Distances returned by *_with_score are 1 - cosine similarity (lower is closer).
+    """
+    def __init__(self, embedding, vectors=None, documents=None, path: str = None,
+                 precision: str = "float32", scales=None, query_cache: QuestionEmbeddingCache = None):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown vector precision: {precision}")
+        self.embedding = embedding
+        self.documents = list(documents or [])
+        self.vectors = vectors if vectors is not None else np.zeros((0, 0), dtype=precision)
+        self.scales = scales
+        self.precision = precision
+        self.query_cache = query_cache
+        self.path = path
+        self._lock = threading.Lock()
+
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def _embed_query(self, query: str):
+        if self.query_cache is not None:
+            return self.query_cache.get(self.embedding, query)
+        return self.embedding.embed_query(query)
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    # --- persistence -------------------------------------------------------
+
+    @staticmethod
+    def _paths(directory: str, namespace: str):
+        base = os.path.join(directory, namespace)
+        return base + ".npy", base + ".json", base + ".scales.npy"
+
+    @staticmethod
+    def _write_npy(path: str, arr):
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(arr))
+        os.replace(path + ".tmp", path)
+
+    def save(self, directory: str, namespace: str, fingerprint: str = None):
+        os.makedirs(directory, exist_ok=True)
+        npy, meta, scales = self._paths(directory, namespace)
+        self._write_npy(npy, self.vectors)
+        if self.scales is not None:
+            self._write_npy(scales, self.scales)
+        elif os.path.exists(scales):
+            os.remove(scales)
+        docs = [{"page_content": d.page_content, "metadata": d.metadata or {}} for d in self.documents]
+        with open(meta + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "precision": self.precision, "documents": docs}, f)
+        os.replace(meta + ".tmp", meta)
+        self.path = npy
+
+    @classmethod
+    def load(cls, directory: str, namespace: str, embedding, mmap: bool = True, **kwargs):
+        """
+        Open a persisted index, or return None if there is none.
+        Returns (store, fingerprint).
+        """
+        npy, meta, scales_path = cls._paths(directory, namespace)
+        if not (os.path.exists(npy) and os.path.exists(meta)):
+            return None, None
+        with open(meta, encoding="utf-8") as f:
+            data = json.load(f)
+        precision = data.get("precision", "float32")
+        vectors = np.load(npy, mmap_mode="r" if mmap else None)
+        scales = np.load(scales_path) if precision == "int8" else None
+        docs = [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in data["documents"]]
+        store = cls(embedding, vectors, docs, path=npy, precision=precision, scales=scales, **kwargs)
+        return store, data.get("fingerprint")
+
+    @classmethod
+    def load_or_build(cls, documents, embedding, directory: str, namespace: str,
+                      precision: str = "float32", query_cache: QuestionEmbeddingCache = None):
+        """
+        Reuse the persisted index of namespace while its documents and precision are unchanged;
+        otherwise embed documents once and persist them.
+        """
+        fingerprint = documents_fingerprint(documents)
+        store, stored = cls.load(directory, namespace, embedding, query_cache=query_cache)
+        if store is not None and stored == fingerprint and store.precision == precision:
+            return store
+        _LOG.info("Building %s vector index %s (%d documents)", precision, namespace, len(documents))
+        store = cls(embedding, precision=precision, query_cache=query_cache)
+        store.add_documents(documents)
+        store.save(directory, namespace, fingerprint)
+        return store
+
+    # --- VectorStore interface ----------------------------------------------
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        new = new_scales = None
+        if texts:
+            new, new_scales = quantize(_normalise(self.embedding.embed_documents(texts)), self.precision)
+        with self._lock:
+            start = len(self.documents)
+            self.documents.extend(Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas))
+            if new is not None:
+                first = len(self.vectors) == 0
+                self.vectors = new if first else np.vstack([self.vectors, new])
+                if new_scales is not None:
+                    self.scales = new_scales if first else np.concatenate([self.scales, new_scales])
+        return [str(i) for i in range(start, start + len(texts))]
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, precision: str = "float32", **kwargs):
+        store = cls(embedding, precision=precision)
+        store.add_texts(texts, metadatas)
+        return store
+
+    def scores(self, queries) -> np.ndarray:
+        """
+        Cosine similarities of every stored vector to each query; shape (n_queries, n_vectors).
+        """
+        q = _normalise(queries)
+        n = len(self.vectors)
+        out = np.empty((q.shape[0], n), dtype=np.float32)
+        for i in range(0, n, SEARCH_BATCH):
+            chunk = np.asarray(self.vectors[i:i + SEARCH_BATCH], dtype=np.float32)
+            out[:, i:i + SEARCH_BATCH] = q @ chunk.T
+        if self.scales is not None:
+            out *= self.scales[None, :]
+        return out
+
+    def _top_k(self, sims: np.ndarray, k: int):
+        k = min(k, len(sims))
+        if k <= 0:
+            return []
+        idx = np.argpartition(-sims, k - 1)[:k]
+        idx = idx[np.argsort(-sims[idx])]
+        return [(self.documents[i], float(1.0 - sims[i])) for i in idx]
+
+    def similarity_search_with_score_by_vector(self, embedding, k: int = 4):
+        if not self.documents:
+            return []
+        return self._top_k(self.scores(embedding)[0], k)
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs):
+        return self.similarity_search_with_score_by_vector(self._embed_query(query), k)
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, **kwargs):
+        return [d for d, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs):
+        return [d for d, _ in self.similarity_search_with_score(query, k)]
+
+    def batch_search(self, queries, k: int = 4):
+        """
+        Top-k (document, distance) lists for several query strings with one matrix product.
+        """
+        if not self.documents:
+            return [[] for _ in queries]
+        sims = self.scores(np.vstack([self._embed_query(q) for q in queries]))
+        return [self._top_k(row, k) for row in sims]
+
+    def _select_relevance_score_fn(self):
+        return lambda distance: 1.0 - distance
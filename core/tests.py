@@ -1,3 +1,885 @@
-from django.test import TestCase
+import os
+import json
+import time
+import hashlib
+import datetime
+from decimal import Decimal
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from sqlalchemy import create_engine, text
+from langchain_core.documents import Document
+import numpy as np
+import pandas as pd
+
+from core.rag.sql_validator import validate_sql, SQLValidationError
+from core.rag.conversation import Conversation, is_follow_up
+from core.rag.context import ContextBuilder
+from core.rag.tokens import estimate_tokens
+from core.charts.pool import RenderPool, RenderPoolBusy
+from core.charts.spec import build_chart_spec, VEGA_LITE_SCHEMA
+from core.charts.column_index import column_role
+from core.charts.store import PlotStore
+from core.charts.downsample import lttb_indices, top_n, OTHER_LABEL
+from core.rag.lexical import BM25Index
+from core.rag.retriever import fuse_rankings, numpy_store
+from core.rag.rag_pipeline import RAGPipeline
+from core.rag.vector_store import NumpyVectorStore
+from core.rag.answer_cache import AnswerCache, answer_fingerprint
+from core.rag.join_graph import JoinGraph
+from core.rag.schema_cache import url_key, snapshot_schema
+from core.rag.table_stats import table_stats, get_table_stats
+from core.rag.vector_index import collection_name, LEGACY_COLLECTION
+from core.models import ConnectionConfig, QueryLog
+from core.views import conn_str_for, log_query
+from core.management.commands.prewarm import Command as PrewarmCommand
+from core.rag.llm_utils import (LLMScheduler, LLMOverloaded, SingleFlight, PRIORITY_INTERACTIVE,
+                                PRIORITY_BACKGROUND)
+
+
+def _snapshot(tables, dialect=""):
+    return {"dialect": dialect,
+            "tables": {t: {"columns": [{"name": c, "type": "INTEGER"} for c in cols]} for t, cols in tables.items()}}
+
+
+class ValidateSQLTests(SimpleTestCase):
+    snapshot = _snapshot({"film": ["id", "title", "length"], "actor": ["id", "name", "film_id"]})
+
+    def assertValid(self, sql, dialect):
+        validate_sql(sql, self.snapshot, dialect)
+
+    def assertInvalid(self, sql, dialect, message):
+        with self.assertRaises(SQLValidationError) as ctx:
+            validate_sql(sql, self.snapshot, dialect)
+        self.assertIn(message, str(ctx.exception))
+
+    def test_known_references(self):
+        self.assertValid("SELECT a.name, f.title FROM film f JOIN actor a ON a.film_id = f.id", "postgresql")
+        self.assertValid("WITH t AS (SELECT title FROM film) SELECT title FROM t", "postgresql")
+        self.assertValid("SELECT length, COUNT(*) AS n FROM film GROUP BY length ORDER BY n DESC", "sqlite")
+
+    def test_unknown_references(self):
+        self.assertInvalid("SELECT * FROM films", "postgresql", "unknown table 'films'")
+        self.assertInvalid("SELECT titel FROM film", "postgresql", "did you mean 'title'")
+        self.assertInvalid("SELECT f.nope FROM film f", "postgresql", "unknown column 'f.nope'")
+        self.assertInvalid("SELECT a.name FROM film f JOIN actor a ON a.film = f.id", "postgresql", "unknown column 'a.film'")
+
+    def test_unsupported_function(self):
+        self.assertInvalid("SELECT STRFTIME('%Y', length) FROM film", "postgresql", "STRFTIME()")
+
+    def test_mssql_top(self):
+        self.assertValid("SELECT TOP 10 title FROM film ORDER BY length DESC", "mssql")
+        self.assertValid("SELECT TOP 5 * FROM film", "mssql")
+        self.assertValid("SELECT TOP 10 f.title FROM film f", "mssql")
+        self.assertValid("SELECT DISTINCT TOP (3) title FROM film", "mssql")
+        self.assertValid("SELECT TOP 10 PERCENT title FROM film", "mssql")
+        self.assertInvalid("SELECT TOP 10 nope FROM film", "mssql", "unknown column 'nope'")
+
+    def test_oracle_dual(self):
+        self.assertValid("SELECT SYSDATE FROM dual", "oracle")
+        self.assertValid("SELECT title FROM film WHERE ROWNUM <= 10", "oracle")
+
+    def test_literal_aliases(self):
+        for dialect in ("sqlite", "postgresql", "mysql", "mssql"):
+            self.assertValid("SELECT true AS flag, title FROM film", dialect)
+            self.assertValid("SELECT NULL AS z, 'x' AS s, 1 AS one, title FROM film ORDER BY one", dialect)
+        self.assertInvalid("SELECT true AS flag, nope FROM film", "sqlite", "unknown column 'nope'")
+
+
+class FollowUpTests(SimpleTestCase):
+    def test_follow_ups(self):
+        for q in ["now only for 2024", "And per store?", "what about last year", "sort it by amount",
+                  "Group by month", "limit to 10", "show the same for customers", "use rentals instead",
+                  "change the previous query to count actors"]:
+            self.assertTrue(is_follow_up(q), q)
+
+    def test_standalone_questions(self):
+        for q in ["How many rentals were made this month?", "Which customers signed up this year?",
+                  "Order count per customer", "Group payments by month", "Add up total payments per store",
+                  "List customers who rented films above average length",
+                  "Now list every customer with more than three rentals in the last year by store and city and month"]:
+            self.assertFalse(is_follow_up(q), q)
+
+    def test_history_is_bounded(self):
+        conv = Conversation(max_turns=2, max_chars=600)
+        conv.bind("key", "fingerprint")
+        for i in range(5):
+            conv.add(f"q{i}", "SELECT 1", "x" * 200, ["film"])
+        self.assertEqual([t["question"] for t in conv.turns], ["q3", "q4"])
+        self.assertEqual(["context" in t for t in conv.turns], [False, True])
+        conv.bind("key", "other fingerprint")
+        self.assertEqual(conv.turns, [])
+
+
+class ContextBudgetTests(SimpleTestCase):
+    def setUp(self):
+        self.snapshot = {"tables": {
+            f"t{i}": {"columns": [{"name": "id", "type": "INTEGER", "comment": ""}] +
+                               [{"name": f"attr{j}", "type": "CHARACTER VARYING(40)", "comment": "free text"}
+                                for j in range(30)] +
+                               [{"name": "rating", "type": "INTEGER", "comment": ""}] +
+                               ([{"name": "parent_id", "type": "INTEGER", "comment": ""}] if i else []),
+                      "primary_key": ["id"],
+                      "foreign_keys": [{"columns": ["parent_id"], "referred_table": f"t{i - 1}",
+                                        "referred_columns": ["id"]}] if i else []}
+            for i in range(10)}}
+        self.docs = [Document(page_content=f"Table: t{i}", metadata={"table": f"t{i}"}) for i in range(10)]
+
+    def test_under_budget_is_untouched(self):
+        text, stats = ContextBuilder(self.snapshot, 100000).build("rating", self.docs)
+        self.assertEqual(stats["steps"], [])
+        self.assertEqual(stats["columns_dropped"], 0)
+        self.assertIn("free text", text)
+
+    def test_budget_is_hard(self):
+        for budget in (0, 10, 30, 60, 120, 250, 500, 1000, 2000):
+            text, stats = ContextBuilder(self.snapshot, budget).build("rating by parent", self.docs)
+            self.assertLessEqual(stats["used_tokens"], budget, stats)
+            self.assertLessEqual(estimate_tokens(text), budget)
+
+    def test_prune_keeps_keys_and_matching_columns(self):
+        text, stats = ContextBuilder(self.snapshot, 100).build("average rating", self.docs[:2])
+        self.assertIn("prune_columns", stats["steps"])
+        self.assertIn(" - rating (int)", text)
+        self.assertIn(" - parent_id (int)", text)
+        self.assertIn("more columns omitted", text)
+
+    def test_fixed_costs_drop_hints_then_lowest_ranked_tables(self):
+        text, stats = ContextBuilder(self.snapshot, 40).build("rating", self.docs)
+        self.assertIn("drop_join_hints", stats["steps"])
+        self.assertGreater(stats["tables_dropped"], 0)
+        self.assertIn("Table: t0", text)
+        self.assertNotIn("Table: t9", text)
+
+
+class ColumnRoleTests(SimpleTestCase):
+    def role(self, typ, name="value"):
+        return column_role({"name": name, "type": typ})
+
+    def test_type_words(self):
+        for typ in ("INTEGER", "BIGINT", "NUMERIC(10, 2)", "DOUBLE PRECISION", "NUMBER(10,0)", "INT UNSIGNED"):
+            self.assertEqual(self.role(typ), "numeric", typ)
+        for typ in ("DATE", "TIMESTAMP WITHOUT TIME ZONE", "DATETIME2"):
+            self.assertEqual(self.role(typ), "temporal", typ)
+        for typ in ("VARCHAR(20)", "CHARACTER VARYING(40)", "NVARCHAR2(30)", "BOOLEAN"):
+            self.assertEqual(self.role(typ), "categorical", typ)
+
+    def test_no_substring_matches(self):
+        for typ in ("POINT", "INTERVAL", "INTERVAL YEAR TO MONTH", "GEOMETRY", "BLOB"):
+            self.assertIsNone(self.role(typ), typ)
+
+    def test_identifiers(self):
+        self.assertEqual(self.role("INTEGER", "customer_id"), "identifier")
+
+
+class PlotStoreSweepTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = PlotStore(tmp.name, max_bytes=250, max_age=3600)
+        now = time.time()
+        self.keys = []
+        # oldest first: one expired file, then three 100-byte files of increasing mtime
+        for age in (7200, 300, 200, 100):
+            key, path = self.store.allocate()
+            with open(path, "wb") as f:
+                f.write(b"x" * 100)
+            os.utime(path, (now - age, now - age))
+            self.keys.append(key)
+
+    def exists(self):
+        return [os.path.exists(self.store.path(k)) for k in self.keys]
+
+    def test_expired_then_oldest_until_size_fits(self):
+        res = self.store.sweep()
+        self.assertEqual(res["removed"], 2)
+        self.assertEqual(res["after"], {"files": 2, "bytes": 200})
+        self.assertEqual(self.exists(), [False, False, True, True])
+
+    def test_dry_run_keeps_files(self):
+        res = self.store.sweep(dry_run=True)
+        self.assertEqual(res["removed"], 2)
+        self.assertEqual(self.exists(), [True, True, True, True])
+
+    def test_url_matches_path_shard(self):
+        key = self.keys[0]
+        self.assertTrue(self.store.url(key).endswith(f"/plots/{key[5:7]}/{key}"))
+
+    def test_files_vanishing_during_scan_are_skipped(self):
+        entries = PlotStore._entries
+        gone = self.store.path(self.keys[1])
+
+        def racing(path):
+            listed = entries(path)
+            if os.path.exists(gone) and any(e.path == gone for e in listed):
+                os.remove(gone)  # another process sweeps between listing and stat
+            return listed
+        with mock.patch.object(PlotStore, "_entries", staticmethod(racing)):
+            self.assertEqual(self.store.stats(), {"files": 3, "bytes": 300})
+
+    def test_files_vanishing_during_sweep_are_not_counted_as_removed(self):
+        remove = os.remove
+        gone = self.store.path(self.keys[0])
+
+        def racing(path):
+            if path == gone:
+                remove(path)
+            remove(path)
+        with mock.patch("core.charts.store.os.remove", racing):
+            res = self.store.sweep()
+        self.assertEqual((res["removed"], res["freed_bytes"]), (1, 100))
+        self.assertEqual(res["after"], {"files": 2, "bytes": 200})
+        self.assertEqual(self.exists(), [False, False, True, True])
+
+
+class ChartSpecTests(SimpleTestCase):
+    def test_line_spec_is_downsampled(self):
+        rows = [[i, (i * 37) % 101] for i in range(1000)]
+        spec = build_chart_spec(["t", "total"], rows, "line", x="t", y="total", max_points=100)
+        self.assertEqual(spec["$schema"], VEGA_LITE_SCHEMA)
+        self.assertEqual(spec["mark"], {"type": "line", "tooltip": True})
+        self.assertEqual(spec["encoding"]["x"], {"field": "t", "type": "quantitative", "sort": None})
+        self.assertEqual(spec["encoding"]["y"], {"field": "total", "type": "quantitative"})
+        self.assertEqual(spec["params"][0]["bind"], "scales")
+        points = spec["usermeta"]["points"]
+        self.assertEqual(points["original"], 1000)
+        self.assertLessEqual(points["rendered"], 100)
+        self.assertEqual(len(spec["data"]["values"]), points["rendered"])
+        self.assertEqual(set(spec["data"]["values"][0]), {"t", "total"})
+
+    def test_bar_and_pie(self):
+        rows = [["b", Decimal("2.5")], ["a", Decimal("1")], ["b", Decimal("1.5")]]
+        bar = build_chart_spec(["store", "total"], rows, "bar")
+        self.assertEqual(bar["encoding"]["x"], {"field": "store", "type": "nominal", "sort": None})
+        self.assertEqual(bar["data"]["values"], [{"store": "b", "total": 4.0}, {"store": "a", "total": 1.0}])
+        self.assertEqual(bar["usermeta"]["points"], {"original": 2, "rendered": 2})
+        self.assertNotIn("params", bar)
+        pie = build_chart_spec(["store", "total"], rows, "pie")
+        self.assertEqual(pie["mark"]["type"], "arc")
+        self.assertEqual(pie["encoding"], {"theta": {"field": "total", "type": "quantitative"},
+                                           "color": {"field": "store", "type": "nominal"}})
+
+    def test_table_fallback_is_json(self):
+        rows = [[datetime.date(2024, 1, i), "x"] for i in range(1, 31)]
+        spec = build_chart_spec(["day", "note"], rows, "table")
+        self.assertEqual(spec["mark"], "table")
+        self.assertEqual(len(spec["data"]["values"]), 20)
+        self.assertTrue(spec["data"]["values"][0]["day"].startswith("2024-01-01"))
+        json.dumps(spec)
+
+
+class RenderPoolTests(SimpleTestCase):
+    """
+    Admission and deadlines, with the worker processes replaced by futures the test completes.
+    """
+    def pool(self, **kwargs):
+        pool = RenderPool(**kwargs)
+        self.futures = []
+
+        def submit(*args):
+            future = Future()
+            self.futures.append(future)
+            return future
+        pool._submit = submit
+        return pool
+
+    def render_in_thread(self, pool, outcome):
+        thread = threading.Thread(target=lambda: outcome.append(pool.render(["a"], [[1]], "bar", "x.png")))
+        thread.start()
+        deadline = time.monotonic() + 2
+        while len(self.futures) < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return thread
+
+    def test_full_pool_rejects_then_admits_again(self):
+        pool = self.pool(workers=1, queue_depth=0, timeout=5)
+        outcome = []
+        thread = self.render_in_thread(pool, outcome)
+        with self.assertRaises(RenderPoolBusy):
+            pool.render(["a"], [[1]], "bar", "y.png")
+        self.futures[0].set_result({"rows": 1})
+        thread.join(2)
+        self.assertEqual(outcome, [{"rows": 1}])
+        # the slot came back with the finished render
+        thread = self.render_in_thread(pool, outcome)
+        self.futures[1].set_result({"rows": 2})
+        thread.join(2)
+        self.assertEqual(outcome[-1], {"rows": 2})
+
+    def test_timeout_frees_the_slot(self):
+        pool = self.pool(workers=1, queue_depth=0, timeout=0.05)
+        with self.assertRaises(TimeoutError):
+            pool.render(["a"], [[1]], "bar", "x.png")
+        self.assertTrue(self.futures[0].cancelled())
+        with self.assertRaises(TimeoutError):
+            pool.render(["a"], [[1]], "bar", "x.png")
+
+    def test_crashed_worker(self):
+        pool = self.pool(workers=1, queue_depth=0, timeout=5)
+        pool._submit = lambda *args: self._failed(BrokenProcessPool("worker died"))
+        with self.assertRaisesRegex(RuntimeError, "crashed"):
+            pool.render(["a"], [[1]], "bar", "x.png")
+
+        def refuse(*args):
+            raise OSError("cannot start worker")
+        pool._submit = refuse
+        with self.assertRaises(OSError):
+            pool.render(["a"], [[1]], "bar", "x.png")
+        # neither failure kept a slot
+        self.assertTrue(pool._slots.acquire(blocking=False))
+
+    @staticmethod
+    def _failed(error):
+        future = Future()
+        future.set_exception(error)
+        return future
+
+
+class DownsampleTests(SimpleTestCase):
+    def test_lttb_keeps_ends_and_peak(self):
+        x = np.arange(1000)
+        y = np.sin(x / 50.0)
+        y[437] = 10.0
+        idx = lttb_indices(x, y, 50)
+        self.assertEqual(len(idx), 50)
+        self.assertEqual((idx[0], idx[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(idx) > 0))
+        self.assertIn(437, idx)
+
+    def test_lttb_small_inputs_untouched(self):
+        self.assertEqual(list(lttb_indices([1, 2, 3], [1, 2, 3], 10)), [0, 1, 2])
+        self.assertEqual(len(lttb_indices(range(100), range(100), 2)), 100)
+
+    def test_top_n_sums_the_rest(self):
+        data = pd.DataFrame({"store": list("abcdef"), "total": [5, 50, 1, 40, 2, 30]})
+        out = top_n(data, "store", "total", 4)
+        self.assertEqual(len(out), 4)
+        self.assertEqual(set(out["store"][:3]), {"b", "d", "f"})
+        self.assertEqual(out["store"].iloc[-1], OTHER_LABEL)
+        self.assertEqual(out["total"].iloc[-1], 8)
+        self.assertEqual(out["total"].sum(), data["total"].sum())
+        self.assertIs(top_n(data, "store", "total", 6), data)
+
+
+class RetrievalTests(SimpleTestCase):
+    snapshot = {"tables": {
+        "film": {"comment": "movies in the catalog", "columns": [{"name": "title"}, {"name": "rental_rate"}]},
+        "film_actor": {"columns": [{"name": "film_id"}, {"name": "actor_id"}]},
+        "payment": {"columns": [{"name": "amount", "comment": "paid amount"}, {"name": "payment_date"}]},
+    }}
+
+    def test_bm25_ranks_matching_tables(self):
+        idx = BM25Index(self.snapshot)
+        self.assertEqual(idx.search("total payment amount per month")[0][0], "payment")
+        self.assertEqual(idx.search("film_actor links")[0][0], "film_actor")
+        self.assertEqual(idx.search("the of and"), [])
+        self.assertEqual(len(idx.search("film", k=1)), 1)
+
+    def test_rrf_fusion(self):
+        vector = [("a", 0.9), ("b", 0.8), ("c", 0.1)]
+        lexical = [("b", 7.0), ("d", 3.0)]
+        self.assertEqual(fuse_rankings(vector, lexical, "rrf"), ["b", "a", "d", "c"])
+
+    def test_weighted_fusion(self):
+        vector = [("a", 0.9), ("b", 0.7), ("x", 0.5)]
+        lexical = [("b", 10.0), ("c", 2.0)]
+        self.assertEqual(fuse_rankings(vector, lexical, "weighted", vector_weight=0.5)[:2], ["b", "a"])
+        self.assertEqual(fuse_rankings(vector, lexical, "weighted", vector_weight=1.0)[0], "a")
+        with self.assertRaises(ValueError):
+            fuse_rankings(vector, lexical, "max")
+
+
+class JoinGraphTests(SimpleTestCase):
+    def setUp(self):
+        def fk(col, ref):
+            return {"columns": [col], "referred_table": ref, "referred_columns": ["id"]}
+        self.graph = JoinGraph({"tables": {
+            "actor": {"foreign_keys": []},
+            "film": {"foreign_keys": [fk("language_id", "language")]},
+            "film_actor": {"foreign_keys": [fk("film_id", "film"), fk("actor_id", "actor")]},
+            "language": {"foreign_keys": []},
+            "audit": {"foreign_keys": [fk("user_id", "users")]},  # users not in the snapshot
+        }})
+
+    def test_shortest_path(self):
+        self.assertEqual(self.graph.path("actor", "language"), ["actor", "film_actor", "film", "language"])
+        self.assertEqual(self.graph.path("film", "film"), ["film"])
+        self.assertIsNone(self.graph.path("actor", "audit"))
+
+    def test_join_hints_and_bridges(self):
+        conditions, bridges = self.graph.join_hints(["actor", "film"])
+        self.assertEqual(conditions, ["film_actor.actor_id = actor.id", "film_actor.film_id = film.id"])
+        self.assertEqual(bridges, ["film_actor"])
+        self.assertEqual(self.graph.join_hints(["actor", "language"], max_hops=2), ([], []))
+
+
+class _WordEmbeddings:
+    """
+    Bag-of-words hashing embedding: deterministic, no backend.
+    """
+    def __init__(self):
+        self.documents_embedded = 0
+
+    def _vector(self, text):
+        v = np.zeros(64)
+        for w in text.lower().split():
+            v[int(hashlib.md5(w.encode()).hexdigest(), 16) % 64] += 1
+        return list(v)
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+    def embed_documents(self, texts):
+        self.documents_embedded += len(texts)
+        return [self._vector(t) for t in texts]
+
+
+class _FixedLLM:
+    def __init__(self, sql):
+        self.sql = sql
+
+    def generate(self, prompt):
+        return self.sql
+
+
+class NumpyVectorStoreTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.emb = _WordEmbeddings()
+        self.docs = [Document(page_content=f"Table: {t}\nColumns: {c}", metadata={"table": t})
+                     for t, c in (("film", "title rating"), ("payment", "amount date"), ("actor", "first name"))]
+
+    def test_saved_index_is_memory_mapped_on_load(self):
+        store = NumpyVectorStore.from_texts([d.page_content for d in self.docs], self.emb,
+                                            [d.metadata for d in self.docs])
+        store.save(self.dir, "ns", "fp")
+        loaded, fingerprint = NumpyVectorStore.load(self.dir, "ns", self.emb)
+        self.assertEqual(fingerprint, "fp")
+        self.assertIsInstance(loaded.vectors, np.memmap)
+        np.testing.assert_array_equal(loaded.vectors, store.vectors)
+        self.assertEqual([d.metadata for d in loaded.documents], [d.metadata for d in self.docs])
+        self.assertEqual(loaded.similarity_search("payment amount", k=1)[0].metadata["table"], "payment")
+        self.assertEqual(NumpyVectorStore.load(self.dir, "missing", self.emb), (None, None))
+
+    def test_rebuilt_only_when_documents_change(self):
+        NumpyVectorStore.load_or_build(self.docs, self.emb, self.dir, "ns")
+        NumpyVectorStore.load_or_build(self.docs, self.emb, self.dir, "ns")
+        self.assertEqual(self.emb.documents_embedded, 3)
+        changed = self.docs[:2] + [Document(page_content="Table: actor\nColumns: last name",
+                                            metadata={"table": "actor"})]
+        store = NumpyVectorStore.load_or_build(changed, self.emb, self.dir, "ns")
+        self.assertEqual(self.emb.documents_embedded, 6)
+        self.assertEqual(store.documents[2].page_content, changed[2].page_content)
+        self.assertEqual(NumpyVectorStore.load(self.dir, "ns", self.emb)[0].documents[2].page_content,
+                         changed[2].page_content)
+
+
+class _RandomEmbeddings:
+    def __init__(self, dim=128, seed=7):
+        self.dim, self.seed = dim, seed
+
+    def _vector(self, text):
+        seed = int(hashlib.md5(f"{self.seed}:{text}".encode()).hexdigest(), 16) % 2 ** 32
+        return list(np.random.default_rng(seed).standard_normal(self.dim))
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+
+class QuantizedVectorTests(SimpleTestCase):
+    def setUp(self):
+        self.emb = _RandomEmbeddings()
+        self.texts = [f"table_{i}" for i in range(300)]
+        self.queries = [self.emb.embed_query(f"question {i}") for i in range(20)]
+        self.exact = NumpyVectorStore.from_texts(self.texts, self.emb).scores(self.queries)
+
+    def check(self, precision, atol, min_overlap):
+        store = NumpyVectorStore.from_texts(self.texts, self.emb, precision=precision)
+        self.assertEqual(store.vectors.dtype, np.dtype(precision))
+        scores = store.scores(self.queries)
+        np.testing.assert_allclose(scores, self.exact, atol=atol)
+        for exact, approx in zip(self.exact, scores):
+            top = set(np.argsort(-exact)[:10])
+            self.assertGreaterEqual(len(top & set(np.argsort(-approx)[:10])), min_overlap)
+            # the quantised best match is the exact best or scores within the error of it
+            self.assertGreaterEqual(exact[np.argmax(approx)], exact.max() - 2 * atol)
+        return store
+
+    def test_float16_keeps_the_float32_ranking(self):
+        self.check("float16", atol=2e-3, min_overlap=10)
+
+    def test_int8_is_close_to_float32(self):
+        store = self.check("int8", atol=2e-2, min_overlap=8)
+        self.assertLess(store.nbytes(), NumpyVectorStore.from_texts(self.texts, self.emb).nbytes() / 3)
+
+    def test_int8_scales_are_persisted(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        store = NumpyVectorStore.from_texts(self.texts, self.emb, precision="int8")
+        store.save(tmp.name, "ns")
+        loaded, _ = NumpyVectorStore.load(tmp.name, "ns", self.emb)
+        self.assertEqual(loaded.precision, "int8")
+        np.testing.assert_array_equal(loaded.scores(self.queries), store.scores(self.queries))
+
+    def test_precision_change_rebuilds(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        docs = [Document(page_content=t, metadata={"table": t}) for t in self.texts[:5]]
+        NumpyVectorStore.load_or_build(docs, self.emb, tmp.name, "ns")
+        store = NumpyVectorStore.load_or_build(docs, self.emb, tmp.name, "ns", precision="float16")
+        self.assertEqual(store.precision, "float16")
+        self.assertEqual(NumpyVectorStore.load(tmp.name, "ns", self.emb)[0].precision, "float16")
+
+
+class NumpyStoreCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.emb = _WordEmbeddings()
+        self.snapshot = {"key": "k" * 16, "built_at": 1.0, "tables": {
+            "film": {"columns": [{"name": "title", "type": "TEXT"}]},
+            "payment": {"columns": [{"name": "amount", "type": "NUMERIC"}]},
+        }}
+
+    def test_store_is_reused_until_the_snapshot_is_refreshed(self):
+        store = numpy_store(self.snapshot, self.emb, self.dir)
+        with mock.patch("core.rag.retriever.build_table_documents") as build:
+            self.assertIs(numpy_store(self.snapshot, self.emb, self.dir), store)
+            build.assert_not_called()
+        self.assertEqual(self.emb.documents_embedded, 2)
+
+        # same tables in a refreshed snapshot: reloaded from disk, nothing embedded again
+        refreshed = {**self.snapshot, "built_at": 2.0}
+        self.assertIsNot(numpy_store(refreshed, self.emb, self.dir), store)
+        self.assertEqual(self.emb.documents_embedded, 2)
+
+
+class LazyRetrieverTests(SimpleTestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        with self.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE film (id INTEGER, title TEXT, year INTEGER)"))
+            conn.execute(text("INSERT INTO film VALUES (1, 'Alien', 1979), (2, 'Heat', 1995)"))
+        self.schema = snapshot_schema(self.engine)
+        self.built = []
+
+    def retriever(self):
+        self.built.append(1)
+        return mock.Mock(invoke=lambda q: [Document(page_content="Table: film", metadata={"table": "film"})])
+
+    def pipeline(self, sql="SELECT title FROM film", **kwargs):
+        return RAGPipeline(_FixedLLM(sql), self.retriever, self.engine, schema=self.schema, validate=False, **kwargs)
+
+    def test_cache_hit_does_not_build_the_retriever(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cache = AnswerCache(tmp.name)
+        cache.replace(self.schema["key"], [{"question": "All films", "sql": "SELECT title FROM film",
+                                            "fingerprint": answer_fingerprint(self.schema), "created": time.time()}])
+        pipeline = self.pipeline(answer_cache=cache)
+        self.assertEqual(len(pipeline.run("all films?")[1]), 2)
+        self.assertEqual((pipeline.cache_hit, self.built), ("sql", []))
+
+    def test_follow_up_reusing_the_context_does_not_build_it(self):
+        conversation = Conversation()
+        self.pipeline(conversation=conversation).run("List the films")
+        self.assertEqual(len(self.built), 1)
+        pipeline = self.pipeline("SELECT title FROM film WHERE year > 1990", conversation=conversation)
+        self.assertEqual(pipeline.run("now only after 1990")[1], [("Heat",)])
+        self.assertEqual((pipeline.cache_hit, len(self.built)), ("context", 1))
+
+
+class _FakeCollection:
+    def __init__(self, name, count):
+        self.name, self._count = name, count
+
+    def count(self):
+        if self._count is None:
+            raise RuntimeError("Error loading hnsw index")
+        return self._count
+
+
+class _FakeChroma:
+    def __init__(self, counts):
+        self.collections = {n: _FakeCollection(n, c) for n, c in counts.items()}
+
+    def list_collections(self):
+        return list(self.collections.values())
+
+    def get_collection(self, name):
+        return self.collections[name]
+
+    def delete_collection(self, name):
+        del self.collections[name]
+
+
+class CompactIndexesTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create(username="owner")
+        conn = ConnectionConfig.objects.create(owner=owner, db_type="postgres", host="db", port=5432,
+                                               username="u", password="p", database_name="sales")
+        self.live = url_key(conn_str_for(conn))
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.chroma_dir = os.path.join(tmp.name, "chroma")
+        self.numpy_dir = os.path.join(tmp.name, "numpy")
+        os.makedirs(self.chroma_dir)
+        os.makedirs(self.numpy_dir)
+        for ns in (self.live, "deadbeefdeadbeef"):
+            with open(os.path.join(self.numpy_dir, ns + ".json"), "w") as f:
+                f.write('{"documents": [{}, {}]}')
+            open(os.path.join(self.numpy_dir, ns + ".npy"), "wb").close()
+        # the legacy collection cannot be read, like a collection whose HNSW segment is gone
+        self.client = _FakeChroma({collection_name(self.live): 3, collection_name("deadbeefdeadbeef"): 3,
+                                   LEGACY_COLLECTION: None})
+        patcher = mock.patch("core.rag.vector_index._chroma_client", return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command("compact_indexes", "--chroma-dir", self.chroma_dir, "--numpy-dir", self.numpy_dir,
+                     *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_reports_orphans(self):
+        out = self.run_command("--dry-run")
+        self.assertIn(f"Would drop chroma index {LEGACY_COLLECTION}", out)
+        self.assertIn("Would drop chroma index schema_deadbeefdeadbeef", out)
+        self.assertIn("Would drop numpy index deadbeefdeadbeef", out)
+        self.assertNotIn(f"drop chroma index {collection_name(self.live)}", out)
+        self.assertEqual(len(self.client.collections), 3)
+        self.assertEqual(len(os.listdir(self.numpy_dir)), 4)
+
+    def test_orphans_are_dropped(self):
+        self.run_command()
+        self.assertEqual(list(self.client.collections), [collection_name(self.live)])
+        self.assertEqual(sorted(os.listdir(self.numpy_dir)), [self.live + ".json", self.live + ".npy"])
+
+
+class AnswerCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = AnswerCache(tmp.name, sql_ttl=3600, result_ttl=600)
+        self.schema = _snapshot({"film": ["id", "title"]})
+        self.fingerprint = answer_fingerprint(self.schema)
+        now = time.time()
+        self.cache.replace("conn", [
+            {"question": "Top 5 films", "sql": "SELECT title FROM film LIMIT 5", "fingerprint": self.fingerprint,
+             "created": now, "columns": ["title", "rate", "released"],
+             "rows": [["Alien", Decimal("9.99"), datetime.date(1979, 5, 25)]], "results_at": now},
+            {"question": "Film count", "sql": "SELECT COUNT(*) FROM film", "fingerprint": self.fingerprint,
+             "created": now - 7200},
+        ])
+
+    def test_hit_on_normalized_question(self):
+        entry = self.cache.get("conn", "  top 5   FILMS? ", self.fingerprint)
+        self.assertEqual(entry["sql"], "SELECT title FROM film LIMIT 5")
+        # DB-native values are stored as JSON numbers and ISO dates
+        self.assertEqual(entry["rows"], [["Alien", 9.99, "1979-05-25"]])
+
+    def test_miss(self):
+        self.assertIsNone(self.cache.get("conn", "Top 6 films", self.fingerprint))
+        self.assertIsNone(self.cache.get("other", "Top 5 films", self.fingerprint))
+        # older than sql_ttl
+        self.assertIsNone(self.cache.get("conn", "Film count", self.fingerprint))
+
+    def test_schema_change_invalidates(self):
+        changed = answer_fingerprint(_snapshot({"film": ["id", "title", "year"]}))
+        self.assertNotEqual(changed, self.fingerprint)
+        self.assertIsNone(self.cache.get("conn", "Top 5 films", changed))
+        self.assertNotEqual(answer_fingerprint(self.schema, "Only use views"), self.fingerprint)
+
+    def test_stale_results_are_dropped_sql_kept(self):
+        self.cache.result_ttl = 0
+        entry = self.cache.get("conn", "Top 5 films", self.fingerprint)
+        self.assertEqual(entry["sql"], "SELECT title FROM film LIMIT 5")
+        self.assertNotIn("rows", entry)
+
+
+class PrewarmSelectionTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username="owner")
+        self.conn = ConnectionConfig.objects.create(owner=self.owner, db_type="postgres", host="db", port=5432,
+                                                    username="u", password="p", database_name="sales")
+
+    def ask(self, question, times=1, error=None, follow_up=False, days_ago=0):
+        for _ in range(times):
+            log_query(self.owner, self.conn, question, False, "SELECT 1", [], error, {}, 0.1, follow_up=follow_up)
+        if days_ago:
+            QueryLog.objects.filter(question=question).update(
+                created_at=timezone.now() - datetime.timedelta(days=days_ago))
+
+    def test_most_frequent_successful_standalone_questions(self):
+        self.ask("Top 5 films?", 2)
+        self.ask("top 5 films", 1)
+        self.ask("Revenue per store", 2)
+        self.ask("Asked once")
+        self.ask("Broken question", 3, error="syntax error")
+        self.ask("now only for 2024", 4, follow_up=True)
+        self.ask("Last year's question", 5, days_ago=60)
+        since = timezone.now() - datetime.timedelta(days=30)
+        picked = PrewarmCommand().popular_questions(self.conn, since, top=10, min_count=2)
+        self.assertEqual([(log.normalized_question, asked) for log, asked in picked],
+                         [("top 5 films", 3), ("revenue per store", 2)])
+        # the latest wording of a repeated question is the one pre-warmed
+        self.assertEqual(picked[0][0].question, "top 5 films")
+        self.assertEqual(len(PrewarmCommand().popular_questions(self.conn, since, top=1, min_count=2)), 1)
+
+
+class TableStatsTests(SimpleTestCase):
+    catalog_sql = {"sqlite": ["SELECT name, CASE name WHEN 'film' THEN 1000 ELSE -1 END, "
+                              "CASE name WHEN 'film' THEN 65536 END FROM sqlite_master WHERE type = 'table'"]}
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        with self.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE payment (id INTEGER)"))
+            conn.execute(text("CREATE TABLE film (id INTEGER)"))
+
+    def test_catalog_estimates(self):
+        with mock.patch.dict("core.rag.table_stats._STATS_SQL", self.catalog_sql):
+            stats = table_stats(self.engine)
+        self.assertEqual(stats["source"], "catalog")
+        self.assertEqual(stats["key"], url_key(self.engine.url))
+        # never-analyzed tables (-1) and missing sizes are unknown, not zero
+        self.assertEqual(stats["tables"], [{"name": "film", "rows": 1000, "bytes": 65536},
+                                           {"name": "payment", "rows": None, "bytes": None}])
+
+    def test_names_without_catalog_query(self):
+        stats = table_stats(self.engine)
+        self.assertEqual(stats["source"], "names")
+        self.assertEqual([t["name"] for t in stats["tables"]], ["film", "payment"])
+        self.assertEqual({(t["rows"], t["bytes"]) for t in stats["tables"]}, {(None, None)})
+
+    def test_failed_catalog_query_falls_back(self):
+        with mock.patch.dict("core.rag.table_stats._STATS_SQL", {"sqlite": ["SELECT * FROM no_such_view"]}):
+            self.assertEqual(table_stats(self.engine)["source"], "names")
+
+    def test_cached_until_refresh(self):
+        first = get_table_stats(self.engine)
+        self.assertIs(get_table_stats(self.engine), first)
+        refreshed = get_table_stats(self.engine, refresh=True)
+        self.assertIsNot(refreshed, first)
+        self.assertIs(get_table_stats(self.engine), refreshed)
+
+
+class MetricsAccessTests(TestCase):
+    def setUp(self):
+        self.url = reverse("metrics")
+
+    def test_anonymous_and_non_staff_are_refused(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_login(User.objects.create(username="user"))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_staff(self):
+        self.client.force_login(User.objects.create(username="admin", is_staff=True))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_bearer_token(self):
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION="Bearer s3cret").status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_no_token_configured(self):
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION="Bearer ").status_code, 403)
+
+
+class LLMSchedulerTests(SimpleTestCase):
+    def _wait_in_thread(self, scheduler, priority, timeout, outcome):
+        def run():
+            try:
+                scheduler.acquire(priority, timeout)
+                outcome.append("granted")
+            except LLMOverloaded as e:
+                outcome.append(str(e))
+        thread = threading.Thread(target=run)
+        thread.start()
+        deadline = time.monotonic() + 2
+        while len(scheduler._queue) < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return thread
+
+    def test_interactive_evicts_queued_background(self):
+        scheduler = LLMScheduler(max_concurrent=1, max_queue=1)
+        scheduler.acquire(PRIORITY_INTERACTIVE)
+        outcome = []
+        thread = self._wait_in_thread(scheduler, PRIORITY_BACKGROUND, 5, outcome)
+        with self.assertRaisesRegex(LLMOverloaded, "deadline"):
+            scheduler.acquire(PRIORITY_INTERACTIVE, timeout=0.1)
+        thread.join(2)
+        self.assertEqual(len(outcome), 1)
+        self.assertIn("evicted", outcome[0])
+
+    def test_full_queue_refuses_equal_priority(self):
+        scheduler = LLMScheduler(max_concurrent=1, max_queue=1)
+        scheduler.acquire()
+        outcome = []
+        thread = self._wait_in_thread(scheduler, PRIORITY_INTERACTIVE, 0.5, outcome)
+        with self.assertRaisesRegex(LLMOverloaded, "queue full"):
+            scheduler.acquire(PRIORITY_INTERACTIVE, timeout=1)
+        thread.join(2)
+
+    def test_release_grants_waiter(self):
+        scheduler = LLMScheduler(max_concurrent=1, max_queue=4)
+        scheduler.acquire()
+        outcome = []
+        thread = self._wait_in_thread(scheduler, PRIORITY_BACKGROUND, 5, outcome)
+        scheduler.release()
+        thread.join(2)
+        self.assertEqual(outcome, ["granted"])
+        self.assertEqual(scheduler.active, 1)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_waiters_share_the_leaders_error(self):
+        flights = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls, errors = [], []
+
+        def failing():
+            calls.append(1)
+            started.set()
+            release.wait(2)
+            raise RuntimeError("backend down")
+
+        def caller():
+            try:
+                flights.do("key", failing)
+            except RuntimeError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=caller)
+        leader.start()
+        started.wait(2)
+        follower = threading.Thread(target=caller)
+        follower.start()
+        time.sleep(0.05)
+        release.set()
+        leader.join(2)
+        follower.join(2)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(errors), 2)
+        self.assertIs(errors[0], errors[1])
+        # the failed flight is forgotten: the next call runs again
+        self.assertEqual(flights.do("key", lambda: "ok"), "ok")
@@ -9,6 +9,9 @@ urlpatterns = [
     path('dashboard/', views.dashboard_view, name='dashboard'),
     path('chat/', views.chat_view, name='chat'),
     path('chat/prompt_update/', views.update_custom_prompt, name='update_custom_prompt'),
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('profiles/', views.profiles_view, name='profiles'),
+    path('profiles/<str:profile_id>/download/', views.profile_download, name='profile_download'),
     path('table/<str:table_name>/', views.table_list,   name='table_list'),
     path('table/<str:table_name>/add/',   views.table_add,    name='table_add'),
     path('table/<str:table_name>/<int:pk>/edit/', views.table_edit,   name='table_edit'),
@@ -1,25 +1,32 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import HttpResponse, HttpResponseForbidden, FileResponse, Http404
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.urls import reverse
 from django.views.decorators.http import require_POST
 from django.contrib import messages
-from sqlalchemy import inspect, Table, MetaData, select, insert, update, delete
+from sqlalchemy import Table, MetaData, select, insert, update, delete
 from sqlalchemy.types import Date, DateTime
+import os
+import hmac
+import time
+import datetime
 import threading
 import logging
-import whisper
 from core.mcp_client import call_tool
-from core.models import ConnectionConfig
+from core.models import ConnectionConfig, QueryLog
 from core.forms import ConnectionForm, AudioQueryForm, CustomPromptForm
 from core.rag.llm_utils import load_llm, load_embeddings
 from core.rag.db_utils import connect_db
 from core.rag.retriever import build_retriever
 from core.rag.rag_pipeline import RAGPipeline
-try:
-    import torch
-except Exception:
-    torch = None
-
+from core.rag.answer_cache import get_answer_cache, normalize_question
+from core.rag.conversation import Conversation
+from core.rag.table_stats import get_table_stats
+from core.charts.config import CHART_OUTPUT, REUSE_MAX_ROWS
+from core.metrics import span, record_spans, render_prometheus, STAGE_SECONDS, PROMETHEUS_CONTENT_TYPE
+from core.profiling import list_profiles, profile_path
 # Create your views here.
 
 _LOCAL_WHISPER = None
@@ -27,6 +34,11 @@ _LOCAL_LOCK = threading.Lock()
 _LOG = logging.getLogger(__name__)
 
 def _detect_device():
+    # torch and whisper take seconds to import: only transcription pays for them
+    try:
+        import torch
+    except Exception:
+        torch = None
     if torch is not None:
         try:
             if torch.cuda.is_available():
@@ -43,6 +55,7 @@ def load_local_whisper(model_size="tiny", device=None):
             if _LOCAL_WHISPER is None:
                 if device is None:
                     device = _detect_device()
+                import whisper
                 _LOG.info("Loading Whisper model '%s' on device=%s ...", model_size, device)
                 _LOCAL_WHISPER = whisper.load_model(model_size, device=device)
                 _LOG.info("Whisper model loaded.")
@@ -116,23 +129,40 @@ def connections_view(request):
 def dashboard_view(request):
     conn_id = request.session.get('connection_id')
     status = ''
-    tables = []
+    stats = None
     conn = get_object_or_404(ConnectionConfig, pk=conn_id, owner=request.user)
     # connection test
     try:
         conn_str = conn_str_for(conn)
         engine = connect_db(conn_str)
         status = "Connected"
-        inspector = inspect(engine)
-        tables = inspector.get_table_names()
+        # catalog estimates, cached per connection; ?refresh=1 re-reads them
+        stats = get_table_stats(engine, refresh=bool(request.GET.get('refresh')))
     except Exception as e:
         status = f"Error: {e}"
     return render(request, 'core/dashboard.html', {
         'conn': conn,
         'status': status,
-        'tables': tables,
+        'tables': stats["tables"] if stats else [],
+        'stats_source': stats["source"] if stats else "",
+        'stats_at': datetime.datetime.fromtimestamp(stats["built_at"], datetime.timezone.utc) if stats else None,
     })
 
+def log_query(user, conn, question, is_voice, sql, rows, error, timings, seconds, cache="", follow_up=False):
+    """
+    Record a chat turn in QueryLog; a failure to log never fails the turn.
+    """
+    try:
+        QueryLog.objects.create(
+            owner=user, connection=conn, question=question, normalized_question=normalize_question(question),
+            is_voice=is_voice, sql=sql or "", row_count=len(rows) if rows is not None else None,
+            success=error is None and sql is not None, error=error or "",
+            timings={stage: round(secs * 1000, 1) for stage, secs in timings.items()},
+            total_ms=round(seconds * 1000, 1), cache=cache, follow_up=follow_up,
+        )
+    except Exception:
+        _LOG.exception("Could not record query log")
+
 @login_required
 def chat_view(request):
     sql = None
@@ -142,6 +172,7 @@ def chat_view(request):
     is_voice   = False
     plot_url = None
     plot_info = None
+    chart_spec = None
     
     conn_id = request.session.get('connection_id')
     if not conn_id:
@@ -150,7 +181,8 @@ def chat_view(request):
     # recreating connection string and engine
     conn = get_object_or_404(ConnectionConfig, pk=conn_id, owner=request.user)
     try:
-        engine = connect_db(conn_str_for(conn))
+        with span("db_connect"):
+            engine = connect_db(conn_str_for(conn))
     except Exception as e:
         return redirect('dashboard')
     
@@ -158,52 +190,96 @@ def chat_view(request):
     audio_form = AudioQueryForm()
     custom_prompt_form = CustomPromptForm(initial={"custom_prompt": user_prompt})
 
+    if request.method == 'POST' and request.POST.get('new_conversation'):
+        request.session.pop('conversation', None)
+        return redirect('chat')
+
+    conversation = Conversation(request.session.get('conversation'))
     if request.method == 'POST':
-        if request.FILES.get('audio_file'):
-            is_voice = True
-            audio_form = AudioQueryForm(request.POST, request.FILES)
-            if audio_form.is_valid():
-                aq = audio_form.save(commit=False)
-                aq.owner = request.user
-                aq.save()
-                try:
-                    transcript = transcribe_local_whisper(aq.audio_file.path, prefer_model="tiny", language="en")
-                    aq.transcript = transcript
+        with record_spans() as timings:
+            turn_start = time.perf_counter()
+            pipeline = None
+            if request.FILES.get('audio_file'):
+                is_voice = True
+                audio_form = AudioQueryForm(request.POST, request.FILES)
+                if audio_form.is_valid():
+                    aq = audio_form.save(commit=False)
+                    aq.owner = request.user
                     aq.save()
+                    try:
+                        with span("transcribe"):
+                            transcript = transcribe_local_whisper(aq.audio_file.path, prefer_model="tiny", language="en")
+                        aq.transcript = transcript
+                        aq.save()
+                    except Exception as e:
+                        _LOG.exception("Transcription failed")
+                        error = f"Transcription failed: {e}"
+            else:
+                transcript = request.POST.get('question', '').strip()
+            if transcript and not error:
+                result_cols = []
+                try:
+                    llm = load_llm()
+
+                    def retriever():
+                        # built only when the question is neither cached nor a context-reusing follow-up
+                        with span("retriever_build"):
+                            return build_retriever(engine, load_embeddings())
+
+                    pipeline = RAGPipeline(llm, retriever, engine, user_prompt, answer_cache=get_answer_cache(),
+                                           conversation=conversation)
+                    sql, rows = pipeline.run(transcript)
+                    result_cols = pipeline.columns
+                    request.session['conversation'] = conversation.state()
                 except Exception as e:
-                    _LOG.exception("Transcription failed")
-                    error = f"Transcription failed: {e}"
-        else:
-            transcript = request.POST.get('question', '').strip()
-        if transcript and not error:
-            try:
-                llm = load_llm()
-                embeddings = load_embeddings()
-                retriever = build_retriever(engine, embeddings)
-                pipeline = RAGPipeline(llm, retriever, engine, user_prompt)
-                sql, rows = pipeline.run(transcript)
-            except Exception as e:
-                _LOG.exception("RAG pipeline failed")
-                sql = None
-                rows = None
-                error = str(e)
-
-            try:
-                detector_res = call_tool("chart_detector", conn, {"question": transcript})
-            except Exception as e:
-                detector_res = {"plot": False}
-                _LOG.exception("chart_detector call failed: %s", e)
-
-            if detector_res.get("plot"):
-                suggested_sql = detector_res.get("sql")
-                suggested_plot_type = detector_res.get("plot_type") or "bar"
-                if suggested_sql:
+                    _LOG.exception("RAG pipeline failed")
+                    sql = None
+                    rows = None
+                    error = str(e)
+
+                # hand the fetched result to the chart tools so they don't re-query the database
+                result_rows = None
+                detector_input = {"question": transcript}
+                if result_cols and rows and len(rows) <= REUSE_MAX_ROWS:
+                    result_rows = [list(r) for r in rows]
+                    detector_input.update(cols=result_cols, sample_rows=result_rows[:50])
+
+                cached_chart = pipeline.cached_entry.get("chart") if pipeline and pipeline.cache_hit == "result" else None
+                if cached_chart:
+                    # pre-warmed by `manage.py prewarm` together with the result
+                    detector_res = {"plot": False}
+                    plot_url = cached_chart.get("plot_url")
+                    chart_spec = cached_chart.get("chart_spec")
+                    plot_info = {"cols": cached_chart.get("cols"), "rows": cached_chart.get("rows"), "points": cached_chart.get("points")}
+                else:
                     try:
-                        render_res = call_tool("chart_renderer", conn, {"sql": suggested_sql, "plot_type": suggested_plot_type, "limit_rows": 500})
-                        plot_url = render_res.get("plot_url")
-                        plot_info = {"cols": render_res.get("cols"), "rows": render_res.get("rows")}
+                        detector_res = call_tool("chart_detector", conn, detector_input)
                     except Exception as e:
-                        _LOG.exception("chart_renderer call failed: %s", e)
+                        detector_res = {"plot": False}
+                        _LOG.exception("chart_detector call failed: %s", e)
+
+                if detector_res.get("plot"):
+                    suggested_sql = detector_res.get("sql")
+                    suggested_plot_type = detector_res.get("plot_type") or "bar"
+                    render_input = None
+                    if detector_res.get("reuse") and result_rows:
+                        render_input = {"cols": result_cols, "rows": result_rows, "limit_rows": len(result_rows),
+                                        "x": detector_res.get("x"), "y": detector_res.get("y")}
+                    elif suggested_sql:
+                        render_input = {"sql": suggested_sql, "limit_rows": 500}
+                    if render_input:
+                        try:
+                            render_res = call_tool("chart_renderer", conn, {**render_input, "plot_type": suggested_plot_type, "output": CHART_OUTPUT})
+                            plot_url = render_res.get("plot_url")
+                            chart_spec = render_res.get("chart_spec")
+                            plot_info = {"cols": render_res.get("cols"), "rows": render_res.get("rows"), "points": render_res.get("points")}
+                        except Exception as e:
+                            _LOG.exception("chart_renderer call failed: %s", e)
+            STAGE_SECONDS.observe(time.perf_counter() - turn_start, stage="chat_turn", status="error" if error else "ok")
+        if transcript:
+            log_query(request.user, conn, transcript, is_voice, sql, rows, error, timings,
+                      time.perf_counter() - turn_start, pipeline.cache_hit if pipeline else "",
+                      pipeline.follow_up if pipeline else False)
 
     return render(request, 'core/chat.html', {
         'sql':        sql,
@@ -216,8 +292,50 @@ def chat_view(request):
         'custom_prompt_form': custom_prompt_form,
         'plot_url': plot_url,
         'plot_info': plot_info,
+        'chart_spec': chart_spec,
+        'history': conversation.turns,
     })
 
+def _metrics_token_ok(request) -> bool:
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    auth = request.headers.get('Authorization', '')
+    return bool(token) and auth.startswith('Bearer ') and hmac.compare_digest(auth[7:].encode(), token.encode())
+
+
+def metrics_view(request):
+    """
+    Stage timings of this process in the Prometheus text format, for staff users or
+    scrapers with the METRICS_TOKEN bearer token.
+    """
+    if not (request.user.is_active and request.user.is_staff) and not _metrics_token_ok(request):
+        return HttpResponseForbidden("Staff login or metrics token required")
+    return HttpResponse(render_prometheus(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@staff_member_required(login_url='login')
+def profiles_view(request):
+    """
+    Recent request profiles (see core.middleware.ProfilingMiddleware) with their top functions.
+    """
+    profiles = list_profiles(str(settings.PROFILE_DIR), limit=int(request.GET.get('limit', 50)))
+    for p in profiles:
+        p['created_at'] = datetime.datetime.fromtimestamp(p.get('created', 0), tz=datetime.timezone.utc)
+        p['elapsed_ms'] = p.get('elapsed', 0) * 1000
+        p['top'] = p.get('top', [])[:int(request.GET.get('top', 10))]
+    return render(request, 'core/profiles.html', {'profiles': profiles})
+
+
+@staff_member_required(login_url='login')
+def profile_download(request, profile_id):
+    try:
+        path = profile_path(str(settings.PROFILE_DIR), profile_id)
+    except ValueError:
+        raise Http404("Unknown profile")
+    if not os.path.exists(path):
+        raise Http404("Unknown profile")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=f"{profile_id}.prof")
+
+
 @require_POST
 @login_required
 def update_custom_prompt(request):
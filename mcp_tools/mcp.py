@@ -1,6 +1,8 @@
-from fastapi import APIRouter
 from typing import Callable, Dict, Any
+import os
 import inspect
+from core.metrics import span
+from core.profiling import profile_if_wanted, DEFAULT_PROFILE_DIR
 
 
 class MCPRegistry:
@@ -33,29 +35,8 @@ class MCPRegistry:
         if name not in self._tools:
             raise KeyError(name)
         func = self._tools[name]["callable"]
-        return func(payload)
+        profile_dir = os.environ.get("MCP_PROFILE_DIR", DEFAULT_PROFILE_DIR)
+        with profile_if_wanted(profile_dir, f"tool {name}"), span(f"tool.{name}"):
+            return func(payload)
 
 mcp = MCPRegistry()
-
-router = APIRouter()
-
-@router.get("/tools")
-def list_tools():
-    return {"tools": mcp.get_tools()}
-
-@router.post("/call")
-def call_tool(payload: dict):
-    """
-    payload: { "tool": "<name>", "input": {...} }
-    """
-    tool = payload.get("tool")
-    if not tool:
-        return {"error": "missing tool"}
-    input_data = payload.get("input", {})
-    try:
-        res = mcp.call(tool, input_data)
-        return {"result": res}
-    except KeyError:
-        return {"error": "tool not found"}, 404
-    except Exception as e:
-        return {"error": str(e)}, 500
@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+from .mcp import mcp
+
+# kept apart from the registry so Django, which only needs mcp_tools.mcp, does not import FastAPI
+router = APIRouter()
+
+@router.get("/tools")
+def list_tools():
+    return {"tools": mcp.get_tools()}
+
+@router.post("/call")
+def call_tool(payload: dict):
+    """
+    payload: { "tool": "<name>", "input": {...} }
+    """
+    tool = payload.get("tool")
+    if not tool:
+        return {"error": "missing tool"}
+    input_data = payload.get("input", {})
+    try:
+        res = mcp.call(tool, input_data)
+        return {"result": res}
+    except KeyError:
+        return {"error": "tool not found"}, 404
+    except Exception as e:
+        return {"error": str(e)}, 500
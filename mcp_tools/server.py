@@ -1,6 +1,32 @@
-from fastapi import FastAPI
-from .mcp import router as mcp_router
+import os
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from core.metrics import render_prometheus, PROMETHEUS_CONTENT_TYPE
+from core.profiling import (profile_wanted, PROFILE_HEADER, PROFILE_ID_HEADER, PROFILE_PARENT_HEADER,
+                            DEFAULT_PROFILE_DIR)
+from .routes import router as mcp_router
 from . import tools
 
 app = FastAPI(title="MCP Tools Server")
 app.include_router(mcp_router, prefix="")
+
+# profiling is off unless a token is configured; requests opt in with "X-Profile: <token>"
+PROFILE_TOKEN = os.environ.get("MCP_PROFILE_TOKEN")
+PROFILE_DIR = os.environ.get("MCP_PROFILE_DIR", DEFAULT_PROFILE_DIR)
+
+
+@app.middleware("http")
+async def profile_middleware(request: Request, call_next):
+    if not PROFILE_TOKEN or request.headers.get(PROFILE_HEADER) != PROFILE_TOKEN:
+        return await call_next(request)
+    # endpoints run in the thread pool: MCPRegistry.call takes the profile there
+    with profile_wanted(source="mcp", parent=request.headers.get(PROFILE_PARENT_HEADER)) as wanted:
+        response = await call_next(request)
+    if "id" in wanted:
+        response.headers[PROFILE_ID_HEADER] = wanted["id"]
+    return response
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
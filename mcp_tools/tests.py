@@ -1,3 +1,27 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from core.metrics import record_spans
+from mcp_tools.mcp import MCPRegistry
+
+
+class MCPRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = MCPRegistry()
+
+        @self.registry.tool(name="echo", description="Return the payload")
+        def echo(payload: dict):
+            return {"echo": payload}
+
+    def test_tools_are_listed(self):
+        tools = self.registry.get_tools()
+        self.assertEqual(tools["echo"]["description"], "Return the payload")
+        self.assertEqual(tools["echo"]["signature"], "(payload: dict)")
+
+    def test_call_is_timed(self):
+        with record_spans() as timings:
+            self.assertEqual(self.registry.call("echo", {"a": 1}), {"echo": {"a": 1}})
+        self.assertIn("tool.echo", timings)
+
+    def test_unknown_tool(self):
+        with self.assertRaises(KeyError):
+            self.registry.call("missing", {})
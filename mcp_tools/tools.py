@@ -1,15 +1,18 @@
 import os
-import uuid
 import json
 import logging
-import numpy as np
-import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-from sqlalchemy import create_engine, inspect, text
+from sqlalchemy import create_engine
 from .mcp import mcp
-from .utils import safe_execute_select, schema_to_text
+from .utils import safe_execute_select
+from core.rag.schema_cache import get_schema_snapshot
+from core.rag.sql_validator import validate_sql, rewrite_dialect_functions
+from core.rag.config import VALIDATE_SQL
+from core.metrics import span
+from core.charts.pool import render_in_pool, RenderPoolBusy
+from core.charts.spec import build_chart_spec
+from core.charts.store import get_plot_store
+from core.charts.detect import choose_plot_for_result, wants_chart
+from core.charts.column_index import get_column_index
 
 _LOG = logging.getLogger(__name__)
 
@@ -19,40 +22,28 @@ def chart_detector_tool(payload: dict):
     payload:
       - conn_str: sqlalchemy connection string
       - question: user question
-    returns: {"plot": bool, "plot_type": str|null, "sql": str|null}
+      - cols, sample_rows (optional): an already-fetched result set; when it can be
+        charted as is, only plot type and columns are chosen and no SQL is produced
+    returns: {"plot": bool, "plot_type": str|null, "sql": str|null, "reuse": bool, "x": str|null, "y": str|null}
     """
     conn_str = payload.get("conn_str")
     question = payload.get("question", "")
     if not conn_str:
         raise ValueError("conn_str required")
-    engine = create_engine(conn_str)
-    insp = inspect(engine)
-    schema_text = schema_to_text(insp)
 
-    q = question.lower()
-    keywords = ["plot","chart","trend","count","by","distribution","compare","histogram","per","per month","per year","over time"]
-    wants_plot = any(k in q for k in keywords)
-
-    if any(k in q for k in ["list ", "show ", "give ", "return "]) and "per" not in q:
-        wants_plot = wants_plot and ("per" in q or "by" in q or "trend" in q)
-
-    if not wants_plot:
+    if not wants_chart(question):
         return {"plot": False, "plot_type": None, "sql": None}
 
-    for t in insp.get_table_names():
-        cols = insp.get_columns(t)
-        cat = None
-        num = None
-        for c in cols:
-            tn = str(c["type"]).lower()
-            name = c["name"]
-            if num is None and any(x in tn for x in ("int","numeric","decimal","float","real")):
-                num = name
-            if cat is None and any(x in tn for x in ("char","text","varchar","date","time")):
-                cat = name
-        if cat and num:
-            sample_sql = f"SELECT {cat} as label, SUM({num}) as value FROM {t} GROUP BY {cat} ORDER BY value DESC;"
-            return {"plot": True, "plot_type": "bar", "sql": sample_sql}
+    choice = choose_plot_for_result(question, payload.get("cols"), payload.get("sample_rows"))
+    if choice:
+        return {"plot": True, "sql": None, "reuse": True, **choice}
+
+    # roles come from the cached schema snapshot: no catalog queries on a warm cache
+    snapshot = get_schema_snapshot(create_engine(conn_str))
+    index = get_column_index(snapshot)
+    candidate = index.best_candidate(question)
+    if candidate:
+        return {"plot": True, "plot_type": candidate["plot_type"], "sql": index.chart_sql(candidate)}
     return {"plot": False, "plot_type": None, "sql": None}
 
 @mcp.tool(name="chart_renderer", description="Render chart from SQL and return image URL and data")
@@ -60,82 +51,66 @@ def chart_renderer_tool(payload: dict):
     """
     payload:
       - conn_str
-      - sql
+      - sql, or cols + rows of an already-fetched result set (no database call then)
       - plot_type (bar,line,pie,scatter,table)
+      - x, y (optional): columns chosen by chart_detector
       - limit_rows (optional)
-    returns: {"plot_url": str, "cols": [...], "rows": [...]}
+      - max_points (optional): cap on rendered marks, defaults to CHART_MAX_POINTS
+      - output (optional): "png" (default) or "spec" for a Vega-Lite chart spec
+    returns: {"plot_url": str|null, "chart_spec": dict|null, "points": {"original": int, "rendered": int},
+              "cols": [...], "rows": [...]}
     """
     conn_str = payload.get("conn_str")
     sql = payload.get("sql")
     plot_type = payload.get("plot_type", "bar")
     limit_rows = int(payload.get("limit_rows", 200))
-    if not conn_str or not sql:
-        raise ValueError("conn_str and sql required")
-    engine = create_engine(conn_str)
-    cols, rows = safe_execute_select(engine, sql, limit=limit_rows)
+    output = payload.get("output", "png")
+    max_points = payload.get("max_points")
+    x = payload.get("x")
+    y = payload.get("y")
+    cols = payload.get("cols")
+    rows = payload.get("rows")
+    if cols and rows is not None:
+        rows = rows[:limit_rows]
+    else:
+        if not conn_str or not sql:
+            raise ValueError("conn_str and sql required")
+        engine = create_engine(conn_str)
+        sql = rewrite_dialect_functions(engine.dialect.name, sql)
+        if VALIDATE_SQL:
+            with span("sql_validate"):
+                validate_sql(sql, get_schema_snapshot(engine), engine.dialect.name)
+        with span("sql_execute") as s:
+            cols, rows = safe_execute_select(engine, sql, limit=limit_rows)
+            s["rows"] = len(rows)
     if not rows:
         raise RuntimeError("Query returned no rows")
-    try:
-        df = pd.DataFrame(rows, columns=cols)
-    except Exception:
-        df = pd.DataFrame([list(map(str, r)) for r in rows])
-        df.columns = [f"col_{i}" for i in range(len(df.columns))]
 
-    img_name = f"plot_{uuid.uuid4().hex}.png"
-    media_root = os.environ.get("MCP_MEDIA_ROOT", os.path.abspath("media"))
-    media_url = os.environ.get("MCP_MEDIA_URL", "/media/")
-    os.makedirs(os.path.join(media_root, "plots"), exist_ok=True)
-    img_file = os.path.join(media_root, "plots", img_name)
+    if output == "spec":
+        try:
+            with span("chart_spec") as s:
+                spec = build_chart_spec(cols, rows, plot_type, x, y, max_points)
+                s["rows"] = len(rows)
+            return {"plot_url": None, "chart_spec": spec, "points": spec["usermeta"]["points"], "cols": cols, "rows": rows}
+        except Exception as e:
+            _LOG.warning("Chart spec failed, falling back to PNG: %s", e)
+
+    store = get_plot_store(
+        os.environ.get("MCP_MEDIA_ROOT", os.path.abspath("media")),
+        os.environ.get("MCP_MEDIA_URL", "/media/"),
+    )
+    img_key, img_file = store.allocate()
 
-    plt.figure(figsize=(8,4))
     try:
-        if plot_type == "table":
-            plt.axis('off')
-            tbl = plt.table(cellText=df.head(20).values, colLabels=df.columns, loc='center')
-            tbl.auto_set_font_size(False)
-            tbl.set_fontsize(8)
-            plt.savefig(img_file, bbox_inches='tight', dpi=150)
-            plt.close('all')
-        else:
-            numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-            if plot_type == "bar":
-                cat_cols = df.select_dtypes(include=['object','category']).columns.tolist()
-                if cat_cols and numeric_cols:
-                    x = cat_cols[0]; y = numeric_cols[0]
-                    agg = df.groupby(x)[y].sum()
-                    agg.plot(kind="bar")
-                elif numeric_cols and len(numeric_cols) >= 2:
-                    df.plot(kind="bar", x=numeric_cols[0], y=numeric_cols[1])
-                else:
-                    df.plot(kind="bar")
-            elif plot_type == "line":
-                df.plot(kind="line")
-            elif plot_type == "pie":
-                if numeric_cols:
-                    labels = df.iloc[:,0].astype(str) if df.shape[1] >= 1 else df.index.astype(str)
-                    values = df[numeric_cols[0]] if numeric_cols else df.iloc[:,1]
-                    plt.pie(values, labels=labels, autopct='%1.1f%%')
-                else:
-                    s = df.iloc[:,0].value_counts()
-                    s.plot(kind="pie", autopct='%1.1f%%')
-            elif plot_type == "scatter":
-                if len(numeric_cols) >= 2:
-                    x = numeric_cols[0]; y = numeric_cols[1]
-                    df.plot(kind="scatter", x=x, y=y)
-                else:
-                    df.plot(kind="scatter")
-            else:
-                df.plot(kind="bar")
-            plt.tight_layout()
-            plt.savefig(img_file, dpi=150)
-            plt.close('all')
+        with span("chart_render") as s:
+            points = render_in_pool(cols, rows, plot_type, img_file, x, y, max_points)
+            s["rows"] = len(rows)
+    except RenderPoolBusy:
+        raise
     except Exception as e:
         _LOG.exception("Chart rendering failed: %s", e)
-        try:
-            plt.close('all')
-        except:
-            pass
+        store.discard(img_key)
         raise RuntimeError(f"Chart rendering failed: {e}")
 
-    plot_url = media_url.rstrip('/') + "/plots/" + img_name
-    return {"plot_url": plot_url, "cols": cols, "rows": rows}
+    plot_url = store.url(img_key)
+    return {"plot_url": plot_url, "chart_spec": None, "points": points, "cols": cols, "rows": rows}
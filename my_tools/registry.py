@@ -8,7 +8,9 @@ TOOLS = {
             "type": "object",
             "properties": {
                 "question": {"type": "string"},
-                "schema_text": {"type": "string"}
+                "schema_text": {"type": "string"},
+                "cols": {"type": "array", "items": {"type": "string"}},
+                "sample_rows": {"type": "array", "items": {"type": "array"}}
             },
             "required": ["question"]
         }
@@ -16,15 +18,21 @@ TOOLS = {
     "chart_renderer": {
         "name": "chart_renderer",
         "title": "Chart Renderer",
-        "description": "Execute a safe SELECT SQL and render a chart image (png). Returns image URL and basic stats.",
+        "description": "Execute a safe SELECT SQL (or take an already-fetched result set) and render a chart image (png) or a Vega-Lite chart spec. Returns image URL or spec and basic stats.",
         "input_schema": {
             "type": "object",
             "properties": {
                 "sql": {"type": "string"},
+                "cols": {"type": "array", "items": {"type": "string"}},
+                "rows": {"type": "array", "items": {"type": "array"}},
                 "plot_type": {"type": "string"},
-                "limit_rows": {"type": "integer"}
+                "x": {"type": "string"},
+                "y": {"type": "string"},
+                "limit_rows": {"type": "integer"},
+                "max_points": {"type": "integer"},
+                "output": {"type": "string", "enum": ["png", "spec"]}
             },
-            "required": ["sql", "plot_type"]
+            "required": ["plot_type"]
         }
     }
 }
@@ -1,3 +1,24 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from my_tools.tools import chart_renderer
+
+
+class ChartRendererTests(SimpleTestCase):
+    def test_fetched_rows_are_charted_without_the_database(self):
+        cols = ["day", "total"]
+        rows = [[i, (i * 37) % 101] for i in range(2000)]
+        res = chart_renderer(None, None, "line", limit_rows=len(rows), output="spec", cols=cols, rows=rows,
+                             max_points=100)
+        self.assertIsNone(res["plot_url"])
+        self.assertEqual(res["points"]["original"], 2000)
+        self.assertLessEqual(res["points"]["rendered"], 100)
+        self.assertLessEqual(len(res["chart_spec"]["data"]["values"]), 100)
+
+    def test_rows_are_cut_to_limit(self):
+        res = chart_renderer(None, None, "bar", limit_rows=5, output="spec", cols=["k", "v"],
+                             rows=[[str(i), i] for i in range(50)])
+        self.assertEqual(len(res["rows"]), 5)
+
+    def test_empty_result(self):
+        with self.assertRaises(RuntimeError):
+            chart_renderer(None, None, "bar", output="spec", cols=["k", "v"], rows=[])
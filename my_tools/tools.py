@@ -1,42 +1,47 @@
 import re
-import uuid
-import os
 import json
 import logging
-import matplotlib
-matplotlib.use("Agg")
-import numpy as np
-import pandas as pd
-from .utils import schema_to_text, safe_execute_select
-from core.rag.llm_utils import load_llm
-from sqlalchemy import inspect
-import matplotlib.pyplot as plt
+from .utils import safe_execute_select
+from core.rag.llm_utils import load_llm, llm_priority, PRIORITY_BACKGROUND
+from core.rag.retriever import build_retriever
+from core.rag.tokens import truncate_to_budget
+from core.rag.schema_cache import get_schema_snapshot
+from core.rag.sql_validator import validate_sql, rewrite_dialect_functions
+from core.rag.config import CHART_DETECTOR_K, CHART_DETECTOR_TOKEN_BUDGET, VALIDATE_SQL
+from core.charts.pool import render_in_pool, RenderPoolBusy
+from core.charts.spec import build_chart_spec
+from core.charts.store import get_plot_store
+from core.charts.detect import choose_plot_for_result, wants_chart
 from django.conf import settings
 
 _LOG = logging.getLogger(__name__)
 
-def _fix_date_funcs_for_dialect(engine, sql: str) -> str:
-    dialect = getattr(engine.dialect, "name", "").lower()
-    if dialect == "postgresql":
-        sql = re.sub(r"STRFTIME\(\s*'%Y-?%m'\s*,\s*([^\)]+)\)", r"TO_CHAR(\1, 'YYYY-MM')", sql, flags=re.I)
-    elif dialect in ("mysql","mariadb"):
-        sql = re.sub(r"STRFTIME\(\s*'%Y-?%m'\s*,\s*([^\)]+)\)", r"DATE_FORMAT(\1, '%Y-%m')", sql, flags=re.I)
-    elif dialect == "sqlite":
-        sql = re.sub(r"TO_CHAR\(\s*([^\),]+)\s*,\s*'YYYY-?MM'\s*\)", r"STRFTIME('%Y-%m', \1)", sql, flags=re.I)
-    return sql
-
-def chart_detector(engine, question: str):
+def chart_detector(engine, question: str, cols=None, sample_rows=None, retriever=None):
     """
     Use your LLM (load_llm) to decide:
     - whether to plot (true/false)
     - suggested plot_type (bar/line/pie/scatter/table)
     - suggested SQL (SELECT ...). Must be only SELECT (we will validate)
+    When cols/sample_rows of an already-fetched result can be charted as they are,
+    only plot type and columns are returned (reuse=True) and the LLM is not called.
+    The prompt only carries the CHART_DETECTOR_K tables retrieved for the question,
+    cut to CHART_DETECTOR_TOKEN_BUDGET tokens; pass retriever to reuse an existing one.
     Return dict.
     """
-    inspector = inspect(engine)
-    schema_text = schema_to_text(inspector)
+    choice = choose_plot_for_result(question, cols, sample_rows) if wants_chart(question) else None
+    if choice:
+        return {"plot": True, "sql": None, "reuse": True, **choice}
 
     llm = load_llm()
+    # chart suggestions are secondary to the chat answer: they queue behind interactive LLM calls
+    with llm_priority(PRIORITY_BACKGROUND):
+        if retriever is None:
+            retriever = build_retriever(engine, llm, k=CHART_DETECTOR_K)
+        docs = retriever.invoke(question)[:CHART_DETECTOR_K]
+    schema_text, used, dropped = truncate_to_budget([d.page_content for d in docs], CHART_DETECTOR_TOKEN_BUDGET)
+    if dropped:
+        _LOG.info("chart_detector schema context cut to %d tokens (%d dropped)", used, dropped)
+
     prompt = f"""
     You are a SQL+visualization assistant. Given a user question and database schema, decide:
     1) whether the question can/should be answered with a chart (true/false)
@@ -54,7 +59,8 @@ def chart_detector(engine, question: str):
     Examples of JSON output:
     {{"plot": true, "plot_type":"bar", "sql":"SELECT category, COUNT(*) as cnt FROM sales GROUP BY category;"}}
     """
-    raw = llm.generate(prompt)
+    with llm_priority(PRIORITY_BACKGROUND):
+        raw = llm.generate(prompt)
     text = raw.strip() if isinstance(raw, str) else str(raw)
 
     try:
@@ -81,106 +87,43 @@ def chart_detector(engine, question: str):
     else:
         return {"plot": False, "plot_type": None, "sql": None}
 
-def chart_renderer(engine, sql: str, plot_type: str, limit_rows: int = 200):
+def chart_renderer(engine, sql: str, plot_type: str, limit_rows: int = 200, output: str = "png",
+                   cols=None, rows=None, x=None, y=None, max_points: int = None):
     """
     Execute SQL (safe), then render a chart and return a public URL.
-    Returns dict with keys: plot_url, cols, rows
+    If cols/rows of an already-fetched result are given, they are charted without a database call.
+    With output="spec" a Vega-Lite spec is returned instead of an image (PNG is the fallback).
+    At most max_points marks are drawn (see core.charts.downsample).
+    Returns dict with keys: plot_url, chart_spec, points (original/rendered counts), cols, rows
     """
-    sql = _fix_date_funcs_for_dialect(engine, sql)
-    cols, rows = safe_execute_select(engine, sql, limit=limit_rows)
+    if cols and rows is not None:
+        rows = rows[:limit_rows]
+    else:
+        sql = rewrite_dialect_functions(engine.dialect.name, sql)
+        if VALIDATE_SQL:
+            validate_sql(sql, get_schema_snapshot(engine), engine.dialect.name)
+        cols, rows = safe_execute_select(engine, sql, limit=limit_rows)
     if not rows:
         raise RuntimeError("Query returned no rows")
 
-    try:
-        df = pd.DataFrame(rows, columns=cols)
-    except Exception:
-        _LOG.exception("Failed to build DataFrame from SQL result, coercing to strings.")
-        df = pd.DataFrame([list(map(str, r)) for r in rows])
-        df.columns = [f"col_{i}" for i in range(len(df.columns))]
+    if output == "spec":
+        try:
+            spec = build_chart_spec(cols, rows, plot_type, x, y, max_points)
+            return {"plot_url": None, "chart_spec": spec, "points": spec["usermeta"]["points"], "cols": cols, "rows": rows}
+        except Exception as e:
+            _LOG.warning("Chart spec failed, falling back to PNG: %s", e)
 
-    img_name = f"plot_{uuid.uuid4().hex}.png"
-    out_path = os.path.join(settings.MEDIA_ROOT, "plots")
-    os.makedirs(out_path, exist_ok=True)
-    img_file = os.path.join(out_path, img_name)
+    store = get_plot_store(settings.MEDIA_ROOT, settings.MEDIA_URL)
+    img_key, img_file = store.allocate()
 
     try:
-        plt.figure(figsize=(8,4))
-        if plot_type == "table":
-            plt.axis('off')
-            tbl = plt.table(cellText=df.head(20).values, colLabels=df.columns, loc='center')
-            tbl.auto_set_font_size(False)
-            tbl.set_fontsize(8)
-            plt.savefig(img_file, bbox_inches='tight', dpi=150)
-            plt.close('all')
-        else:
-            numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-            if plot_type == "bar":
-                cat_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
-                if cat_cols and numeric_cols:
-                    x = cat_cols[0]; y = numeric_cols[0]
-                    agg = df.groupby(x)[y].sum()
-                    agg.plot(kind="bar")
-                elif numeric_cols and len(numeric_cols) >= 2:
-                    df.plot(kind="bar", x=numeric_cols[0], y=numeric_cols[1])
-                else:
-                    df.plot(kind="bar")
-                plt.tight_layout()
-                plt.savefig(img_file, dpi=150)
-                plt.close('all')
-
-            elif plot_type == "line":
-                if numeric_cols:
-                    df.plot(kind="line")
-                else:
-                    df.plot(kind="line")
-                plt.tight_layout()
-                plt.savefig(img_file, dpi=150)
-                plt.close('all')
-
-            elif plot_type == "pie":
-                if numeric_cols and len(numeric_cols) >= 1:
-                    labels = df.iloc[:,0].astype(str)
-                    values = df[numeric_cols[0]]
-                    plt.pie(values, labels=labels, autopct='%1.1f%%')
-                else:
-                    if df.shape[1] >= 2:
-                        s = df.iloc[:,1].value_counts()
-                    else:
-                        s = df.iloc[:,0].value_counts()
-                    s.plot(kind="pie", autopct='%1.1f%%')
-                plt.tight_layout()
-                plt.savefig(img_file, dpi=150)
-                plt.close('all')
-
-            elif plot_type == "scatter":
-                if len(numeric_cols) >= 2:
-                    x = numeric_cols[0]; y = numeric_cols[1]
-                    df.plot(kind="scatter", x=x, y=y)
-                else:
-                    try:
-                        x = df.columns[0]; y = df.columns[1]
-                        df.plot(kind="scatter", x=x, y=y)
-                    except Exception:
-                        df.plot(kind="bar")
-                plt.tight_layout()
-                plt.savefig(img_file, dpi=150)
-                plt.close('all')
-
-            else:
-                plt.axis('off')
-                tbl = plt.table(cellText=df.head(20).values, colLabels=df.columns, loc='center')
-                tbl.auto_set_font_size(False)
-                tbl.set_fontsize(8)
-                plt.savefig(img_file, bbox_inches='tight', dpi=150)
-                plt.close('all')
-
+        points = render_in_pool(cols, rows, plot_type, img_file, x, y, max_points)
+    except RenderPoolBusy:
+        raise
     except Exception as e:
         _LOG.exception("Chart rendering failed: %s", e)
-        try:
-            plt.close('all')
-        except Exception:
-            pass
+        store.discard(img_key)
         raise RuntimeError(f"Chart rendering failed: {e}")
 
-    plot_url = os.path.join(settings.MEDIA_URL.rstrip('/'), "plots", img_name)
-    return {"plot_url": plot_url, "cols": cols, "rows": rows}
+    plot_url = store.url(img_key)
+    return {"plot_url": plot_url, "chart_spec": None, "points": points, "cols": cols, "rows": rows}
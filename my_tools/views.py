@@ -23,9 +23,11 @@ def tools_call(request):
     conn = get_object_or_404(ConnectionConfig, pk=conn_id)
     engine = connect_db(conn_str_for(conn))
     if tool == "chart_detector":
-        res = chart_detector(engine, input_data.get("question",""))
+        res = chart_detector(engine, input_data.get("question",""), input_data.get("cols"), input_data.get("sample_rows"))
         return JsonResponse({"result": res})
     if tool == "chart_renderer":
-        res = chart_renderer(engine, input_data.get("sql"), input_data.get("plot_type"), input_data.get("limit_rows",200))
+        res = chart_renderer(engine, input_data.get("sql"), input_data.get("plot_type"), input_data.get("limit_rows",200), input_data.get("output","png"),
+                             input_data.get("cols"), input_data.get("rows"), input_data.get("x"), input_data.get("y"),
+                             input_data.get("max_points"))
         return JsonResponse({"result": res})
     return JsonResponse({"error":"unknown tool"}, status=400)
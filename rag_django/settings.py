@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +49,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -129,6 +131,17 @@ LOGOUT_REDIRECT_URL = 'login'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# per-request cProfile for staff (X-Profile: 1 header or ?_profile=1), see core.middleware;
+# the MCP tools server writes to MCP_PROFILE_DIR, which defaults to the same directory
+# (core.profiling.DEFAULT_PROFILE_DIR, independent of the working directory)
+PROFILING_ENABLED = True
+PROFILE_DIR = BASE_DIR / 'profiles'
+PROFILE_KEEP = 100
+
+# /metrics/ is served to staff users, and to scrapers sending "Authorization: Bearer <token>"
+# when a token is configured
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 